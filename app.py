@@ -1,10 +1,23 @@
-from datetime import datetime, date, time, timedelta
-import uuid
+import json
+from datetime import datetime, date, timedelta
 import pandas as pd
 import streamlit as st
-import gspread
-import altair as alt
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
+from lovarda.config import GOOGLE_SHEET_ID, GOOGLE_JSON, STORAGE_BACKEND, SQLITE_PATH, WRITE_BEHIND, SHARED_CACHE
+from lovarda.storage import open_storage
+from lovarda.writeback import WriteBehindStorage
+from lovarda.shared_cache import SharedCacheStorage
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.slots import to_min, from_min
+from lovarda.schema import hhmm
+from lovarda.core import (START_TIME, END_TIME, check_login, day_free_slots, day_lunch as core_day_lunch,
+                          new_booking, settings_values, user_directory)
+from lovarda.bookable import BookableCalendar
+from lovarda.stats import WEEKDAYS, day_table, heat_table, period_table, totals, weekday_table
+from lovarda.rules import day_rule_violation
+from lovarda.recurrence import WeeklyRule, check_series, series_rows, new_series_id
+from lovarda.sync import apply_append, apply_delete, apply_update_at
+from lovarda.ics import IcsCache
+from lovarda.metrics import METRICS, QUOTA_STATS
 
 # ---- PERMANENS DARK MODE ----
 st.markdown("""
@@ -22,132 +35,119 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ---- Google Sheets config & constants ----
-GOOGLE_SHEET_ID     = "1xGeEqZ0Y-o7XEIR0mOBvgvTk7FVRzz7TTGRKrSCy6Uo"
-GOOGLE_JSON         = "mystic-fountain-300911-9b2c042063fa.json"
+# ---- Mérés: a szkript minden lefutása egy futás (a félbeszakadtat a következő zárja le) ----
+if st.session_state.get("_perf_run") is not None:
+    METRICS.end(st.session_state["_perf_run"], finished=False)
+st.session_state["_perf_run"] = METRICS.begin("start")
+
+# ---- Config & constants ----
 ADMIN_PW            = "almakaki"
-START_TIME          = time(9,0)
-END_TIME            = time(20,30)
-DEFAULT_BREAK_MIN   = 10
-DEFAULT_LUNCH_START = time(12,0)
-DEFAULT_LUNCH_DUR   = 45  # perc
+SEARCH_DAYS         = 60  # ennyi napra előre keresünk szabad időpontot
+NEXT_SLOTS          = 5
+WEEK_PAGE_ROWS      = 20  # ennyi foglalás egy napi oldalon az admin heti listában
 
+# ---- Tároló (Google Sheets / SQLite / Sheets + SQLite másolat) ----
 @st.cache_resource
-def get_gspread_client():
-    return gspread.service_account(filename=GOOGLE_JSON)
+def get_storage():
+    storage = open_storage(STORAGE_BACKEND, sheet_id=GOOGLE_SHEET_ID,
+                           json_path=GOOGLE_JSON, sqlite_path=SQLITE_PATH)
+    if SHARED_CACHE:
+        storage = SharedCacheStorage(storage, SHARED_CACHE)
+    return WriteBehindStorage(storage) if WRITE_BEHIND else storage
 
 # ---- DataFrame betöltők ----
-@st.cache_data(ttl=60)
+@METRICS.timer("load.bookings")
 def load_bookings_df():
-    ws = get_gspread_client().open_by_key(GOOGLE_SHEET_ID).worksheet("Foglalások")
-    df = get_as_dataframe(ws, evaluate_formulas=True).dropna(how="all").fillna("")
-    if "Dátum" in df.columns:
-        df["Dátum"] = pd.to_datetime(df["Dátum"]).dt.date
-    return df
+    return get_storage().load_bookings()
 
-@st.cache_data(ttl=60)
+@METRICS.timer("load.users")
 def load_users_df():
-    sh = get_gspread_client().open_by_key(GOOGLE_SHEET_ID)
-    for name in ("Felhasználók","Felhasznalok"):
-        try:
-            ws = sh.worksheet(name)
-            break
-        except gspread.exceptions.WorksheetNotFound:
-            ws = None
-    if ws is None:
-        ws = sh.add_worksheet("Felhasználók", rows=100, cols=2)
-        ws.append_row(["username","password"])
-    df = get_as_dataframe(ws, evaluate_formulas=True).dropna(how="all").fillna("")
-    return df
-
-@st.cache_data(ttl=60)
+    return get_storage().load_users()
+
+@st.cache_resource(ttl=60)
+def get_user_directory():
+    return user_directory(load_users_df())
+
+@METRICS.timer("load.blocked")
 def load_blocked_df():
-    sh = get_gspread_client().open_by_key(GOOGLE_SHEET_ID)
-    try:
-        ws = sh.worksheet("TiltottNapok")
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet("TiltottNapok", rows=100, cols=1)
-        ws.append_row(["Dátum"])
-    df = get_as_dataframe(ws, evaluate_formulas=True).dropna(how="all").fillna("")
-    if "Dátum" in df.columns:
-        df["Dátum"] = pd.to_datetime(df["Dátum"]).dt.date
-    return df
-
-@st.cache_data(ttl=300)
+    return get_storage().load_blocked()
+
+@METRICS.timer("load.settings")
 def load_settings_df():
-    sh = get_gspread_client().open_by_key(GOOGLE_SHEET_ID)
-    try:
-        ws = sh.worksheet("Beallitasok")
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet("Beallitasok", rows=10, cols=2)
-        ws.append_rows([
-            ["lunch_start","12:00"],
-            ["lunch_dur","45"],
-            ["break_min","10"]
-        ])
-    df = get_as_dataframe(ws, evaluate_formulas=True).dropna(how="all").fillna("")
-    df.columns = ["Key","Value"]
-    return df
-
-@st.cache_data(ttl=60)
+    return get_storage().load_settings()
+
+@METRICS.timer("load.lunch")
 def load_lunch_overrides_df():
-    sh = get_gspread_client().open_by_key(GOOGLE_SHEET_ID)
-    try:
-        ws = sh.worksheet("EbédSzunet")
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet("EbédSzunet", rows=100, cols=3)
-        ws.append_row(["Dátum","Kezdes","HosszPerc"])
-    df = get_as_dataframe(ws, evaluate_formulas=True).dropna(how="all").fillna("")
-    if not df.empty:
-        df["Dátum"]     = pd.to_datetime(df["Dátum"]).dt.date
-        df["Kezdes"]    = pd.to_datetime(df["Kezdes"]).dt.time
-        df["HosszPerc"] = df["HosszPerc"].astype(int)
-    return df
+    return get_storage().load_lunch_overrides()
 
 # ---- Mentő- és mentőfüggvények ----
-def save_df_to_sheet(df: pd.DataFrame, sheet_name: str):
-    ws = get_gspread_client().open_by_key(GOOGLE_SHEET_ID).worksheet(sheet_name)
-    ws.clear()
-    set_with_dataframe(ws, df, include_index=False)
+@METRICS.timer("save.table")
+def save_table(df: pd.DataFrame, key: str):
+    get_storage().save_table(key, df)
+    METRICS.count("rows.written", len(df))
 
 def save_settings_df(df: pd.DataFrame):
-    save_df_to_sheet(df, "Beallitasok")
+    save_table(df, "settings")
+
+# Foglalások: sor-szintű írás az ID alapján; a futás hátralévő részére
+# a memóriabeli táblát és indexet is igazítjuk
+@METRICS.timer("save.append")
+def append_bookings(rows: list):
+    global bookings_df
+    get_storage().append_bookings(rows)
+    bookings_df = apply_append(bookings_df, bookings_idx, rows)
+    METRICS.count("rows.written", len(rows))
+
+@METRICS.timer("save.update")
+def update_bookings(changes: dict):
+    get_storage().update_bookings(changes)
+    METRICS.count("rows.written", len(changes))
+
+@METRICS.timer("save.delete")
+def delete_bookings(row_ids):
+    global bookings_df
+    row_ids = list(row_ids)
+    get_storage().delete_bookings(row_ids)
+    bookings_df = apply_delete(bookings_df, bookings_idx, row_ids)
+    METRICS.count("rows.written", len(row_ids))
+
+# Az admin heti lista gyors útja: a tábla helyett csak az index és az érintett sor változik
+@METRICS.timer("save.delete")
+def delete_listed(row_ids):
+    row_ids = [rid for rid in row_ids if rid in bookings_idx]
+    get_storage().delete_bookings(row_ids)
+    for rid in row_ids:
+        bookings_idx.remove(rid)
+    METRICS.count("rows.written", len(row_ids))
+
+@METRICS.timer("save.update")
+def update_listed(label, changes: dict):
+    get_storage().update_bookings({bookings_df.at[label, ROW_ID_COL]: changes})
+    apply_update_at(bookings_df, bookings_idx, label, changes)
+    METRICS.count("rows.written", 1)
 
 def safe_rerun():
-    try: st.experimental_rerun()
-    except: pass
-
-# ---- ICS generátor ----
-def generate_ics(df: pd.DataFrame):
-    lines = ["BEGIN:VCALENDAR","VERSION:2.0","PRODID:-//Lovarda Foglaló//EN"]
-    for _,r in df.iterrows():
-        dtstart = datetime.combine(r["Dátum"], datetime.strptime(r["Kezdés"],"%H:%M").time())
-        dtend   = dtstart + timedelta(minutes=int(r["Időtartam (perc)"]))
-        uid     = uuid.uuid4()
-        lines += [
-            "BEGIN:VEVENT",
-            f"UID:{uid}",
-            f"DTSTAMP:{datetime.utcnow():%Y%m%dT%H%M%SZ}",
-            f"DTSTART:{dtstart:%Y%m%dT%H%M%S}",
-            f"DTEND:{dtend:%Y%m%dT%H%M%S}",
-            f"SUMMARY:Lovarda foglalás ({r['Gyermek(ek) neve']})",
-            "END:VEVENT"
-        ]
-    lines.append("END:VCALENDAR")
-    return "\r\n".join(lines)
-
-# ---- Session init: globális beállítások fallback-kel ----
-raw = load_settings_df().set_index("Key")["Value"].to_dict()
-lunch_start_str = raw.get("lunch_start", DEFAULT_LUNCH_START.strftime("%H:%M"))
-lunch_dur_str   = raw.get("lunch_dur",   str(DEFAULT_LUNCH_DUR))
-break_min_str   = raw.get("break_min",   str(DEFAULT_BREAK_MIN))
+    st.rerun()
 
-if "lunch_start" not in st.session_state:
-    st.session_state["lunch_start"] = datetime.strptime(lunch_start_str,"%H:%M").time()
-if "lunch_dur" not in st.session_state:
-    st.session_state["lunch_dur"]   = int(lunch_dur_str)
-if "break_min" not in st.session_state:
-    st.session_state["break_min"]   = int(break_min_str)
+# ---- ICS export ----
+# Csak kérésre készül el; a kész fájl (felhasználó, adatverzió, időszak) szerint tárolva
+@st.cache_resource
+def get_ics_cache():
+    return IcsCache()
+
+def ics_export(label: str, file_name: str, owner: str, build_df):
+    with st.expander(f"📅 {label}"):
+        rng = st.date_input("Időszak (üresen: minden foglalás)", value=(), key=f"ics_rng_{owner}")
+        date_from, date_to = (tuple(rng) + (None, None))[:2]
+        req = ((owner, get_storage().version()), date_from, date_to)
+        if st.button("Előkészítés", key=f"ics_prep_{owner}"):
+            st.session_state[f"ics_{owner}"] = req
+        if st.session_state.get(f"ics_{owner}")==req:
+            data = get_ics_cache().get(req[0], build_df, date_from, date_to)
+            st.download_button(label, data=data, file_name=file_name, mime="text/calendar",
+                               key=f"ics_dl_{owner}")
+
+# ---- Session init ----
 for k in ("role","auth","user"):
     if k not in st.session_state:
         st.session_state[k] = None
@@ -167,12 +167,11 @@ if st.session_state.role is None:
 # ---- Auth ----
 if not st.session_state.auth:
     if st.session_state.role=="rider":
-        dfu = load_users_df()
         st.subheader("Lovas bejelentkezés")
         uname = st.text_input("Felhasználónév")
         pwd   = st.text_input("Jelszó", type="password")
         if st.button("Bejelentkezés lovasként"):
-            if ((dfu["username"]==uname)&(dfu["password"]==pwd)).any():
+            if check_login(get_user_directory(), uname, pwd):
                 st.session_state.auth=True
                 st.session_state.user=uname
                 safe_rerun()
@@ -188,57 +187,97 @@ if not st.session_state.auth:
                 st.error("Hibás jelszó.")
     st.stop()
 
+METRICS.set_label(st.session_state.role)
+
+# ---- Globális beállítások fallback-kel (csak belépés után kell a tároló) ----
+if "lunch_start" not in st.session_state:
+    st.session_state.update(settings_values(load_settings_df()))
+
 # ---- Dátum és tiltott napok ----
 sel_date = st.date_input("Dátum kiválasztása")
-wd, mo   = sel_date.weekday(), sel_date.month
-if mo==7 and wd not in (0,1):
-    st.warning("Júliusban csak hétfő–kedd foglalható."); st.stop()
-elif mo==8 and wd==0:
-    st.warning("Augusztusban csak kedd–vasárnap foglalható."); st.stop()
+rule_msg = day_rule_violation(sel_date)
+if rule_msg and st.session_state.role!="rider":
+    st.warning(rule_msg); st.stop()
 blocked    = load_blocked_df()
-if st.session_state.role=="rider" and sel_date in blocked["Dátum"].tolist():
-    st.warning("❌ Ezen a napon nem lehet foglalni."); st.stop()
+# lovasnál nem állunk meg: a nézet a figyelmeztetés mellé a következő szabad időpontokat adja
+if st.session_state.role=="rider" and not rule_msg and sel_date in blocked["Dátum"].tolist():
+    rule_msg = "❌ Ezen a napon nem lehet foglalni."
 
-bookings_df   = load_bookings_df()
+bookings_df, bookings_idx = load_bookings_df()
 lunch_over_df = load_lunch_overrides_df()
 
 # ---- Slot generálás ----
+def day_lunch(d: date):
+    return core_day_lunch(lunch_over_df, d, st.session_state["lunch_start"], st.session_state["lunch_dur"])
+
+def lunch_minutes(d: date):
+    ls, ld = day_lunch(d)
+    return to_min(ls), int(ld)
+
+def get_free_slots_all(d: date) -> dict:
+    ls, ld = day_lunch(d)
+    return day_free_slots(bookings_idx.day(d), ls, ld, st.session_state["break_min"])
+
+@METRICS.timer("slots.get_free_slots")
 def get_free_slots(duration):
-    slots = []
-    cur   = datetime.combine(sel_date, START_TIME)
-    odf   = lunch_over_df[lunch_over_df["Dátum"]==sel_date]
-    if not odf.empty:
-        ls = odf.iloc[0]["Kezdes"]; ld = int(odf.iloc[0]["HosszPerc"])
-    else:
-        ls = st.session_state["lunch_start"]; ld = st.session_state["lunch_dur"]
-    lunch_end = (datetime.combine(sel_date, ls) + timedelta(minutes=ld)).time()
-    break_min = st.session_state["break_min"]
-    today     = bookings_df[bookings_df["Dátum"]==sel_date]
-    last_start= (datetime.combine(sel_date, END_TIME) - timedelta(minutes=duration)).time()
-
-    while cur.time() <= last_start:
-        if ls <= cur.time() < lunch_end:
-            cur += timedelta(minutes=ld)
-            continue
-        stime = cur.time()
-        end_dt= cur + timedelta(minutes=duration)
-        etime = end_dt.time()
-        conflict=False
-        for _,r in today.iterrows():
-            bs = datetime.combine(sel_date, datetime.strptime(r["Kezdés"], "%H:%M").time())
-            be = bs + timedelta(minutes=int(r["Időtartam (perc)"]))
-            if cur < be and bs < end_dt:
-                conflict=True; break
-        if not conflict:
-            slots.append((stime, etime))
-        cur += timedelta(minutes=duration + break_min)
-    return slots
+    return get_free_slots_all(sel_date)[duration]
+
+# ---- Foglalható napok naptára: tiltott napok / ebéd változásáig újrahasznosítva ----
+@st.cache_resource(max_entries=8)
+def compiled_calendar(first: date, blocked_days: tuple, lunch_over: pd.DataFrame, lunch_start, lunch_dur):
+    return BookableCalendar.compile(first, SEARCH_DAYS, blocked=blocked_days, lunch_over_df=lunch_over,
+                                    lunch_start=to_min(lunch_start), lunch_dur=int(lunch_dur))
+
+@METRICS.timer("slots.next_free")
+def next_free_slots(duration, n=NEXT_SLOTS):
+    now = datetime.now()
+    cal = compiled_calendar(now.date(), tuple(blocked["Dátum"].tolist()), lunch_over_df,
+                            st.session_state["lunch_start"], st.session_state["lunch_dur"])
+    return cal.next_free(bookings_idx, duration, n=n, not_before=to_min(now.time()),
+                         day_start=to_min(START_TIME), day_end=to_min(END_TIME),
+                         break_min=st.session_state["break_min"])
+
+# ---- Statisztika: az index összesítőiből, adatverziónként egyszer számolva ----
+@st.cache_resource(max_entries=4)
+def stats_tables(version, break_min, lunch_start, lunch_dur, blocked_days: tuple,
+                 lunch_over: pd.DataFrame, _rollups):
+    if not _rollups.days:
+        return None
+    first, last = min(_rollups.days), max(_rollups.days)
+    cal  = BookableCalendar.compile(first, (last - first).days + 1, blocked=blocked_days,
+                                    lunch_over_df=lunch_over, lunch_start=to_min(lunch_start),
+                                    lunch_dur=int(lunch_dur))
+    days = day_table(_rollups, cal, open_minutes=to_min(END_TIME) - to_min(START_TIME),
+                     break_min=break_min)
+    return {"D": days, "W": period_table(_rollups, days, "W"), "M": period_table(_rollups, days, "M"),
+            "weekday": weekday_table(days), "heat": heat_table(_rollups, START_TIME.hour, END_TIME.hour),
+            "totals": totals(_rollups)}
 
 # ---- Rider nézet ----
 if st.session_state.role=="rider":
     st.subheader(f"Üdv, {st.session_state.user}!")
     names = st.text_input("Gyermek(ek) neve(i), vesszővel elválasztva", value=st.session_state.user)
     dur   = st.selectbox("Időtartam (perc)", [30,60,90])
+
+    # következő szabad időpontok bármelyik napon, egy kereséssel
+    def show_next_free():
+        st.markdown(f"#### Következő szabad időpontok ({dur} perc)")
+        nxt = next_free_slots(dur)
+        if not nxt:
+            st.info(f"A következő {SEARCH_DAYS} napban nincs szabad időpont.")
+        for i,(d,s,e) in enumerate(nxt):
+            c1,c2 = st.columns([1,1])
+            c1.write(f"{d} {s.strftime('%H:%M')}–{e.strftime('%H:%M')}")
+            if c2.button("Foglal", key=f"nx{i}"):
+                append_bookings([new_booking(d, names, s, dur, st.session_state.user)])
+                st.success(f"Foglalás sikeres: {d} {s.strftime('%H:%M')}"); safe_rerun()
+
+    # tiltott vagy szabály szerint zárt nap: ilyenkor kell leginkább a következő szabad időpont
+    if rule_msg:
+        st.warning(rule_msg)
+        show_next_free()
+        st.stop()
+
     free  = get_free_slots(dur)
     if not free:
         st.info("Nincs szabad időpont.")
@@ -248,105 +287,139 @@ if st.session_state.role=="rider":
             label = f"{s.strftime('%H:%M')}–{e.strftime('%H:%M')}"
             # sima Foglalás
             if c1.button(f"Foglal {label}", key=f"bk{i}"):
-                new = {
-                    "Dátum":sel_date, "Gyermek(ek) neve":names,
-                    "Lovak":"", "Kezdés":s.strftime("%H:%M"),
-                    "Időtartam (perc)":dur,"Fő":1,
-                    "Ismétlődik":False, "RepeatGroupID":"", "Megjegyzés":""
-                }
-                bookings_df = pd.concat([bookings_df, pd.DataFrame([new])], ignore_index=True)
-                save_df_to_sheet(bookings_df, "Foglalások")
+                append_bookings([new_booking(sel_date, names, s, dur, st.session_state.user)])
                 st.success("Foglalás sikeres!"); safe_rerun()
 
             # Örökítés gomb: heti ismétlés a következő évre
             if c2.button(f"Örökítés {label}", key=f"orok{i}"):
-                future = pd.date_range(
-                    start=sel_date + timedelta(weeks=1),
-                    end=sel_date + timedelta(days=365),
-                    freq='7D'
-                ).date
-                conflicts = [d for d in future
-                             if ((bookings_df["Dátum"]==d)&
-                                 (bookings_df["Kezdés"]==s.strftime("%H:%M"))).any()]
-                if conflicts:
-                    st.warning(f"Ütközés: már foglalt napok: {', '.join(map(str,conflicts))}")
-                new_entries = []
-                for d in future:
-                    if d not in conflicts:
-                        new_entries.append({
-                            "Dátum": d,
-                            "Gyermek(ek) neve": names,
-                            "Lovak":"",
-                            "Kezdés": s.strftime("%H:%M"),
-                            "Időtartam (perc)": dur,
-                            "Fő": 1,
-                            "Ismétlődik": True,
-                            "RepeatGroupID": f"orok{i}",
-                            "Megjegyzés": "örökítés"
-                        })
-                if new_entries:
-                    bookings_df = pd.concat([bookings_df, pd.DataFrame(new_entries)], ignore_index=True)
-                    save_df_to_sheet(bookings_df, "Foglalások")
-                    st.success("Örökítés lefuttatva az elkövetkező évre!"); safe_rerun()
+                rule    = WeeklyRule(first=sel_date + timedelta(weeks=1),
+                                     until=sel_date + timedelta(days=365))
+                checked = check_series(
+                    rule.dates(), to_min(s), dur, bookings_idx,
+                    blocked=blocked["Dátum"].tolist(),
+                    lunch_for=lunch_minutes, day_end=to_min(END_TIME),
+                )
+                rejected = [(d, why) for d, why in checked if why]
+                if rejected:
+                    st.warning("Kihagyott napok:\n" + "\n".join(f"- {d}: {why}" for d, why in rejected))
+                accepted = [d for d, why in checked if not why]
+                if accepted:
+                    append_bookings(series_rows(accepted, {
+                        "Gyermek(ek) neve": names,
+                        "Lovak":"",
+                        "Kezdés": s.strftime("%H:%M"),
+                        "Időtartam (perc)": dur,
+                        "Fő": 1,
+                        "Megjegyzés": "örökítés",
+                        OWNER_COL: st.session_state.user,
+                    }, new_series_id()))
+                    st.success(f"Örökítés lefuttatva az elkövetkező évre ({len(accepted)} alkalom)!")
+                    if not rejected:
+                        safe_rerun()
+
+    show_next_free()
 
     # saját foglalások ICS
-    mask = (
-        bookings_df["Gyermek(ek) neve"]
-        .fillna("")
-        .astype(str)
-        .str.contains(st.session_state.user, case=False, na=False)
-    )
-    my_df = bookings_df[mask]
-    if not my_df.empty:
-        ics = generate_ics(my_df)
-        st.download_button("ICS export (saját)", data=ics,
-                           file_name="sajat_foglalasok.ics", mime="text/calendar")
+    def my_bookings():
+        return bookings_df.loc[bookings_idx.labels_for_user(st.session_state.user)]
+    ics_export("ICS export (saját)", "sajat_foglalasok.ics", f"user:{st.session_state.user}", my_bookings)
     st.stop()
 
 # ---- Admin nézet ----
 st.subheader("🛠️ Admin felület")
-menu = st.radio("Menü", ["Foglalások","Felhasználók","Statisztika","Beállítások","Naptár"])
-
-if menu=="Foglalások":
-    st.markdown("### Heti foglalások")
-    wn  = sel_date.isocalendar()[1]
-    wdf = bookings_df[bookings_df["Dátum"].apply(lambda d:d.isocalendar()[1])==wn]
-    if wdf.empty:
-        st.info("Nincs foglalás ezen a héten.")
+wb = get_storage().status() if WRITE_BEHIND else None
+if wb:
+    if wb["last_error"]:
+        st.caption(f"⚠️ Mentési hiba, újrapróbálás folyamatban ({wb['pending']} függő változás): {wb['last_error']}")
+    elif wb["pending"]:
+        st.caption(f"💾 Mentés folyamatban: {wb['pending']} függő változás")
     else:
-        for idx,r in wdf.iterrows():
-            st.write(f"**{r['Dátum']} {r['Kezdés']}** – {r['Gyermek(ek) neve']} ({r['Időtartam (perc)']}p)")
+        st.caption(f"✅ Minden változás mentve ({wb['ops']} művelet, {wb['writes']} írás)")
+    # véglegesen hibás műveletek: kikerültek a sorból, a többi írást nem tartják fel
+    if wb["failed"]:
+        with st.expander(f"❌ Nem menthető változások ({len(wb['failed'])})", expanded=True):
+            for what, err, at in wb["failed"]:
+                st.write(f"{datetime.fromtimestamp(at):%Y-%m-%d %H:%M:%S} – {what}: {err}")
+            c1,c2 = st.columns(2)
+            if c1.button("Újrapróbálás", key="wb_retry"):
+                get_storage().retry_failed(); safe_rerun()
+            if c2.button("Elvetés", key="wb_drop"):
+                get_storage().drop_failed(); safe_rerun()
+# a Teljesítmény fül rejtett: ?perf=1 kapcsolja be
+menus = ["Foglalások","Felhasználók","Statisztika","Beállítások","Naptár"]
+if st.query_params.get("perf")=="1":
+    menus.append("Teljesítmény")
+menu = st.radio("Menü", menus)
+METRICS.set_label(f"admin:{menu}")
+METRICS.section(f"admin.{menu}")
+
+# ---- Heti foglalások: fragment, naponként lapozva ----
+# A lista gombjai csak ezt a fragmentet futtatják újra: a betöltések, a teljes
+# tábla szűrése és az ICS export kimarad. Egyszerre egy nap (és abból legfeljebb
+# WEEK_PAGE_ROWS sor) jelenik meg, a sorokat az index címkéi alapján vesszük ki,
+# így egy kattintás ideje nem függ a tábla méretétől.
+@st.fragment
+def admin_week(iy: int, wn: int):
+    # a fragment önálló újrafuttatásakor a teljes szkript futása már lezárult: saját futás
+    outer = METRICS.current()
+    if outer is not None and outer.ms is None:
+        return admin_week_body(iy, wn)
+    run = METRICS.begin("admin:fragment")
+    try:
+        admin_week_body(iy, wn)
+    except BaseException:  # st.rerun / st.stop is kivétellel lép ki
+        METRICS.end(run, finished=False)
+        raise
+    METRICS.end(run)
+
+def admin_week_body(iy: int, wn: int):
+    days = bookings_idx.dates_in_week(iy, wn)
+    if not days:
+        st.info("Nincs foglalás ezen a héten.")
+        return
+    with METRICS.timed("admin.week"):
+        day_key = f"week_day_{iy}_{wn}"
+        if st.session_state.get(day_key, days[0]) not in days:
+            del st.session_state[day_key]  # az utolsó foglalása is törölve lett
+        day = st.radio("Nap", days, horizontal=True, key=day_key,
+                       index=days.index(sel_date) if sel_date in days else 0,
+                       format_func=lambda d: f"{WEEKDAYS[d.weekday()]} {d:%m.%d.} ({len(bookings_idx.day(d))})")
+        labels   = bookings_idx.labels_on(day)
+        pages    = -(-len(labels)//WEEK_PAGE_ROWS)
+        page_key = f"week_page_{day}"
+        if st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = max(pages, 1)
+        page = st.number_input("Oldal", 1, pages, key=page_key) if pages > 1 else 1
+        for idx in labels[(page - 1)*WEEK_PAGE_ROWS:page*WEEK_PAGE_ROWS]:
+            r = bookings_df.loc[idx]
+            st.write(f"**{r['Dátum']:%Y-%m-%d} {hhmm(r['Kezdés'])}** – {r['Gyermek(ek) neve']} ({r['Időtartam (perc)']}p)")
             c1,c2,c3 = st.columns([1,1,1])
             # egyedi sor törlése
             if c1.button("❌ Törlés", key=f"del{idx}"):
-                bookings_df = bookings_df.drop(idx)
-                save_df_to_sheet(bookings_df,"Foglalások"); safe_rerun()
+                delete_listed([r[ROW_ID_COL]]); st.rerun(scope="fragment")
             # áthelyezés
             if st.session_state.get("edit_idx")!=idx:
                 if c2.button("↻ Áthelyez", key=f"mv{idx}"):
                     st.session_state["edit_idx"]=idx
-                    st.session_state["new_time"]=datetime.strptime(r["Kezdés"],"%H:%M").time()
-                    safe_rerun()
+                    st.session_state["new_time"]=from_min(r["Kezdés"])
+                    st.rerun(scope="fragment")
             else:
                 nt = c2.time_input("Új kezdés", value=st.session_state["new_time"], key=f"time{idx}")
                 if c2.button("Mentés", key=f"save{idx}"):
-                    bookings_df.at[idx,"Kezdés"]=nt.strftime("%H:%M")
-                    save_df_to_sheet(bookings_df,"Foglalások")
-                    del st.session_state["edit_idx"]; safe_rerun()
-            # Stop ismétlés, ha RepeatGroupID van
+                    update_listed(idx, {"Kezdés":nt.strftime("%H:%M")})
+                    del st.session_state["edit_idx"]; st.rerun(scope="fragment")
+            # Stop ismétlés, ha RepeatGroupID van (a sorozat sorai az indexből)
             rg = r.get("RepeatGroupID","")
-            if rg:
+            if isinstance(rg, str) and rg:
                 if c3.button("↺ Stop ismétlés", key=f"stop{idx}"):
-                    bookings_df = bookings_df[~(
-                        (bookings_df["RepeatGroupID"]==rg) &
-                        (bookings_df["Dátum"]>=sel_date)
-                    )]
-                    save_df_to_sheet(bookings_df,"Foglalások")
-                    st.success("Ismétlés leállítva innen!"); safe_rerun()
+                    delete_listed(bookings_idx.series_ids(rg, sel_date))
+                    st.toast("Ismétlés leállítva innen!"); st.rerun(scope="fragment")
+
+if menu=="Foglalások":
+    st.markdown("### Heti foglalások")
+    admin_week(*sel_date.isocalendar()[:2])
     # teljes ICS export
-    ics_all = generate_ics(bookings_df)
-    st.download_button("ICS export (összes)", data=ics_all,
-                       file_name="osszes_foglalas.ics", mime="text/calendar")
+    ics_export("ICS export (összes)", "osszes_foglalas.ics", "admin", lambda: bookings_df)
 
 elif menu=="Felhasználók":
     dfu = load_users_df()
@@ -355,27 +428,57 @@ elif menu=="Felhasználók":
     npw = st.text_input("Új jelszó", type="password")
     if st.button("Regisztrálás"):
         dfu = pd.concat([dfu, pd.DataFrame([{"username":nu,"password":npw}])], ignore_index=True)
-        save_df_to_sheet(dfu,"Felhasználók"); st.success("Felhasználó hozzáadva!"); safe_rerun()
+        save_table(dfu,"users"); get_user_directory.clear()
+        st.success("Felhasználó hozzáadva!"); safe_rerun()
 
 elif menu=="Statisztika":
-    st.write("📊 Foglalások napi bontásban")
-    st.bar_chart(bookings_df["Dátum"].value_counts())
+    import altair as alt
+    st.markdown("### 📊 Kihasználtság")
+    t = stats_tables(get_storage().version(), st.session_state["break_min"],
+                     st.session_state["lunch_start"], st.session_state["lunch_dur"],
+                     tuple(blocked["Dátum"].tolist()), lunch_over_df, bookings_idx.stats)
+    if t is None:
+        st.info("Még nincs foglalás.")
+    else:
+        tot = t["totals"]
+        c1,c2,c3 = st.columns(3)
+        c1.metric("Foglalások", tot["count"])
+        c2.metric("Foglalt órák", f"{tot['minutes']/60:.0f}")
+        c3.metric("Ismétlődő arány", f"{tot['rec_share']:.0%}")
+
+        gran = st.radio("Bontás", ["Nap","Hét","Hónap"], index=1, horizontal=True)
+        per  = t[{"Nap":"D","Hét":"W","Hónap":"M"}[gran]]
+        if gran=="Nap":
+            per = per.tail(120)
+        st.write("Kihasználtság: foglalt perc / szabad perc (ebédszünet és átnyergelés nélkül)")
+        st.bar_chart(per["utilization"])
+        st.write("Ismétlődő és egyszeri foglalások")
+        st.bar_chart(pd.DataFrame({"Ismétlődő": per["rec_count"],
+                                   "Egyszeri": per["count"] - per["rec_count"]}))
+
+        with METRICS.timed("render.altair"):
+            st.write("Hét napjai")
+            wd = t["weekday"].reset_index(names="nap")
+            st.altair_chart(alt.Chart(wd).mark_bar().encode(
+                x=alt.X("nap:N", sort=WEEKDAYS), y=alt.Y("utilization:Q", title="kihasználtság"),
+                tooltip=["nap","count","minutes","available"]), use_container_width=True)
+
+            st.write("Foglalt percek napszak szerint")
+            st.altair_chart(alt.Chart(t["heat"]).mark_rect().encode(
+                x=alt.X("óra:O"), y=alt.Y("nap:N", sort=WEEKDAYS), color="perc:Q",
+                tooltip=["nap","óra","perc"]), use_container_width=True)
 
 elif menu=="Beállítások":
     st.header("⚙️ Globális & napi ebédszünet & átnyergelési idő")
 
     # 1) Mai foglalások idővonalként
-    df_ = bookings_df[bookings_df["Dátum"]==sel_date].copy()
+    df_ = bookings_df.loc[bookings_idx.labels_on(sel_date)].copy()
     if not df_.empty:
-        df_["start"] = pd.to_datetime(df_["Dátum"].astype(str)+" "+df_["Kezdés"])
-        df_["end"]   = df_["start"] + pd.to_timedelta(df_["Időtartam (perc)"],unit="m")
+        df_["start"] = df_["Dátum"] + pd.to_timedelta(df_["Kezdés"].to_numpy(dtype="int64"),unit="m")
+        df_["end"]   = df_["start"] + pd.to_timedelta(df_["Időtartam (perc)"].to_numpy(dtype="int64"),unit="m")
 
     # 2) napi override vagy globális
-    odf = lunch_over_df[lunch_over_df["Dátum"]==sel_date]
-    if not odf.empty:
-        base_ls, base_ld = odf.iloc[0]["Kezdes"], odf.iloc[0]["HosszPerc"]
-    else:
-        base_ls, base_ld = st.session_state["lunch_start"], st.session_state["lunch_dur"]
+    base_ls, base_ld = day_lunch(sel_date)
 
     # 3) éles slider + input
     ov_ls_dt = st.slider(
@@ -392,13 +495,15 @@ elif menu=="Beállítások":
         value=int(base_ld), step=5
     )
 
-    # 4) idővonal kirajzolása
+    # 4) idővonal kirajzolása (az altair csak ezen a fülön töltődik be)
+    import altair as alt
     lunch_bar = pd.DataFrame([{
         "type":"Ebédszünet",
         "start":datetime.combine(sel_date,ov_ls),
         "end":  datetime.combine(sel_date,ov_ls)+timedelta(minutes=int(ov_ld))
     }])
-    timeline = pd.concat([df_.assign(type="Foglalás"), lunch_bar], ignore_index=True)
+    timeline = pd.concat([df_.reindex(columns=["start","end"]).assign(type="Foglalás"), lunch_bar],
+                         ignore_index=True)
     chart = (
         alt.Chart(timeline)
            .mark_bar(size=20)
@@ -406,7 +511,8 @@ elif menu=="Beállítások":
                    color='type:N', tooltip=['type','start:T','end:T'])
            .properties(height=80)
     )
-    st.altair_chart(chart, use_container_width=True)
+    with METRICS.timed("render.altair"):
+        st.altair_chart(chart, use_container_width=True)
     st.markdown("---")
 
     # 5) mentés gombok
@@ -417,7 +523,7 @@ elif menu=="Beállítások":
             new_ov = pd.concat([new_ov,
                 pd.DataFrame([{"Dátum":sel_date,"Kezdes":ov_ls,"HosszPerc":int(ov_ld)}])
             ], ignore_index=True)
-            save_df_to_sheet(new_ov,"EbédSzunet")
+            save_table(new_ov,"lunch")
             st.success("Napi ebédszünet mentve."); safe_rerun()
     with col2:
         br = st.number_input(
@@ -452,6 +558,12 @@ elif menu=="Beállítások":
         save_settings_df(df)
         st.success("Globális ebédszünet mentve."); safe_rerun()
 
+    # 7) karbantartás: a törölt foglalások jelölt sorai a lapon maradnak, ez kiveszi őket
+    st.markdown("### Karbantartás")
+    if st.button("Törölt sorok tömörítése"):
+        n = get_storage().compact_bookings()
+        st.success(f"{n} törölt sor eltávolítva a foglalási lapról.")
+
 elif menu=="Naptár":
     st.header("📅 Tiltott napok kezelése")
     bd = blocked
@@ -468,10 +580,44 @@ elif menu=="Naptár":
             merged = pd.concat([bd,new_df],ignore_index=True)\
                        .drop_duplicates(subset=["Dátum"])\
                        .sort_values("Dátum")
-            save_df_to_sheet(merged,"TiltottNapok")
+            save_table(merged,"blocked")
             safe_rerun()
 
+elif menu=="Teljesítmény":
+    st.header("⏱️ Teljesítmény")
+    st.caption("Az utolsó futások bontása és mérőpontonként p50 / p95 (ms) a legutóbbi mérésekből. "
+               "A most futó lefutás még nincs benne.")
+    summary = pd.DataFrame(METRICS.summary())
+    if not summary.empty:
+        st.dataframe(summary.set_index("name"), use_container_width=True)
+    runs = METRICS.recent()[::-1]
+    if runs:
+        def _sum(c, part):
+            return sum(v for k, v in c.items() if k.startswith("cache.") and k.endswith(part))
+        st.markdown("#### Utolsó futások")
+        st.dataframe(pd.DataFrame([{
+            "idő":        datetime.fromtimestamp(r["started"]).strftime("%H:%M:%S"),
+            "futás":      r["label"],
+            "ms":         r["ms"],
+            "API hívás":  r["counters"].get("api.calls", 0),
+            "letöltve KB": round(r["counters"].get("api.bytes_received", 0)/1024, 1),
+            "cache találat": _sum(r["counters"], ".hit"),
+            "cache tévesztés": _sum(r["counters"], ".miss"),
+            "sorok (be/ki)": f"{r['counters'].get('rows.read', 0)}/{r['counters'].get('rows.written', 0)}",
+        } for r in runs]), use_container_width=True)
+        pick = st.selectbox("Futás részletei", range(len(runs)),
+                            format_func=lambda i: f"{runs[i]['label']} – {runs[i]['ms']} ms")
+        st.dataframe(pd.DataFrame(runs[pick]["timings"]), use_container_width=True)
+        st.json(runs[pick]["counters"])
+    st.markdown("#### Folyamatszintű számlálók")
+    st.json({"metrics": METRICS.export()["totals"], "sheets_quota": QUOTA_STATS.snapshot(),
+             **({"write_behind": get_storage().status()} if WRITE_BEHIND else {})})
+    st.download_button("Mérések exportja (JSON)", data=json.dumps(METRICS.export(), ensure_ascii=False, default=str),
+                       file_name="lovarda_metrics.json", mime="application/json")
+
 # ---- Kijelentkezés ----
 if st.button("Kijelentkezés"):
     st.session_state.clear()
     safe_rerun()
+
+METRICS.end(st.session_state.get("_perf_run"))
@@ -0,0 +1 @@
+# Lovarda időpontfoglaló – a Streamlit felülettől független segédmodulok
@@ -0,0 +1,256 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time as _time
+import uuid
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from lovarda.core import (DEFAULT_LUNCH_DUR, DEFAULT_LUNCH_START, END_TIME, START_TIME, day_free_slots,
+                          day_lunch, new_booking, settings_values)
+from lovarda.fakesheets import FakeSpreadsheet, fake_client
+from lovarda.ics import generate_ics
+from lovarda.recurrence import WeeklyRule, check_series
+from lovarda.rules import day_rule_violation
+from lovarda.sheets_store import SHEETS, SheetsStorage
+from lovarda.slots import DURATIONS, to_min
+from lovarda.storage import BOOKING_COLUMNS
+from lovarda.sync import apply_update_at
+
+# ---- Mérések szintetikus adaton, memóriabeli Sheets mögött ----
+#   python -m lovarda.bench [--sizes 1000,10000,100000] [--latency 0.05] [--out eredmeny.json]
+# Szolgáltatási fiók nélkül fut: a SheetsStorage egy FakeSpreadsheet-et
+# olvas és ír, ami hívásonként késleltet és számolja a hívásokat. Az
+# eredmény JSON, így két verzió mérése egymás mellé tehető.
+
+SIZES     = (1000, 10_000, 100_000)
+SHEET_KEY = "bench"
+CELL_MIN  = 30   # a generált kezdések rácsa
+HEAVY_MAX = 3    # a drága műveletek (hideg betöltés, teljes mentés) legfeljebb ennyiszer futnak
+
+FIRST_NAMES = ["Anna", "Bence", "Csenge", "Dóra", "Emma", "Flóra", "Gréta", "Hanna", "Ilona", "Jázmin",
+               "Kata", "Levente", "Mira", "Noémi", "Olivér", "Petra", "Réka", "Sára", "Tamás", "Zsófi"]
+LAST_NAMES  = ["Kovács", "Nagy", "Tóth", "Szabó", "Horváth", "Varga", "Kiss", "Molnár", "Németh", "Farkas"]
+HORSES      = ["", "", "Csillag", "Villám", "Bogár", "Szellő", "Tündér", "Pajkos"]
+
+
+# ---- Szintetikus adat ----
+def _cells(start: int, dur: int) -> int:
+    # a [start, start+dur) sáv bitmaszkja a nyitástól számolt 30 perces cellákon
+    first = (start - to_min(START_TIME))//CELL_MIN
+    return ((1 << -(-dur//CELL_MIN)) - 1) << first
+
+def _starts(lunch_start: int, lunch_dur: int) -> dict:
+    # hossz -> a nyitvatartásba férő, ebédet nem érintő kezdések
+    out = {}
+    for dur in DURATIONS:
+        out[dur] = [s for s in range(to_min(START_TIME), to_min(END_TIME) - dur + 1, CELL_MIN)
+                    if s + dur <= lunch_start or s >= lunch_start + lunch_dur]
+    return out
+
+def synthetic_data(n: int, *, seed=0, first: date = None, per_day=8, recurring=0.3,
+                   blocked_share=0.03, lunch_share=0.02) -> dict:
+    # lapkulcs -> cellaértékek (fejléccel), ahogy a values:batchGet visszaadná
+    rng   = random.Random(seed)
+    uid   = lambda: str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    hhmm  = lambda m: f"{m//60:02d}:{m%60:02d}"
+    first = first or date.today() - timedelta(days=n//per_day//2)
+    ls, ld = to_min(DEFAULT_LUNCH_START), DEFAULT_LUNCH_DUR
+
+    days, d = [], first
+    while len(days) < -(-n//per_day)*(1 + blocked_share):
+        if day_rule_violation(d) is None:
+            days.append(d)
+        d += timedelta(days=1)
+    blocked = set(rng.sample(days, int(len(days)*blocked_share)))
+    days    = [d for d in days if d not in blocked]
+    dayset  = set(days)
+    lunch   = {d: (rng.choice([ls + 30, ls + 60]), rng.choice([30, 60]))
+               for d in rng.sample(days, int(len(days)*lunch_share))}
+    starts  = _starts(ls, ld)
+
+    users = []
+    for i in range(max(10, n//40)):
+        last = rng.choice(LAST_NAMES)
+        kids = [f"{rng.choice(FIRST_NAMES)} {last}" for _ in range(rng.choice([1, 1, 2]))]
+        users.append((f"{last.lower()}{i:04d}", kids))
+
+    taken, rows = dict.fromkeys(days, 0), []
+    def place(d, start, dur, user, names, gid=""):
+        mask = _cells(start, dur)
+        if d not in dayset or taken[d] & mask:
+            return False
+        taken[d] |= mask
+        rows.append([d.isoformat(), names, rng.choice(HORSES), hhmm(start), dur, len(names.split(", ")),
+                     bool(gid), gid, "örökítés" if gid else "", user, uid()])
+        return True
+
+    # heti sorozatok (Örökítés), aztán egyszeri foglalások a maradék helyekre
+    while len(rows) < n*recurring:
+        user, kids = rng.choice(users)
+        dur   = rng.choice(DURATIONS)
+        start = rng.choice(starts[dur])
+        d0, gid = rng.choice(days), uid()
+        for k in range(rng.randint(6, 40)):
+            if len(rows) >= n*recurring:
+                break
+            place(d0 + timedelta(weeks=k), start, dur, user, kids[0], gid)
+    misses = 0
+    while len(rows) < n and misses < 50*n:
+        user, kids = rng.choice(users)
+        dur = rng.choice(DURATIONS)
+        if not place(rng.choice(days), rng.choice(starts[dur]), dur, user, ", ".join(kids)):
+            misses += 1
+    rng.shuffle(rows)
+
+    return {
+        "bookings": [BOOKING_COLUMNS] + rows,
+        "users":    [["username", "password"]] + [[u, f"jelszo{i}"] for i, (u, _) in enumerate(users)],
+        "blocked":  [["Dátum"]] + [[d.isoformat()] for d in sorted(blocked)],
+        "settings": [["Key", "Value"], ["lunch_start", hhmm(ls)], ["lunch_dur", ld], ["break_min", 10]],
+        "lunch":    [["Dátum", "Kezdes", "HosszPerc"]] + [[d.isoformat(), hhmm(s), l] for d, (s, l) in sorted(lunch.items())],
+    }
+
+def fake_book(data: dict, latency=0.0) -> FakeSpreadsheet:
+    book = FakeSpreadsheet(SHEET_KEY, latency=latency)
+    for key, (titles, initial) in SHEETS.items():
+        values = data.get(key, initial)
+        book.add_sheet(titles[0], values, rows=len(values) + 100, cols=max(map(len, values)) + 2)
+    return book
+
+
+# ---- Időmérés ----
+def measure(book: FakeSpreadsheet, fn, runs: int, setup=None) -> dict:
+    # fn futásonként; a setup ideje és hívásai nem számítanak bele
+    times, calls, sent, recv = [], 0, 0, 0
+    for _ in range(runs):
+        arg = setup() if setup else None
+        before = book.counters()
+        t0 = _time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append((_time.perf_counter() - t0)*1000)
+        after = book.counters()
+        calls += after["calls"] - before["calls"]
+        sent  += after["bytes_sent"] - before["bytes_sent"]
+        recv  += after["bytes_received"] - before["bytes_received"]
+    return {"ms_median": round(statistics.median(times), 3), "ms_min": round(min(times), 3),
+            "ms_max": round(max(times), 3), "runs": runs, "api_calls": calls/runs,
+            "bytes_sent": sent//runs, "bytes_received": recv//runs}
+
+def busiest(idx, k: int) -> list:
+    return sorted(idx.dates(), key=lambda d: -len(idx.day(d)))[:k]
+
+def run_size(n: int, *, latency=0.0, repeat=5, seed=0, only=None) -> dict:
+    book    = fake_book(synthetic_data(n, seed=seed), latency)
+    storage = lambda: SheetsStorage(SHEET_KEY, None, client=fake_client(book))
+    main    = storage()
+    heavy   = min(repeat, HEAVY_MAX)
+    out     = {}
+    want    = lambda name: not only or any(name.startswith(p) for p in only)
+
+    if want("load_bookings_df.cold"):
+        out["load_bookings_df.cold"] = measure(book, lambda s: s.load_bookings(), heavy, setup=storage)
+    df, idx  = main.load_bookings()
+    settings = settings_values(main.load_settings())
+    blocked  = main.load_blocked()["Dátum"].tolist()
+    lunch_df = main.load_lunch_overrides()
+    out["_data"] = {"rows": int(len(df)), "days": len(idx.dates()), "recurring": int(df["Ismétlődik"].sum()),
+                    "blocked": len(blocked), "lunch_overrides": int(len(lunch_df))}
+    if want("load_bookings_df.warm"):
+        out["load_bookings_df.warm"] = measure(book, main.load_bookings, repeat)
+    if want("load_bookings_df.delta"):
+        writer = storage()
+        def one_write():
+            writer.append_bookings([new_booking(date.today(), "Mérés", START_TIME, 30, "bench")])
+            main.expire(["bookings"])
+        out["load_bookings_df.delta"] = measure(book, lambda _: main.load_bookings(), repeat, setup=one_write)
+        df, idx = main.load_bookings()
+
+    # a felület hívásai: a legzsúfoltabb napokon / héten
+    days = busiest(idx, 50)
+    lunch_for = lambda d: day_lunch(lunch_df, d, settings["lunch_start"], settings["lunch_dur"])
+    def lunch_minutes(d):
+        ls, ld = lunch_for(d)
+        return to_min(ls), int(ld)
+    for dur in DURATIONS:
+        if want(f"get_free_slots.{dur}"):
+            def slots(dur=dur):
+                for d in days:
+                    ls, ld = lunch_for(d)
+                    day_free_slots(idx.day(d), ls, ld, settings["break_min"])[dur]
+            r = measure(book, slots, repeat)
+            r["ms_per_call"] = round(r["ms_median"]/len(days), 4)
+            out[f"get_free_slots.{dur}"] = r
+    if want("orokites_check"):
+        d0 = days[0]
+        dates = WeeklyRule(first=d0 + timedelta(weeks=1), until=d0 + timedelta(days=365)).dates()
+        out["orokites_check"] = measure(book, lambda: check_series(
+            dates, to_min(START_TIME) + 60, 60, idx, blocked=blocked,
+            lunch_for=lunch_minutes, day_end=to_min(END_TIME)), repeat)
+    if want("admin_week_filter"):
+        iy, wn = days[0].isocalendar()[:2]
+        out["admin_week_filter"] = measure(book, lambda: df.loc[idx.labels_in_week(iy, wn)], repeat)
+    if want("admin_row_update"):
+        # az admin lista egy módosítása: csak az érintett sor és az index változik
+        label = idx.labels_on(days[0])[0]
+        out["admin_row_update"] = measure(book, lambda: apply_update_at(df, idx, label, {"Kezdés": "09:00"}), repeat)
+    if want("generate_ics"):
+        out["generate_ics"] = measure(book, lambda: generate_ics(df), heavy)
+    if want("append_bookings"):
+        out["append_bookings"] = measure(book, lambda: main.append_bookings(
+            [new_booking(days[-1], "Mérés", START_TIME, 30, "bench")]), repeat)
+    # egy sor módosítása / törlése: csak a célsor ID cellája és a lap vége jön le
+    ids = iter(main.load_bookings()[0]["ID"].tolist())
+    if want("update_bookings"):
+        out["update_bookings"] = measure(book, lambda: main.update_bookings({next(ids): {"Lovak": "Mérés"}}), repeat)
+    if want("delete_bookings"):
+        out["delete_bookings"] = measure(book, lambda: main.delete_bookings([next(ids)]), repeat)
+    if want("save_df_to_sheet"):
+        full = main.load_bookings()[0]
+        out["save_df_to_sheet"] = measure(book, lambda: main.save_table("bookings", full), heavy)
+    return out
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Teljesítménymérés szintetikus adaton, memóriabeli Sheets mögött")
+    p.add_argument("--sizes", default=",".join(map(str, SIZES)), help="sorok száma, vesszővel")
+    p.add_argument("--latency", type=float, default=0.0, help="késleltetés API hívásonként (mp)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--ops", default="", help="csak ezekkel kezdődő műveletek, vesszővel")
+    p.add_argument("--out", help="az eredmény ide is kiíródik")
+    args = p.parse_args(argv)
+
+    only = [o for o in args.ops.split(",") if o]
+    result = {
+        "meta": {"git": _git_rev(), "python": platform.python_version(), "pandas": pd.__version__,
+                 "numpy": np.__version__, "latency_s": args.latency, "repeat": args.repeat,
+                 "seed": args.seed, "started": _time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": {},
+    }
+    for n in (int(s) for s in args.sizes.split(",") if s):
+        print(f"{n} sor...", file=sys.stderr)
+        result["results"][str(n)] = run_size(n, latency=args.latency, repeat=args.repeat,
+                                             seed=args.seed, only=only)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__=="__main__":
+    main()
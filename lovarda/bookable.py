@@ -0,0 +1,93 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from lovarda.recurrence import DAY_MIN
+from lovarda.rules import rule_mask
+from lovarda.slots import booked_intervals, candidate_starts, from_min, overlaps, to_min
+
+# ---- Foglalható napok naptára ----
+# A napi szabályokat (július / augusztus, tiltott napok, napi ebédszünet)
+# egyszer fordítjuk tömbökre a vizsgált időszakra: nap sorszáma -> foglalható-e,
+# ebéd kezdete és hossza percben. Erre épül a több napos keresés: minden nap
+# jelöltjei és foglalásai nap*1440 + perc kulcson egy tömbbe kerülnek, és egy
+# searchsorted hívás dönt mindről.
+
+
+class BookableCalendar:
+    def __init__(self, first: date, ok, lunch_start, lunch_dur):
+        self.first       = first
+        self.ok          = ok           # bool, napi
+        self.lunch_start = lunch_start  # perc, napi
+        self.lunch_dur   = lunch_dur    # perc, napi
+
+    @classmethod
+    def compile(cls, first: date, days: int, *, blocked=(), lunch_over_df=None,
+                lunch_start=12*60, lunch_dur=45):
+        ords = first.toordinal() + np.arange(days)
+        dts  = pd.to_datetime(pd.Series(ords - date(1970, 1, 1).toordinal()), unit="D")
+        ok   = rule_mask(dts.dt.weekday.to_numpy(), dts.dt.month.to_numpy())
+        for d in blocked:
+            pos = d.toordinal() - first.toordinal()
+            if 0 <= pos < days:
+                ok[pos] = False
+        ls = np.full(days, lunch_start, dtype=np.int16)
+        ld = np.full(days, lunch_dur, dtype=np.int16)
+        if lunch_over_df is not None and not lunch_over_df.empty:
+            for d, s, m in zip(lunch_over_df["Dátum"], lunch_over_df["Kezdes"], lunch_over_df["HosszPerc"]):
+                pos = d.toordinal() - first.toordinal()
+                if 0 <= pos < days:
+                    ls[pos], ld[pos] = to_min(s), int(m)
+        return cls(first, ok, ls, ld)
+
+    def __len__(self):
+        return len(self.ok)
+
+    def _pos(self, d: date):
+        pos = d.toordinal() - self.first.toordinal()
+        return pos if 0 <= pos < len(self) else None
+
+    def bookable(self, d: date) -> bool:
+        pos = self._pos(d)
+        return pos is not None and bool(self.ok[pos])
+
+    def lunch(self, d: date):
+        pos = self._pos(d)
+        return (int(self.lunch_start[pos]), int(self.lunch_dur[pos])) if pos is not None else None
+
+    def next_free(self, index, duration: int, *, n=5, start: date = None, days: int = None,
+                  not_before: int = None, day_start: int, day_end: int, break_min: int) -> list:
+        # az első n szabad [(dátum, kezdés, vég)] a start naptól days napon át;
+        # not_before: a start napon ennél a percnél korábban nem kezdünk
+        first = max(0, (start or self.first).toordinal() - self.first.toordinal())
+        last  = len(self) if days is None else min(len(self), first + days)
+        pos   = first + np.flatnonzero(self.ok[first:last])
+        if not len(pos) or n <= 0:
+            return []
+
+        # jelöltek: napi ebédenként egyszer számolt kezdések, nap-eltolással
+        pairs, inv = np.unique(np.stack([self.lunch_start[pos], self.lunch_dur[pos]]), axis=1,
+                               return_inverse=True)
+        cand = []
+        for g in range(pairs.shape[1]):
+            starts = candidate_starts(duration, day_start, day_end, int(pairs[0, g]),
+                                      int(pairs[1, g]), break_min)
+            cand.append((pos[inv.ravel()==g][:, None]*DAY_MIN + starts[None, :]).ravel())
+        cand = np.sort(np.concatenate(cand))
+        if not_before is not None:
+            cand = cand[cand >= first*DAY_MIN + not_before]
+
+        # foglalások ugyanazokon a napokon, ugyanabban a kulcstérben
+        bstarts, bdurs = [], []
+        for p in pos.tolist():
+            day = index.day(self.first + timedelta(days=p))
+            if len(day):
+                bstarts.append(day.starts + p*DAY_MIN)
+                bdurs.append(day.ends - day.starts)
+        if bstarts:
+            bs, be_max = booked_intervals(np.concatenate(bstarts), np.concatenate(bdurs))
+            cand = cand[~overlaps(cand, cand + duration, bs, be_max)]
+
+        return [(self.first + timedelta(days=int(k//DAY_MIN)), from_min(k%DAY_MIN),
+                 from_min(k%DAY_MIN + duration)) for k in cand[:n].tolist()]
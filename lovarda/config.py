@@ -0,0 +1,17 @@
+import os
+
+# ---- Tárolási beállítások ----
+# LOVARDA_STORAGE: "sheets" (alapértelmezett), "sqlite" vagy "replica"
+# (Google Sheets az elsődleges, olvasás helyi SQLite másolatból).
+
+GOOGLE_SHEET_ID = "1xGeEqZ0Y-o7XEIR0mOBvgvTk7FVRzz7TTGRKrSCy6Uo"
+GOOGLE_JSON     = "mystic-fountain-300911-9b2c042063fa.json"
+STORAGE_BACKEND = os.environ.get("LOVARDA_STORAGE", "sheets")
+SQLITE_PATH     = os.environ.get("LOVARDA_DB", "lovarda.db")
+WRITE_BEHIND    = os.environ.get("LOVARDA_WRITE_BEHIND", "1")!="0"  # háttérben író sor
+SHARED_CACHE    = os.environ.get("LOVARDA_SHARED_CACHE", "")  # több példány közös gyorsítótára (fájl)
+METRICS_LOG     = os.environ.get("LOVARDA_METRICS_LOG", "")   # futásonkénti mérések JSON sorokban
+
+# Sheets API kvóta (kérés / perc / folyamat); a Google alapkorlát 60 / perc / felhasználó
+SHEETS_READS_PER_MIN  = float(os.environ.get("LOVARDA_SHEETS_READS", "60"))
+SHEETS_WRITES_PER_MIN = float(os.environ.get("LOVARDA_SHEETS_WRITES", "60"))
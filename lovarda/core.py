@@ -0,0 +1,59 @@
+import hmac
+from datetime import date, datetime, time
+
+import pandas as pd
+
+from lovarda.index import DayIntervals
+from lovarda.rows import OWNER_COL, ROW_ID_COL, new_row_id
+from lovarda.slots import free_slots, from_min, to_min
+
+# ---- Foglalási logika ----
+# Felület és hálózat nélkül: a Streamlit felület és a mérések is ezt hívják.
+
+START_TIME          = time(9,0)
+END_TIME            = time(20,30)
+DEFAULT_BREAK_MIN   = 10
+DEFAULT_LUNCH_START = time(12,0)
+DEFAULT_LUNCH_DUR   = 45  # perc
+
+
+def settings_values(df: pd.DataFrame) -> dict:
+    # Beallitasok lap -> globális ebédszünet és átnyergelés, alapértékekkel
+    raw = df.set_index("Key")["Value"].to_dict()
+    return {
+        "lunch_start": datetime.strptime(raw.get("lunch_start", DEFAULT_LUNCH_START.strftime("%H:%M")), "%H:%M").time(),
+        "lunch_dur":   int(raw.get("lunch_dur", DEFAULT_LUNCH_DUR)),
+        "break_min":   int(raw.get("break_min", DEFAULT_BREAK_MIN)),
+    }
+
+def day_lunch(lunch_over_df: pd.DataFrame, d: date, lunch_start: time, lunch_dur: int):
+    # napi felülírás, ha van, különben a globális ebédszünet
+    odf = lunch_over_df[lunch_over_df["Dátum"]==d]
+    if not odf.empty:
+        return odf.iloc[0]["Kezdes"], int(odf.iloc[0]["HosszPerc"])
+    return lunch_start, int(lunch_dur)
+
+def day_free_slots(day: DayIntervals, lunch_start: time, lunch_dur: int, break_min: int) -> dict:
+    mins = free_slots(
+        day.starts, day.ends - day.starts,
+        day_start=to_min(START_TIME), day_end=to_min(END_TIME),
+        lunch_start=to_min(lunch_start), lunch_dur=lunch_dur, break_min=break_min,
+    )
+    return {dur: [(from_min(s), from_min(e)) for s,e in v] for dur,v in mins.items()}
+
+def user_directory(users_df: pd.DataFrame) -> dict:
+    # felhasználónév -> jelszó; egyszer épül, a belépés egy szótár-kikeresés
+    return dict(zip(users_df["username"].astype(str), users_df["password"].astype(str)))
+
+def check_login(directory: dict, username: str, password: str) -> bool:
+    stored = directory.get(username)
+    return stored is not None and hmac.compare_digest(stored.encode(), str(password).encode())
+
+def new_booking(d: date, names: str, start: time, duration: int, owner: str) -> dict:
+    return {
+        "Dátum":d, "Gyermek(ek) neve":names,
+        "Lovak":"", "Kezdés":start.strftime("%H:%M"),
+        "Időtartam (perc)":duration,"Fő":1,
+        "Ismétlődik":False, "RepeatGroupID":"", "Megjegyzés":"",
+        OWNER_COL:owner, ROW_ID_COL:new_row_id()
+    }
@@ -0,0 +1,283 @@
+import re
+import threading
+import time as _time
+from collections import Counter, deque
+from json import dumps
+from urllib.parse import unquote
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, absolute_range_name, rowcol_to_a1
+
+# ---- Memóriabeli Google Sheets a mérésekhez ----
+# A gspread HTTP munkamenetét helyettesíti: a valódi gspread, gspread-dataframe
+# és lovarda.sheets kód fut, csak a Sheets API v4 végpontjai ebben a
+# modulban, memóriában válaszolnak. Minden hívást számol (művelet és átvitt
+# bájt szerint), és hívásonként latency mp késleltetést ad. A fail_next-tel
+# sorba állított hibakódokat (429, 5xx) a következő hívások kapják meg.
+
+API = "https://sheets.googleapis.com/v4/spreadsheets/"
+_COUNTA = re.compile(r"^=COUNTA\(([A-Z]+):\1\)$")
+_INT    = re.compile(r"^-?\d+$")
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self.content     = dumps(payload, ensure_ascii=False, default=str).encode()
+        self.text        = self.content.decode()
+        self.ok          = status_code < 400
+        self._payload    = payload
+
+    def json(self):
+        return self._payload
+
+
+def _col_index(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n*26 + ord(ch) - 64
+    return n - 1
+
+def _entered(v):
+    # USER_ENTERED: a számnak látszó szöveg számként kerül a cellába
+    if isinstance(v, str) and _INT.match(v):
+        return int(v)
+    return v
+
+def _trim(rows: list) -> list:
+    # az API a sorok és a tartomány végéről elhagyja az üres cellákat
+    rows = [list(r) for r in rows]
+    for r in rows:
+        while r and r[-1] in ("", None):
+            r.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class FakeSheet:
+    def __init__(self, sheet_id: int, title: str, rows=1000, cols=26):
+        self.id, self.title = sheet_id, title
+        self.rows, self.cols = rows, cols
+        self.grid = []  # sorok listája, a sorok változó hosszúak
+
+    def properties(self, index=0) -> dict:
+        return {"sheetId": self.id, "title": self.title, "index": index, "sheetType": "GRID",
+                "gridProperties": {"rowCount": self.rows, "columnCount": self.cols}}
+
+    def cell(self, r: int, c: int):
+        row = self.grid[r] if r < len(self.grid) else ()
+        v = row[c] if c < len(row) else ""
+        m = _COUNTA.match(v) if isinstance(v, str) else None
+        if m:
+            col = _col_index(m.group(1))
+            return sum(1 for row in self.grid if col < len(row) and row[col] not in ("", None))
+        return v
+
+    def read(self, g: dict, by_cols=False) -> list:
+        r0, c0 = g.get("startRowIndex", 0), g.get("startColumnIndex", 0)
+        r1 = min(g.get("endRowIndex", len(self.grid)), len(self.grid))
+        r1 = max(r1, r0)
+        width = max((len(r) for r in self.grid[r0:r1]), default=0)
+        c1 = min(g.get("endColumnIndex", width), max(width, c0))
+        rows = [[self.cell(r, c) for c in range(c0, c1)] for r in range(r0, r1)]
+        if by_cols:
+            rows = [list(col) for col in zip(*rows)] if rows else []
+        return _trim(rows)
+
+    def write(self, g: dict, values: list, entered=True):
+        r0, c0 = g.get("startRowIndex", 0), g.get("startColumnIndex", 0)
+        for i, row in enumerate(values):
+            r = r0 + i
+            while len(self.grid) <= r:
+                self.grid.append([])
+            line = self.grid[r]
+            if len(line) < c0 + len(row):
+                line.extend([""]*(c0 + len(row) - len(line)))
+            line[c0:c0 + len(row)] = [_entered(v) if entered else v for v in row]
+        self.rows = max(self.rows, len(self.grid))
+        self.cols = max(self.cols, max((len(r) for r in self.grid), default=0))
+
+    def last_row(self) -> int:
+        # az utolsó nem üres sor utáni sor indexe (append ide ír)
+        n = len(self.grid)
+        while n and not any(v not in ("", None) for v in self.grid[n - 1]):
+            n -= 1
+        return n
+
+
+class FakeSpreadsheet:
+    def __init__(self, key="fake", title="Lovarda", latency=0.0):
+        self.key, self.title = key, title
+        self.latency = latency
+        self.sheets  = []
+        self.calls   = Counter()  # művelet -> hívások száma
+        self.bytes   = Counter()  # "sent" / "received"
+        self.faults  = deque()    # (státusz, végrehajtva-e) a következő hívásokra
+        self._lock   = threading.Lock()
+
+    # ---- feltöltés és lekérdezés a mérésekhez ----
+    def add_sheet(self, title: str, values=(), rows=1000, cols=26) -> FakeSheet:
+        sheet = FakeSheet(max((s.id for s in self.sheets), default=0) + 1, title, rows, cols)
+        if values:
+            sheet.write({}, [list(r) for r in values], entered=False)
+        self.sheets.append(sheet)
+        return sheet
+
+    def fail_next(self, *statuses, applied=False):
+        # applied=True: a kérés lefut, csak a válasz hiba (pl. 503 egy már tárolt append után)
+        with self._lock:
+            self.faults.extend((s, applied) for s in statuses)
+
+    def sheet(self, title: str) -> FakeSheet:
+        return next(s for s in self.sheets if s.title==title)
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {"calls": sum(self.calls.values()), **{f"calls.{k}": v for k, v in self.calls.items()},
+                    "bytes_sent": self.bytes["sent"], "bytes_received": self.bytes["received"]}
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes.clear()
+
+    # ---- tartományok ----
+    def _range(self, name: str):
+        name = unquote(name)
+        if name.startswith("'"):
+            end = name.find("'", 1)
+            while end!=-1 and name[end + 1:end + 2]=="'":
+                end = name.find("'", end + 2)
+            title, rest = name[1:end].replace("''", "'"), name[end + 1:]
+        else:
+            title, _, rest = name.partition("!")
+            rest = "!" + rest if rest else ""
+        rng = rest[1:] if rest.startswith("!") else ""
+        return self.sheet(title), (a1_range_to_grid_range(rng) if rng else {})
+
+    # ---- végpontok ----
+    def _metadata(self, params, body):
+        return {"spreadsheetId": self.key, "properties": {"title": self.title},
+                "sheets": [{"properties": s.properties(i)} for i, s in enumerate(self.sheets)]}
+
+    def _batch_get(self, params, body):
+        dim = (params or {}).get("majorDimension") or "ROWS"
+        out = []
+        for name in params["ranges"]:
+            sheet, g = self._range(name)
+            out.append({"range": name, "majorDimension": dim, "values": sheet.read(g, dim=="COLUMNS")})
+        return {"spreadsheetId": self.key, "valueRanges": out}
+
+    def _get(self, name, params, body):
+        sheet, g = self._range(name)
+        dim = (params or {}).get("majorDimension") or "ROWS"
+        return {"range": name, "majorDimension": dim, "values": sheet.read(g, dim=="COLUMNS")}
+
+    def _update(self, name, params, body):
+        sheet, g = self._range(name)
+        sheet.write(g, body["values"], (params or {}).get("valueInputOption")!="RAW")
+        return {"updatedRange": name, "updatedRows": len(body["values"])}
+
+    def _append(self, name, params, body):
+        sheet, g = self._range(name)
+        first, values = sheet.last_row(), body["values"]
+        g = dict(g, startRowIndex=first)
+        sheet.write(g, values, params.get("valueInputOption")!="RAW")
+        # mint az API: a ténylegesen írt tartomány
+        c0  = g.get("startColumnIndex", 0)
+        rng = f"{rowcol_to_a1(first + 1, c0 + 1)}:{rowcol_to_a1(first + len(values), c0 + max(map(len, values)))}"
+        return {"updates": {"updatedRange": absolute_range_name(sheet.title, rng),
+                            "updatedRows": len(values)}}
+
+    def _clear(self, name, params, body):
+        sheet, g = self._range(name)
+        if not g:
+            sheet.grid = []
+        else:
+            sheet.write(g, [[""]*(g.get("endColumnIndex", sheet.cols) - g.get("startColumnIndex", 0))
+                            for _ in range(g.get("endRowIndex", len(sheet.grid)) - g.get("startRowIndex", 0))],
+                        entered=False)
+        return {"clearedRange": name}
+
+    def _values_batch_update(self, params, body):
+        raw = body.get("valueInputOption")=="RAW"
+        for item in body["data"]:
+            sheet, g = self._range(item["range"])
+            sheet.write(g, item["values"], not raw)
+        return {"totalUpdatedCells": sum(len(r) for d in body["data"] for r in d["values"])}
+
+    def _batch_update(self, params, body):
+        replies = []
+        for req in body["requests"]:
+            if "addSheet" in req:
+                p = req["addSheet"]["properties"]
+                gp = p.get("gridProperties", {})
+                s = self.add_sheet(p["title"], rows=gp.get("rowCount", 1000), cols=gp.get("columnCount", 26))
+                replies.append({"addSheet": {"properties": s.properties(len(self.sheets) - 1)}})
+            elif "deleteDimension" in req:
+                r = req["deleteDimension"]["range"]
+                s = next(s for s in self.sheets if s.id==r["sheetId"])
+                del s.grid[r["startIndex"]:r["endIndex"]]
+                replies.append({})
+            elif "updateSheetProperties" in req:
+                p = req["updateSheetProperties"]["properties"]
+                s = next(s for s in self.sheets if s.id==p["sheetId"])
+                gp = p.get("gridProperties", {})
+                s.rows, s.cols = gp.get("rowCount", s.rows), gp.get("columnCount", s.cols)
+                replies.append({})
+            else:
+                raise ValueError(f"nem támogatott kérés: {list(req)}")
+        return {"spreadsheetId": self.key, "replies": replies}
+
+    def handle(self, method: str, url: str, params=None, body=None):
+        head, _, path = url[len(API):].partition("/")
+        key, _, action = head.partition(":")
+        if key!=self.key:
+            return "notfound", {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}}, 404
+        if method=="get" and not path:
+            op, fn = "metadata", lambda: self._metadata(params, body)
+        elif action=="batchUpdate":
+            op, fn = "batchUpdate", lambda: self._batch_update(params, body)
+        elif path=="values:batchGet":
+            op, fn = "values.batchGet", lambda: self._batch_get(params, body)
+        elif path=="values:batchUpdate":
+            op, fn = "values.batchUpdate", lambda: self._values_batch_update(params, body)
+        elif path.endswith(":append"):
+            op, fn = "values.append", lambda: self._append(path[7:-7], params, body)
+        elif path.endswith(":clear"):
+            op, fn = "values.clear", lambda: self._clear(path[7:-6], params, body)
+        elif method=="get":
+            op, fn = "values.get", lambda: self._get(path[7:], params, body)
+        elif method=="put":
+            op, fn = "values.update", lambda: self._update(path[7:], params, body)
+        else:
+            raise ValueError(f"nem támogatott hívás: {method} {url}")
+        with self._lock:
+            status, applied = self.faults.popleft() if self.faults else (200, True)
+            payload = fn() if applied else None
+        if status!=200:
+            return op, {"error": {"code": status, "message": "injected", "status": "UNAVAILABLE"}}, status
+        return op, payload, 200
+
+
+class FakeSession:
+    # a requests.Session helyett; a gspread HTTPClient csak a request metódust hívja
+    def __init__(self, book: FakeSpreadsheet):
+        self.book = book
+
+    def request(self, method=None, url=None, params=None, data=None, json=None, **kw):
+        if self.book.latency:
+            _time.sleep(self.book.latency)
+        op, payload, status = self.book.handle(method.lower(), url, params, json)
+        resp = FakeResponse(payload, status)
+        with self.book._lock:
+            self.book.calls[op] += 1
+            self.book.bytes["sent"]     += len(dumps(json, default=str)) if json else 0
+            self.book.bytes["received"] += len(resp.content)
+        return resp
+
+
+def fake_client(book: FakeSpreadsheet, http_client=gspread.HTTPClient) -> gspread.Client:
+    # http_client=QuotaHTTPClient: a kvóta / újrapróbálás réteg is a mért úton fut
+    return gspread.Client(auth=None, session=FakeSession(book), http_client=http_client)
@@ -0,0 +1,110 @@
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+
+import pandas as pd
+
+from lovarda.metrics import METRICS
+from lovarda.rows import ROW_ID_COL
+from lovarda.schema import minutes_hhmm
+
+# ---- ICS export ----
+# Az eseménysorokat oszloponként, egyben állítjuk elő (nincs iterrows és
+# soronkénti strptime). Az UID a foglalás sor ID-jából jön, így egy
+# újraimportálás frissíti a naptárbejegyzést, nem duplikálja. A kimenet
+# darabokban érkező generátor; a kész fájlt (felhasználó, adatverzió,
+# időszak) szerint tároljuk.
+
+UID_DOMAIN = "lovarda-foglalo"
+CHUNK_ROWS = 500
+HEADER     = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Lovarda Foglaló//EN"]
+FOOTER     = ["END:VCALENDAR"]
+
+
+def _escape(s: pd.Series) -> pd.Series:
+    # RFC 5545 szöveg: \ ; , és sortörés escape-elése
+    return (s.astype(str).str.replace("\\", "\\\\", regex=False)
+             .str.replace(";", "\\;", regex=False).str.replace(",", "\\,", regex=False)
+             .str.replace("\r\n", "\\n", regex=False).str.replace("\n", "\\n", regex=False))
+
+
+def _uids(df: pd.DataFrame) -> pd.Series:
+    ids = df[ROW_ID_COL].astype(str) if ROW_ID_COL in df.columns else pd.Series("", index=df.index)
+    # ID nélküli (régi) sor: a tartalmából képzett, szintén stabil UUID
+    missing = ids.str.strip()==""
+    if missing.any():
+        key = (df.loc[missing, "Dátum"].dt.strftime("%Y-%m-%d") + "|"
+               + minutes_hhmm(df.loc[missing, "Kezdés"]) + "|"
+               + df.loc[missing, "Gyermek(ek) neve"].astype(str))
+        ids = ids.where(~missing, pd.Series([str(uuid.uuid5(uuid.NAMESPACE_URL, k)) for k in key],
+                                            index=key.index, dtype=object))
+    return ids + "@" + UID_DOMAIN
+
+
+def filter_range(df: pd.DataFrame, date_from: date = None, date_to: date = None) -> pd.DataFrame:
+    if df.empty or (date_from is None and date_to is None):
+        return df
+    d = df["Dátum"]
+    mask = d.notna()
+    if date_from is not None:
+        mask &= d >= pd.Timestamp(date_from)
+    if date_to is not None:
+        mask &= d <= pd.Timestamp(date_to)
+    return df[mask]
+
+
+def event_lines(df: pd.DataFrame, stamp: datetime = None) -> pd.Series:
+    # soronként egy kész VEVENT blokk (CRLF-fel tagolva); a df típusos (lovarda.schema)
+    if df.empty:
+        return pd.Series([], dtype=object)
+    ok = df["Dátum"].notna() & df["Kezdés"].notna() & df["Időtartam (perc)"].notna()
+    df = df[ok]
+    if df.empty:
+        return pd.Series([], dtype=object)
+    start = df["Dátum"] + pd.to_timedelta(df["Kezdés"].to_numpy(dtype="int64"), unit="m")
+    end   = start + pd.to_timedelta(df["Időtartam (perc)"].to_numpy(dtype="int64"), unit="m")
+    stamp = (stamp or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    return ("BEGIN:VEVENT\r\nUID:" + _uids(df)
+            + "\r\nDTSTAMP:" + stamp
+            + "\r\nDTSTART:" + start.dt.strftime("%Y%m%dT%H%M%S")
+            + "\r\nDTEND:" + end.dt.strftime("%Y%m%dT%H%M%S")
+            + "\r\nSUMMARY:Lovarda foglalás (" + _escape(df["Gyermek(ek) neve"]) + ")"
+            + "\r\nEND:VEVENT")
+
+
+def iter_ics(df: pd.DataFrame, date_from: date = None, date_to: date = None, stamp: datetime = None):
+    # a naptárfájl CHUNK_ROWS eseményenként, szövegdarabokban
+    yield "\r\n".join(HEADER) + "\r\n"
+    events = event_lines(filter_range(df, date_from, date_to), stamp)
+    for i in range(0, len(events), CHUNK_ROWS):
+        yield "\r\n".join(events.iloc[i:i+CHUNK_ROWS]) + "\r\n"
+    yield "\r\n".join(FOOTER)
+
+
+def generate_ics(df: pd.DataFrame, date_from: date = None, date_to: date = None) -> str:
+    return "".join(iter_ics(df, date_from, date_to))
+
+
+class IcsCache:
+    # (felhasználó, adatverzió, időszak) -> kész fájl bájtokban; kis LRU
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock  = threading.Lock()
+
+    def get(self, key, build_df, date_from: date = None, date_to: date = None) -> bytes:
+        key = (key, date_from, date_to)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                METRICS.cache("ics", True)
+                return self._items[key]
+        METRICS.cache("ics", False)
+        with METRICS.timed("ics.generate"):
+            data = "".join(iter_ics(build_df(), date_from, date_to)).encode("utf-8")
+        with self._lock:
+            self._items[key] = data
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return data
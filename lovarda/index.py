@@ -0,0 +1,216 @@
+from bisect import insort
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.stats import Rollups
+
+# ---- Napi foglalás-index ----
+# Betöltéskor egyszer épül: dátum -> kezdés szerint rendezett (kezdés, vég,
+# sor ID, df-címke) tömbök, plusz ISO (év, hét) -> dátumok. Így a napi,
+# heti és ütközés-lekérdezések nem szűrik végig a teljes táblát. A saját
+# foglalásokhoz fordított index: felhasználó -> sorok, gyermeknév -> sorok,
+# az Örökítés sorozatokhoz sorozat ID -> sorok.
+# Minden add/remove a statisztikai összesítőket (stats) is frissíti.
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class DayIntervals:
+    __slots__ = ("starts", "ends", "ids", "labels")
+
+    def __init__(self, starts, ends, ids, labels):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends   = np.asarray(ends, dtype=np.int64)
+        self.ids    = list(ids)
+        self.labels = list(labels)
+
+    def __len__(self):
+        return len(self.ids)
+
+EMPTY_DAY = DayIntervals(_EMPTY, _EMPTY, [], [])
+
+
+def person_key(s) -> str:
+    return " ".join(str(s).split()).casefold() if isinstance(s, str) else ""
+
+def series_key(group) -> str:
+    return group.strip() if isinstance(group, str) else ""
+
+def name_keys(names) -> set:
+    # "Anna, Béla" -> {"anna", "béla"}
+    return {k for k in map(person_key, names.split(",")) if k} if isinstance(names, str) else set()
+
+def _valid_rows(df: pd.DataFrame) -> pd.Series:
+    # a típusos táblán (lovarda.schema): hiányzó dátum / kezdés / hossz = <NA>
+    return df["Dátum"].notna() & df["Kezdés"].notna() & df["Időtartam (perc)"].notna()
+
+
+class BookingIndex:
+    def __init__(self):
+        self._days  = {}                 # date -> DayIntervals
+        self._weeks = defaultdict(list)  # (iso év, hét) -> rendezett dátumok
+        self._where = {}                 # sor ID -> dátum
+        self._owned = defaultdict(dict)  # felhasználó kulcs -> {sor ID: df-címke}
+        self._named = defaultdict(dict)  # gyermeknév kulcs -> {sor ID: df-címke}
+        self._tags  = {}                 # sor ID -> (felhasználó kulcs, gyermeknév kulcsok)
+        self._series = defaultdict(dict)  # sorozat ID -> {sor ID: dátum}
+        self._group  = {}                 # sor ID -> sorozat ID
+        self.stats  = Rollups()
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame):
+        idx = cls()
+        if df.empty or "Dátum" not in df.columns:
+            return idx
+        df = df[_valid_rows(df)]
+        if df.empty:
+            return idx
+        starts = df["Kezdés"].to_numpy(dtype=np.int64)
+        frame  = pd.DataFrame({
+            "d":     df["Dátum"].to_numpy(),
+            "s":     starts,
+            "e":     starts + df["Időtartam (perc)"].to_numpy(dtype=np.int64),
+            "id":    df[ROW_ID_COL].astype(str).to_numpy(),
+            "label": df.index.to_numpy(),
+            "rec":   df["Ismétlődik"].to_numpy(dtype=bool) if "Ismétlődik" in df.columns else False,
+        }).sort_values(["d", "s"], kind="stable")
+        idx.stats = Rollups.from_frame(frame)
+        # napok határai a rendezett tömbön (groupby nélkül)
+        days   = frame["d"].to_numpy()
+        s, e   = frame["s"].to_numpy(), frame["e"].to_numpy()
+        ids, labels = frame["id"].tolist(), frame["label"].tolist()
+        cuts   = np.flatnonzero(days[1:]!=days[:-1]) + 1
+        for a, b in zip(np.r_[0, cuts].tolist(), np.r_[cuts, len(days)].tolist()):
+            d = pd.Timestamp(days[a]).date()
+            idx._days[d] = DayIntervals(s[a:b], e[a:b], ids[a:b], labels[a:b])
+            idx._weeks[d.isocalendar()[:2]].append(d)
+            idx._where.update(dict.fromkeys(ids[a:b], d))
+        if "RepeatGroupID" in df.columns:
+            grouped = df[df["RepeatGroupID"].map(series_key)!=""]
+            for rid, group in zip(grouped[ROW_ID_COL].astype(str).tolist(), grouped["RepeatGroupID"].tolist()):
+                idx._join(rid, series_key(group))
+        # a kulcsokat különböző névenként egyszer számoljuk
+        owners = df[OWNER_COL] if OWNER_COL in df.columns else pd.Series("", index=df.index)
+        ocodes, ovals = pd.factorize(owners.astype(object))
+        ncodes, nvals = pd.factorize(df["Gyermek(ek) neve"].astype(object))
+        okeys, nkeys  = [person_key(v) for v in ovals], [name_keys(v) for v in nvals]
+        for rid, label, oc, nc in zip(df[ROW_ID_COL].astype(str).tolist(), df.index.tolist(),
+                                      ocodes.tolist(), ncodes.tolist()):
+            idx._tag(rid, label, okeys[oc] if oc >= 0 else "", nkeys[nc] if nc >= 0 else set())
+        return idx
+
+    def copy(self):
+        # a napi tömböket add/remove nem módosítja helyben, elég a konténereket másolni
+        idx = BookingIndex()
+        idx._days  = dict(self._days)
+        idx._weeks = defaultdict(list, {k: list(v) for k, v in self._weeks.items()})
+        idx._where = dict(self._where)
+        idx._owned = defaultdict(dict, {k: dict(v) for k, v in self._owned.items()})
+        idx._named = defaultdict(dict, {k: dict(v) for k, v in self._named.items()})
+        idx._tags  = dict(self._tags)
+        idx._series = defaultdict(dict, {k: dict(v) for k, v in self._series.items()})
+        idx._group  = dict(self._group)
+        idx.stats  = self.stats.copy()
+        return idx
+
+    def _tag(self, row_id: str, label, okey: str, nkeys):
+        if okey:
+            self._owned[okey][row_id] = label
+        for k in nkeys:
+            self._named[k][row_id] = label
+        self._tags[row_id] = (okey, nkeys)
+
+    def _join(self, row_id: str, group: str):
+        if group:
+            self._series[group][row_id] = self._where[row_id]
+            self._group[row_id] = group
+
+    def _untag(self, row_id: str):
+        okey, nkeys = self._tags.pop(row_id, ("", ()))
+        for key, m in [(okey, self._owned)] + [(k, self._named) for k in nkeys]:
+            if key and key in m:
+                m[key].pop(row_id, None)
+                if not m[key]:
+                    del m[key]
+        group = self._group.pop(row_id, "")
+        if group:
+            self._series[group].pop(row_id, None)
+            if not self._series[group]:
+                del self._series[group]
+
+    # ---- lekérdezések ----
+    def __contains__(self, row_id) -> bool:
+        return row_id in self._where
+
+    def day(self, d: date) -> DayIntervals:
+        return self._days.get(d, EMPTY_DAY)
+
+    def dates(self):
+        return sorted(self._days)
+
+    def dates_in_week(self, iso_year: int, week: int) -> list:
+        return list(self._weeks.get((iso_year, week), []))
+
+    def labels_on(self, d: date) -> list:
+        return list(self.day(d).labels)
+
+    def labels_in_week(self, iso_year: int, week: int) -> list:
+        return [l for d in self.dates_in_week(iso_year, week) for l in self._days[d].labels]
+
+    def series_ids(self, group: str, since: date = None) -> list:
+        # a sorozat sorainak ID-i (since-től kezdve), a tábla bejárása nélkül
+        rows = self._series.get(series_key(group), {})
+        return [rid for rid, d in rows.items() if since is None or d >= since]
+
+    def labels_for_user(self, username: str) -> list:
+        # a felhasználó saját sorai; a tulajdonos nélküli régi sorok közül
+        # azok, ahol a felhasználónév az egyik gyermeknévvel pontosan egyezik
+        key  = person_key(username)
+        rows = dict(self._owned.get(key, {}))
+        for rid, label in self._named.get(key, {}).items():
+            if not self._tags[rid][0]:
+                rows[rid] = label
+        return sorted(rows.values())
+
+    # ---- módosítás a session-ön belül (új / törölt sorok) ----
+    def add(self, d: date, start_min: int, dur_min: int, row_id: str, label=None,
+            owner="", names="", recurring=False, group=""):
+        day = self.day(d)
+        pos = int(np.searchsorted(day.starts, start_min, side="right"))
+        self._days[d] = DayIntervals(
+            np.insert(day.starts, pos, start_min),
+            np.insert(day.ends, pos, start_min + dur_min),
+            day.ids[:pos] + [row_id] + day.ids[pos:],
+            day.labels[:pos] + [label] + day.labels[pos:],
+        )
+        if len(day)==0:
+            insort(self._weeks[d.isocalendar()[:2]], d)
+        self._where[row_id] = d
+        self._tag(row_id, label, person_key(owner), name_keys(names))
+        self._join(row_id, series_key(group))
+        self.stats.add(row_id, d, start_min, start_min + dur_min, recurring)
+
+    def remove(self, row_id: str):
+        d = self._where.pop(row_id, None)
+        if d is None:
+            return False
+        self._untag(row_id)
+        day  = self._days[d]
+        i    = day.ids.index(row_id)
+        self.stats.remove(row_id, d, int(day.starts[i]), int(day.ends[i]))
+        keep = [i for i, rid in enumerate(day.ids) if rid!=row_id]
+        if keep:
+            self._days[d] = DayIntervals(day.starts[keep], day.ends[keep],
+                                         [day.ids[i] for i in keep],
+                                         [day.labels[i] for i in keep])
+        else:
+            del self._days[d]
+            wk = d.isocalendar()[:2]
+            self._weeks[wk].remove(d)
+            if not self._weeks[wk]:
+                del self._weeks[wk]
+        return True
@@ -0,0 +1,185 @@
+import json
+import logging
+import threading
+import time as _time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+from lovarda.config import METRICS_LOG
+
+# ---- Mérőpontok: időzítés és számlálók futásonként ----
+# Egy futás a Streamlit szkript egy lefutása. A timed / count hívások a szál
+# aktuális futásához adódnak; a háttérszálaké (write-behind, megosztott
+# gyorsítótár) csak a folyamatszintű összesítőkbe kerül. A lezárt futás egy
+# JSON sorként a "lovarda.metrics" naplóba megy, és ha LOVARDA_METRICS_LOG
+# meg van adva, abba a fájlba is. Mérőpontonként az utolsó WINDOW mérésből
+# számolunk p50 / p95-öt.
+#
+# Számlálók: api.calls, api.bytes_sent, api.bytes_received,
+# cache.<név>.hit / .miss, rows.read, rows.written.
+
+WINDOW = 500  # mérés / mérőpont
+RECENT = 50   # ennyi lezárt futást tartunk meg a felületnek
+
+log = logging.getLogger("lovarda.metrics")
+
+
+class Run:
+    def __init__(self, label: str):
+        self.label    = label
+        self.started  = _time.time()
+        self.t0       = _time.perf_counter()
+        self.last     = self.t0   # az utolsó mérőpont vége: félbeszakadt futás zárásához
+        self.ms       = None
+        self.timings  = []        # (mérőpont, ms, mélység)
+        self.counters = Counter()
+        self.depth    = 0
+        self.section  = None      # (név, kezdet): a futás végéig tartó szakasz
+
+    def as_dict(self) -> dict:
+        return {"label": self.label, "started": round(self.started, 3), "ms": self.ms,
+                "timings": [{"name": n, "ms": round(ms, 3), "depth": d} for n, ms, d in self.timings],
+                "counters": dict(self.counters)}
+
+
+class Metrics:
+    def __init__(self, window=WINDOW, recent=RECENT, path=None):
+        self.path     = path
+        self.samples  = defaultdict(lambda: deque(maxlen=window))  # mérőpont -> ms értékek
+        self.totals   = Counter()
+        self.runs     = deque(maxlen=recent)
+        self._local   = threading.local()
+        self._lock    = threading.Lock()
+
+    # ---- futások ----
+    def current(self):
+        return getattr(self._local, "run", None)
+
+    def begin(self, label="") -> Run:
+        run = self._local.run = Run(label)
+        return run
+
+    def set_label(self, label: str):
+        run = self.current()
+        if run is not None:
+            run.label = label
+
+    def end(self, run: Run = None, finished=True):
+        # finished=False: a futás félbeszakadt (st.stop, újrafuttatás), az utolsó mérőpontig számolunk
+        run = run or self.current()
+        if run is None or run.ms is not None:
+            return
+        end = _time.perf_counter() if finished else run.last
+        if run.section is not None:
+            self._record(run, run.section[0], (end - run.section[1])*1000, 0)
+            run.section = None
+        run.ms = round((end - run.t0)*1000, 3)
+        self._record(run, "run", run.ms, None)
+        with self._lock:
+            self.runs.append(run)
+        line = json.dumps(run.as_dict(), ensure_ascii=False, default=str)
+        log.info(line)
+        if self.path:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        if getattr(self._local, "run", None) is run:
+            self._local.run = None
+
+    # ---- mérőpontok ----
+    def _record(self, run, name: str, ms: float, depth):
+        with self._lock:
+            self.samples[name].append(ms)
+        if run is not None and depth is not None:
+            run.timings.append((name, ms, depth))
+
+    @contextmanager
+    def timed(self, name: str):
+        run = self.current()
+        depth = run.depth if run is not None else 0
+        if run is not None:
+            run.depth += 1
+        t0 = _time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = _time.perf_counter()
+            if run is not None:
+                run.depth -= 1
+                run.last = t1
+            self._record(run, name, (t1 - t0)*1000, depth)
+
+    def timer(self, name: str):
+        def deco(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timed(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def section(self, name: str):
+        # a futás végéig (vagy a következő szakaszig) tartó mérés, pl. egy admin menüpont
+        run = self.current()
+        if run is None:
+            return
+        now = _time.perf_counter()
+        if run.section is not None:
+            self._record(run, run.section[0], (now - run.section[1])*1000, 0)
+        run.section = (name, now)
+
+    def count(self, name: str, n=1):
+        run = self.current()
+        if run is not None:
+            run.counters[name] += n
+            run.last = _time.perf_counter()
+        with self._lock:
+            self.totals[name] += n
+
+    def cache(self, name: str, hit: bool):
+        self.count(f"cache.{name}.{'hit' if hit else 'miss'}")
+
+    # ---- lekérdezés a felületnek / exporthoz ----
+    def summary(self) -> list:
+        # mérőpontonként: db, p50, p95, max (ms) az ablakon belül
+        with self._lock:
+            items = {k: np.asarray(v, dtype=float) for k, v in self.samples.items() if v}
+        return [{"name": k, "n": len(v), "p50_ms": round(float(np.percentile(v, 50)), 3),
+                 "p95_ms": round(float(np.percentile(v, 95)), 3), "max_ms": round(float(v.max()), 3)}
+                for k, v in sorted(items.items())]
+
+    def recent(self) -> list:
+        with self._lock:
+            return [r.as_dict() for r in self.runs]
+
+    def export(self) -> dict:
+        with self._lock:
+            totals = dict(self.totals)
+        return {"generated": _time.time(), "summary": self.summary(), "totals": totals, "runs": self.recent()}
+
+
+# ---- Sheets kvóta-számlálók (lovarda.quota) ----
+# Itt, és nem a quota modulban, hogy a felület gspread betöltése nélkül olvashassa.
+class QuotaStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {"calls": 0, "reads": 0, "writes": 0, "retries": 0,
+                             "errors": 0, "coalesced": 0, "throttled": 0, "throttle_s": 0.0}
+
+    def incr(self, key: str, by=1):
+        with self._lock:
+            self.counters[key] += by
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+METRICS     = Metrics(path=METRICS_LOG)
+QUOTA_STATS = QuotaStats()
@@ -0,0 +1,31 @@
+import argparse
+
+from lovarda.config import GOOGLE_JSON, GOOGLE_SHEET_ID, SQLITE_PATH
+from lovarda.sheets_store import SheetsStorage
+from lovarda.sqlite_store import SqliteStorage
+from lovarda.storage import copy_storage
+
+# ---- Egyszeri import / export Google Sheets és SQLite között ----
+#   python -m lovarda.migrate sheets-to-sqlite [--db lovarda.db]
+#   python -m lovarda.migrate sqlite-to-sheets [--db lovarda.db]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Adatok másolása Google Sheets és SQLite között")
+    p.add_argument("direction", choices=["sheets-to-sqlite", "sqlite-to-sheets"])
+    p.add_argument("--db", default=SQLITE_PATH)
+    p.add_argument("--sheet-id", default=GOOGLE_SHEET_ID)
+    p.add_argument("--json", default=GOOGLE_JSON)
+    args = p.parse_args(argv)
+
+    sheets = SheetsStorage(args.sheet_id, args.json)
+    sqlite = SqliteStorage(args.db)
+    if args.direction=="sheets-to-sqlite":
+        copy_storage(sheets, sqlite)
+    else:
+        copy_storage(sqlite, sheets)
+    print(f"Kész: {args.direction} ({args.db})")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+import random
+import threading
+import time as _time
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from lovarda.config import SHEETS_READS_PER_MIN, SHEETS_WRITES_PER_MIN
+from lovarda.metrics import METRICS, QUOTA_STATS
+
+# ---- Kvótatudatos gspread kliens ----
+# Minden Sheets API hívás a HTTPClient.request-en megy át, ezért ezt
+# bővítjük: folyamatszintű token bucket (olvasás és írás külön kvóta),
+# exponenciális visszalépés jitterrel 429 / 5xx válaszra, és az azonos,
+# éppen futó GET kérések összevonása (tíz munkamenet egy letöltésen osztozik).
+# 429-nél a kérés biztosan nem futott le, az mindig újrapróbálható; 5xx-nél
+# az írás már megtörténhetett, ezért csak az ismételhető hívásokat (olvasás,
+# cellafrissítés, batchUpdate) küldjük újra, a values:append-et nem.
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+NOT_IDEMPOTENT = (":append",)  # végpont-végződések: ismétlésre duplikálnak
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: int = None):
+        self.rate     = per_minute/60.0
+        self.capacity = float(burst or max(1, int(per_minute//6)))
+        self.tokens   = self.capacity
+        self.updated  = _time.monotonic()
+        self._lock    = threading.Lock()
+
+    def acquire(self) -> float:
+        # vár, amíg van token; visszaadja a várakozás hosszát mp-ben
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = _time.monotonic()
+                self.tokens  = min(self.capacity, self.tokens + (now - self.updated)*self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                need = (1 - self.tokens)/self.rate
+            _time.sleep(need)
+            waited += need
+
+
+class SingleFlight:
+    # azonos kulcsú, egyszerre futó hívásokból csak egy megy ki, a többi megvárja
+    def __init__(self):
+        self._lock  = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        if not leader:
+            call["done"].wait()
+            QUOTA_STATS.incr("coalesced")
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+
+READ_BUCKET  = TokenBucket(SHEETS_READS_PER_MIN)
+WRITE_BUCKET = TokenBucket(SHEETS_WRITES_PER_MIN)
+_READS       = SingleFlight()
+
+
+def _freeze(v):
+    if isinstance(v, dict):
+        return tuple(sorted((k, _freeze(x)) for k, x in v.items()))
+    if isinstance(v, (list, tuple)):
+        return tuple(_freeze(x) for x in v)
+    return v
+
+
+class QuotaHTTPClient(HTTPClient):
+    max_retries  = 5
+    backoff_base = 1.0   # mp
+    backoff_max  = 32.0  # mp
+
+    def request(self, method: str, endpoint: str, params=None, **kwargs):
+        if method.lower()=="get" and not kwargs.get("data") and not kwargs.get("json"):
+            key = (endpoint, _freeze(params))
+            return _READS.do(key, lambda: self._send(method, endpoint, params, **kwargs))
+        return self._send(method, endpoint, params, **kwargs)
+
+    def _send(self, method: str, endpoint: str, params=None, **kwargs):
+        read   = method.lower()=="get"
+        bucket = READ_BUCKET if read else WRITE_BUCKET
+        retry  = RETRY_STATUS if read or not endpoint.endswith(NOT_IDEMPOTENT) else {429}
+        for attempt in range(self.max_retries + 1):
+            waited = bucket.acquire()
+            if waited:
+                QUOTA_STATS.incr("throttled")
+                QUOTA_STATS.incr("throttle_s", waited)
+            QUOTA_STATS.incr("calls")
+            QUOTA_STATS.incr("reads" if read else "writes")
+            METRICS.count("api.calls")
+            try:
+                with METRICS.timed("api.read" if read else "api.write"):
+                    resp = super().request(method, endpoint, params=params, **kwargs)
+                METRICS.count("api.bytes_received", len(resp.content or b""))
+                if kwargs.get("json") is not None:
+                    METRICS.count("api.bytes_sent", len(json.dumps(kwargs["json"], default=str)))
+                return resp
+            except APIError as e:
+                status = getattr(e.response, "status_code", None)
+                if status not in retry or attempt==self.max_retries:
+                    QUOTA_STATS.incr("errors")
+                    raise
+            QUOTA_STATS.incr("retries")
+            # "full jitter": véletlen várakozás 0 és a duplázódó plafon között
+            _time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base*2**attempt)))
@@ -0,0 +1,79 @@
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+
+from lovarda.rules import day_rule_violation
+from lovarda.rows import ROW_ID_COL, new_row_id
+from lovarda.slots import booked_intervals, overlaps
+
+# ---- Ismétlődő sorozatok ("Örökítés") ----
+# A szabályból kibontott összes alkalmat egyszerre ellenőrizzük: a napi
+# intervallumokat nap*1440 + perc kulcsra toljuk, így egyetlen rendezett
+# tömbön, egy searchsorted hívással dől el minden alkalom ütközése.
+
+DAY_MIN = 24*60
+
+REASON_BLOCKED  = "tiltott nap"
+REASON_LUNCH    = "ebédszünet"
+REASON_CLOSED   = "zárás után érne véget"
+REASON_CONFLICT = "ütközik egy meglévő foglalással"
+
+
+@dataclass(frozen=True)
+class WeeklyRule:
+    first: date
+    count: Optional[int] = None
+    until: Optional[date] = None
+    every_weeks: int = 1
+
+    def dates(self) -> list:
+        if self.count is None and self.until is None:
+            raise ValueError("count vagy until megadása kötelező")
+        step, out, d = timedelta(weeks=self.every_weeks), [], self.first
+        while (self.count is None or len(out) < self.count) and (self.until is None or d <= self.until):
+            out.append(d)
+            d += step
+        return out
+
+
+def new_series_id() -> str:
+    return str(uuid.uuid4())
+
+def check_series(dates, start_min: int, dur_min: int, index, *,
+                 blocked=(), lunch_for=None, day_end: int = DAY_MIN) -> list:
+    # [(dátum, None | elutasítás oka), ...] az alkalmak sorrendjében
+    blocked = set(blocked)
+    reasons = []
+    for d in dates:
+        reason = REASON_BLOCKED if d in blocked else day_rule_violation(d)
+        if reason is None and start_min + dur_min > day_end:
+            reason = REASON_CLOSED
+        if reason is None and lunch_for is not None:
+            ls, ld = lunch_for(d)
+            if ls <= start_min < ls + ld:
+                reason = REASON_LUNCH
+        reasons.append(reason)
+
+    # meglévő foglalások az érintett napokon, nap-eltolással egy tömbbe
+    starts, durs = [], []
+    for d in dates:
+        day = index.day(d)
+        if len(day):
+            off = d.toordinal()*DAY_MIN
+            starts.append(day.starts + off)
+            durs.append(day.ends - day.starts)
+    if starts:
+        bs, be_max = booked_intervals(np.concatenate(starts), np.concatenate(durs))
+        cand = np.fromiter((d.toordinal()*DAY_MIN + start_min for d in dates),
+                           dtype=np.int64, count=len(dates))
+        hit = overlaps(cand, cand + dur_min, bs, be_max)
+        reasons = [REASON_CONFLICT if r is None and h else r for r, h in zip(reasons, hit)]
+    return list(zip(dates, reasons))
+
+def series_rows(accepted, template: dict, series_id: str) -> list:
+    return [{**template, "Dátum": d, "Ismétlődik": True,
+             "RepeatGroupID": series_id, ROW_ID_COL: new_row_id()}
+            for d in accepted]
@@ -0,0 +1,27 @@
+import uuid
+from numbers import Real
+
+import pandas as pd
+
+# ---- Sorazonosító és cellaértékek ----
+# Minden tároló közös, gspread nélküli alapja.
+
+ROW_ID_COL = "ID"
+OWNER_COL  = "Felhasználó"  # a foglalást rögzítő lovas felhasználóneve
+
+
+def new_row_id() -> str:
+    return str(uuid.uuid4())
+
+def cell_value(v):
+    # ugyanaz a cellaábrázolás, amit a set_with_dataframe is ír
+    if hasattr(v, "item") and not isinstance(v, str):
+        v = v.item()  # numpy skalár -> python
+    if v is None or pd.isnull(v):
+        return ""
+    if isinstance(v, Real):
+        return v
+    return str(v)
+
+def row_values(row: dict, columns: list) -> list:
+    return [cell_value(row.get(c, "")) for c in columns]
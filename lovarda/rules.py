@@ -0,0 +1,19 @@
+from datetime import date
+
+import numpy as np
+
+# ---- Naptári szabályok ----
+# Júliusban csak hétfő–kedd, augusztusban hétfő kivételével minden nap foglalható.
+
+def day_rule_violation(d: date):
+    wd, mo = d.weekday(), d.month
+    if mo==7 and wd not in (0,1):
+        return "Júliusban csak hétfő–kedd foglalható."
+    if mo==8 and wd==0:
+        return "Augusztusban csak kedd–vasárnap foglalható."
+    return None
+
+def rule_mask(weekdays, months) -> np.ndarray:
+    # ugyanez a szabály sok napra egyszerre: True, ahol foglalható
+    wd, mo = np.asarray(weekdays), np.asarray(months)
+    return ~(((mo==7) & (wd > 1)) | ((mo==8) & (wd==0)))
@@ -0,0 +1,127 @@
+import pandas as pd
+
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+
+# ---- Foglalások típusos sémája ----
+# Betöltéskor egyszer alakítjuk át a lapról / adatbázisból jövő szöveges
+# oszlopokat: Dátum -> datetime64, Kezdés és Időtartam -> Int16 perc, Fő ->
+# Int16, Ismétlődik -> bool, a sokszor ismétlődő szövegek -> category. Így a
+# slot-, idővonal- és ICS-számítás nem parse-ol újra. Mentéskor a
+# wire_bookings ugyanazt a szöveges alakot adja vissza, amit a lapra írunk.
+
+DATE_COL      = "Dátum"
+START_COL     = "Kezdés"
+DUR_COL       = "Időtartam (perc)"
+HEADS_COL     = "Fő"
+REPEAT_COL    = "Ismétlődik"
+CATEGORY_COLS = ("Gyermek(ek) neve", "Lovak", "RepeatGroupID", "Megjegyzés", OWNER_COL)
+INT_COLS      = (DUR_COL, HEADS_COL)
+TRUE_TEXT     = ("true", "igen", "yes", "x")
+
+
+def _is_padding(name) -> bool:
+    name = str(name).strip()
+    return name=="" or name.startswith("__") or name.startswith("Unnamed:")
+
+def _blank(s: pd.Series) -> bool:
+    return bool((s.isna() | (s.astype(str).str.strip()=="")).all())
+
+def hhmm_minutes(s: pd.Series) -> pd.Series:
+    # "H:MM", "HH:MM:SS" vagy time -> Int16 perc; érvénytelen -> <NA>
+    parts = s.astype(str).str.extract(r"^\s*(\d{1,2}):(\d{2})")
+    mins  = pd.to_numeric(parts[0], errors="coerce")*60 + pd.to_numeric(parts[1], errors="coerce")
+    return mins.astype("Int16")
+
+def minutes_hhmm(s: pd.Series) -> pd.Series:
+    # Int16 perc -> "HH:MM"; <NA> -> ""
+    m   = s.astype("Int64")
+    out = (m//60).astype(str).str.zfill(2) + ":" + (m%60).astype(str).str.zfill(2)
+    return out.where(m.notna(), "").astype(object)
+
+def hhmm(minutes) -> str:
+    m = int(minutes)
+    return f"{m//60:02d}:{m%60:02d}"
+
+def _flags(s: pd.Series) -> pd.Series:
+    if s.dtype==bool:
+        return s
+    num = pd.to_numeric(s.where(s.map(lambda v: not isinstance(v, str)), None), errors="coerce")
+    txt = s.astype(str).str.strip().str.lower()
+    return ((num.fillna(0)!=0) | txt.isin(TRUE_TEXT) | txt.isin(["1", "1.0"])).astype(bool)
+
+def _text(s: pd.Series) -> pd.Series:
+    return s.where(s.notna(), "").astype(str)
+
+def typed_bookings(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.drop(columns=[c for c in df.columns if _is_padding(c) and _blank(df[c])])
+    df = df.copy()
+    if DATE_COL in df.columns and not pd.api.types.is_datetime64_dtype(df[DATE_COL]):
+        d = df[DATE_COL]
+        df[DATE_COL] = pd.to_datetime(d.where(d.astype(str).str.strip()!="", None),
+                                      errors="coerce", format="mixed")
+    if START_COL in df.columns and not isinstance(df[START_COL].dtype, pd.Int16Dtype):
+        df[START_COL] = hhmm_minutes(df[START_COL])
+    for col in INT_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.Int16Dtype):
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int16")
+    if REPEAT_COL in df.columns:
+        df[REPEAT_COL] = _flags(df[REPEAT_COL])
+    for col in CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = _text(df[col]).astype("category")
+    if ROW_ID_COL in df.columns:
+        df[ROW_ID_COL] = _text(df[ROW_ID_COL]).astype(object)
+    return df
+
+def wire_bookings(df: pd.DataFrame) -> pd.DataFrame:
+    # a típusos tábla vissza a lapon / adatbázisban tárolt alakra
+    out = df.copy()
+    if DATE_COL in out.columns and pd.api.types.is_datetime64_dtype(out[DATE_COL]):
+        d = out[DATE_COL]
+        out[DATE_COL] = pd.Series(d.dt.date, index=d.index, dtype=object).where(d.notna(), "")
+    if START_COL in out.columns and isinstance(out[START_COL].dtype, pd.Int16Dtype):
+        out[START_COL] = minutes_hhmm(out[START_COL])
+    for col in INT_COLS:
+        if col in out.columns and isinstance(out[col].dtype, pd.Int16Dtype):
+            s = out[col]
+            out[col] = pd.Series([int(v) if pd.notna(v) else "" for v in s], index=s.index, dtype=object)
+    for col in CATEGORY_COLS + (ROW_ID_COL,):
+        if col in out.columns:
+            out[col] = out[col].astype(object)
+    if REPEAT_COL in out.columns:
+        out[REPEAT_COL] = out[REPEAT_COL].astype(object)
+    return out.astype(object)
+
+def typed_rows(rows: list, columns=None) -> pd.DataFrame:
+    # írási sorok (szótárak) -> típusos tábla; a hiányzó oszlopok üresek
+    new = pd.DataFrame(rows)
+    if columns is not None and len(columns):
+        new = new.reindex(columns=list(columns) + [c for c in new.columns if c not in columns],
+                          fill_value="")
+    return typed_bookings(new)
+
+def set_cells(df: pd.DataFrame, labels, col: str, value) -> pd.DataFrame:
+    # egy oszlop értéke a megadott sorokban, típushelyesen (a df-et helyben módosítja)
+    if col not in df.columns:
+        df[col] = pd.Series("", index=df.index, dtype="category" if col in CATEGORY_COLS else object)
+    v = typed_bookings(pd.DataFrame({col: [value]}))[col]
+    if isinstance(df[col].dtype, pd.CategoricalDtype):
+        v = v.astype(object)
+        if v.iloc[0] not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([v.iloc[0]])
+    df.loc[labels, col] = v.iloc[0]
+    return df
+
+def concat_typed(df: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    # hozzáfűzés a category oszlopok megtartásával (közös kategóriakészlet)
+    if not len(df):
+        return new
+    df, new = df.copy(), new.copy()
+    for col in CATEGORY_COLS:
+        if col in df.columns and col in new.columns:
+            a, b = df[col], new[col].astype(object)
+            extra = pd.Index(b.unique()).difference(a.cat.categories)
+            if len(extra):
+                df[col] = a.cat.add_categories(extra)
+            new[col] = pd.Categorical(b, categories=df[col].cat.categories)
+    return pd.concat([df, new])
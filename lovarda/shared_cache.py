@@ -0,0 +1,371 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time as _time
+import uuid
+from contextlib import contextmanager
+
+from lovarda.metrics import METRICS
+from lovarda.storage import SMALL_TABLES, TABLES, Storage
+from lovarda.sync import apply_entries
+
+# ---- Folyamatok közti megosztott gyorsítótár ----
+# Ha az alkalmazás több példányban fut egy gépen (terheléselosztó mögött),
+# mind ugyanazt a SQLite fájlt olvassa: benne az öt lap utolsó pillanatképe
+# (pickle) verziószámmal és letöltési idővel. Lejáratkor csak az a folyamat
+# kérdezi le a Sheets-et, amelyik megszerzi a bérletet; a többiek addig a
+# régi pillanatképet adják, vagy ha nincs, rövid ideig várnak az újra. Saját
+# írás után a generáció nő, így minden példány a következő olvasáskor frissít.
+# A Sheets forgalma így nem nő a példányok számával.
+#
+# A foglalásoknál a pillanatkép mellett a tároló tokenje (Sheets: betöltés +
+# napló sor) is itt van. A lekérő átveszi a közös állapotot, a tároló csak a
+# token utáni naplósorokat kéri le, és ha azok követhetők, csak ezek a
+# műveletek kerülnek egy delta sorba (JSON); a többi példány ezeket alkalmazza
+# a saját memóriabeli másolatára. Teljes pickle csak DELTA_MAX delta után,
+# teljes újratöltéskor, vagy ha a tároló nem ad deltát; változatlan tokennél
+# semmi sem íródik újra.
+#
+# A fájlt a pickle.loads miatt csak megbízható folyamatok írhatják: privát,
+# csak az alkalmazás felhasználója által írható könyvtárban legyen (a fájl
+# maga 0600 jogokkal jön létre).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY, version INTEGER, gen INTEGER, fetched_at REAL,
+    digest TEXT, data BLOB, base INTEGER, token TEXT
+);
+CREATE TABLE IF NOT EXISTS deltas (key TEXT, version INTEGER, data TEXT, PRIMARY KEY (key, version));
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, until REAL);
+CREATE TABLE IF NOT EXISTS meta   (key TEXT PRIMARY KEY, value INTEGER);
+INSERT OR IGNORE INTO meta VALUES ('bookings', 0);
+INSERT OR IGNORE INTO meta VALUES ('small', 0);
+"""
+
+GROUPS  = {"bookings": ("bookings",), "small": SMALL_TABLES}  # együtt frissülő kulcsok
+TTL     = {"bookings": 5, "small": 60}  # mp; a foglalásoknál csak a napló-delta megy ki
+LEASE_S = 30    # ennyi után a bérlet lejár (elakadt vagy leállt lekérő)
+WAIT_S  = 10    # ennyit vár egy olvasó, ha még semmilyen pillanatkép nincs
+POLL_S  = 0.05
+DELTA_MAX = 50  # ennyi delta után újra teljes pillanatkép (a lemaradt olvasók ennyit alkalmaznak)
+
+MIGRATIONS = [("snapshots", "base", "INTEGER"), ("snapshots", "token", "TEXT")]  # régebbi fájlokhoz
+
+
+def group_of(key: str) -> str:
+    return "bookings" if key=="bookings" else "small"
+
+
+class SharedCache:
+    def __init__(self, path: str):
+        self.path  = path
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+        except FileExistsError:
+            pass
+        con = self._connect()
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            for table, col, typ in MIGRATIONS:
+                if col not in {row[1] for row in con.execute(f"PRAGMA table_info({table})")}:
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
+        finally:
+            con.close()
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @contextmanager
+    def _tx(self):
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            yield con
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def _query(self, sql: str, args=()):
+        con = self._connect()
+        try:
+            return con.execute(sql, args).fetchall()
+        finally:
+            con.close()
+
+    # ---- csoportonkénti generáció: saját írás után nő, a régebbi pillanatképek elavulnak ----
+    def gen(self, group: str) -> int:
+        return self._query("SELECT value FROM meta WHERE key=?", (group,))[0][0]
+
+    def bump(self, group: str) -> int:
+        with self._tx() as con:
+            con.execute("UPDATE meta SET value = value + 1 WHERE key=?", (group,))
+            return con.execute("SELECT value FROM meta WHERE key=?", (group,)).fetchone()[0]
+
+    # ---- pillanatképek ----
+    def meta(self, keys) -> dict:
+        # kulcs -> (verzió, generáció, letöltés ideje); a blob nélkül, olcsó
+        keys = list(keys)
+        rows = self._query(f"SELECT key, version, gen, fetched_at FROM snapshots "
+                           f"WHERE key IN ({','.join('?'*len(keys))})", keys)
+        return {k: (v, g, t) for k, v, g, t in rows}
+
+    def read(self, key: str, have=None):
+        # egy olvasási tranzakcióban: (verzió, token, kiinduló verzió, blob, delták) vagy None.
+        # have: a hívónál meglévő verzió; ha a pillanatkép nem újabb nála, blob helyett
+        # csak a have utáni delták jönnek
+        con = self._connect()
+        try:
+            con.execute("BEGIN")
+            row = con.execute("SELECT version, coalesce(base, version), token FROM snapshots WHERE key=?",
+                              (key,)).fetchone()
+            if row is None:
+                return None
+            version, base, token = row
+            if have is not None and base <= have <= version:
+                start, blob = have, None
+            else:
+                start = base
+                blob  = con.execute("SELECT data FROM snapshots WHERE key=?", (key,)).fetchone()[0]
+            deltas = [json.loads(d) for (d,) in con.execute(
+                "SELECT data FROM deltas WHERE key=? AND version > ? AND version <= ? ORDER BY version",
+                (key, start, version))]
+            con.execute("COMMIT")
+            return version, token, start, blob, deltas
+        finally:
+            con.close()
+
+    def write(self, key: str, blob: bytes, gen: int, token=None):
+        # teljes pillanatkép; a verzió csak tartalomváltozáskor nő, így a többi folyamat nem tölti be újra
+        digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+        with self._tx() as con:
+            row = con.execute("SELECT version, digest FROM snapshots WHERE key=?", (key,)).fetchone()
+            if row is not None and row[1]==digest:
+                con.execute("UPDATE snapshots SET gen = max(gen, ?), fetched_at = ?, token = ? WHERE key=?",
+                            (gen, _time.time(), token, key))
+                return row[0]
+            version = (row[0] if row else 0) + 1
+            con.execute("INSERT OR REPLACE INTO snapshots VALUES (?,?,?,?,?,?,?,?)",
+                        (key, version, gen, _time.time(), digest, blob, version, token))
+            con.execute("DELETE FROM deltas WHERE key=? AND version <= ?", (key, version))
+            return version
+
+    def add_delta(self, key: str, entries: list, gen: int, token: str, expect: int):
+        # a pillanatkép expect verziójára épülő műveletek; None, ha közben más írt,
+        # vagy már DELTA_MAX delta gyűlt össze (ilyenkor teljes pillanatkép kell)
+        with self._tx() as con:
+            row = con.execute("SELECT version, coalesce(base, version) FROM snapshots WHERE key=?",
+                              (key,)).fetchone()
+            if row is None or row[0]!=expect or row[0] - row[1] >= DELTA_MAX:
+                return None
+            version = expect + 1
+            con.execute("INSERT OR REPLACE INTO deltas VALUES (?,?,?)",
+                        (key, version, json.dumps(entries, ensure_ascii=False, default=str)))
+            con.execute("UPDATE snapshots SET version = ?, gen = max(gen, ?), fetched_at = ?, token = ? "
+                        "WHERE key=?", (version, gen, _time.time(), token, key))
+            return version
+
+    def touch(self, key: str, gen: int):
+        # változatlan tartalom: csak a frissesség
+        with self._tx() as con:
+            con.execute("UPDATE snapshots SET gen = max(gen, ?), fetched_at = ? WHERE key=?",
+                        (gen, _time.time(), key))
+
+    # ---- egyetlen lekérő: bérlet a SQLite-ban ----
+    @contextmanager
+    def lease(self, name: str, seconds=LEASE_S):
+        now = _time.time()
+        with self._tx() as con:
+            row  = con.execute("SELECT owner, until FROM leases WHERE name=?", (name,)).fetchone()
+            mine = row is None or row[1] < now
+            if mine:
+                con.execute("INSERT OR REPLACE INTO leases VALUES (?,?,?)", (name, self.owner, now + seconds))
+        try:
+            yield mine
+        finally:
+            if mine:
+                with self._tx() as con:
+                    con.execute("DELETE FROM leases WHERE name=? AND owner=?", (name, self.owner))
+
+
+class SharedCacheStorage(Storage):
+    def __init__(self, inner: Storage, path: str, ttl=None, wait=WAIT_S):
+        self.inner    = inner
+        self.name     = f"{inner.name}+shared"
+        self.cache    = SharedCache(path)
+        self.ttl      = {**TTL, **(ttl or {})}
+        self.wait     = wait
+        self._local   = {}  # kulcs -> (verzió, token, kicsomagolt érték)
+        self._min_gen = dict.fromkeys(GROUPS, 0)  # saját írás utáni generáció csoportonként
+        self._lock    = threading.Lock()
+        self.stats    = {"hits": 0, "fetches": 0, "stale": 0, "waits": 0, "decodes": 0,
+                         "deltas": 0, "patches": 0}
+
+    def _fresh(self, group: str, meta: dict, gen: int) -> bool:
+        now = _time.time()
+        return all(k in meta and meta[k][1] >= gen and now - meta[k][2] < self.ttl[group]
+                   for k in GROUPS[group])
+
+    def _fetch(self, group: str, gen: int):
+        if group=="bookings":
+            self._fetch_bookings(gen)
+        else:
+            self.inner.expire(SMALL_TABLES)
+            for k in SMALL_TABLES:
+                self.cache.write(k, pickle.dumps(self.inner.load(k), protocol=pickle.HIGHEST_PROTOCOL), gen)
+        self.stats["fetches"] += 1
+        METRICS.cache(f"shared.{group}", False)
+
+    def _adopt(self):
+        # a belső tároló a közös állapotból folytatja (csak a token utáni naplót kéri le)
+        shared = self._value("bookings")
+        if shared is not None and shared[1] is not None:
+            self.inner.adopt_bookings(*shared[2], json.loads(shared[1]))
+        return shared
+
+    def _fetch_bookings(self, gen: int):
+        shared = self._adopt()
+        self.inner.expire(["bookings"])
+        value = self.inner.load_bookings()  # (df, idx)
+        token, entries = self.inner.changes_since(json.loads(shared[1]) if shared and shared[1] else None)
+        token = json.dumps(token, default=str)
+        if shared is not None and token==shared[1]:
+            self.cache.touch("bookings", gen)
+            return
+        version = None
+        if shared is not None and entries:
+            version = self.cache.add_delta("bookings", entries, gen, token, expect=shared[0])
+        if version is None:
+            version = self.cache.write("bookings", pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                                       gen, token)
+        else:
+            self.stats["deltas"] += 1
+        with self._lock:
+            self._local["bookings"] = (version, token, value)
+
+    def _ensure(self, group: str):
+        deadline = _time.monotonic() + self.wait
+        while True:
+            gen  = self.cache.gen(group)
+            meta = self.cache.meta(GROUPS[group])
+            if self._fresh(group, meta, gen):
+                self.stats["hits"] += 1
+                METRICS.cache(f"shared.{group}", True)
+                return
+            with self.cache.lease(group) as mine:
+                if mine:
+                    # közben más már frissíthetett
+                    gen = self.cache.gen(group)
+                    if not self._fresh(group, self.cache.meta(GROUPS[group]), gen):
+                        self._fetch(group, gen)
+                    return
+            # más folyamat frissít: a régi pillanatkép jó, ha nem előzi meg a saját írásunkat
+            if all(k in meta and meta[k][1] >= self._min_gen[group] for k in GROUPS[group]):
+                self.stats["stale"] += 1
+                METRICS.count(f"cache.shared.{group}.stale")
+                return
+            if _time.monotonic() > deadline:
+                self._fetch(group, gen)
+                return
+            self.stats["waits"] += 1
+            _time.sleep(POLL_S)
+
+    def _value(self, key: str):
+        # (verzió, token, érték) a legfrissebb közös állapotból: helyi memó + delták,
+        # vagy a teljes pillanatkép; None, ha még nincs
+        with self._lock:
+            hit = self._local.get(key)
+            got = self.cache.read(key, have=hit[0] if hit else None)
+            if got is None:
+                return None
+            version, token, start, blob, deltas = got
+            if hit is not None and hit[0]==version:
+                return hit
+            value = hit[2] if blob is None else None
+            if value is not None:
+                try:
+                    value = self._patch(value, deltas)
+                except (ValueError, KeyError, IndexError, TypeError):
+                    value = None
+                    version, token, start, blob, deltas = self.cache.read(key)
+            if value is None:
+                value = self._patch(pickle.loads(blob), deltas)
+                self.stats["decodes"] += 1
+            hit = self._local[key] = (version, token, value)
+            return hit
+
+    def _patch(self, value, deltas: list):
+        if not deltas:
+            return value
+        df, idx = value
+        idx = idx.copy()
+        for entries in deltas:
+            df = apply_entries(df, idx, entries)
+        self.stats["patches"] += len(deltas)
+        return df, idx
+
+    def _get(self, key: str):
+        self._ensure(group_of(key))
+        return self._value(key)[2]
+
+    # ---- olvasás ----
+    def load_bookings(self):
+        df, idx = self._get("bookings")
+        return df.copy(), idx.copy()
+
+    def load_users(self):
+        return self._get("users").copy()
+
+    def load_blocked(self):
+        return self._get("blocked").copy()
+
+    def load_settings(self):
+        return self._get("settings").copy()
+
+    def load_lunch_overrides(self):
+        return self._get("lunch").copy()
+
+    def version(self):
+        self._ensure("bookings")
+        return self.cache.meta(["bookings"])["bookings"][0]
+
+    def expire(self, keys=TABLES):
+        # minden példány pillanatképe elavul; a következő olvasás újra lekéri
+        for group in {group_of(k) for k in keys}:
+            self._min_gen[group] = self.cache.bump(group)
+
+    # ---- írás: a belső tárolóba, utána a pillanatkép elavul ----
+    # (a belső tároló előtte átveszi a közös állapotot, így nem tölti be újra a foglalásokat)
+    def append_bookings(self, rows: list):
+        self._adopt()
+        self.inner.append_bookings(rows)
+        self.expire(["bookings"])
+
+    def update_bookings(self, changes: dict):
+        self._adopt()
+        self.inner.update_bookings(changes)
+        self.expire(["bookings"])
+
+    def delete_bookings(self, row_ids):
+        self._adopt()
+        self.inner.delete_bookings(list(row_ids))
+        self.expire(["bookings"])
+
+    def save_table(self, key: str, df):
+        self.inner.save_table(key, df)
+        self.expire([key])
+
+    def compact_bookings(self) -> int:
+        self._adopt()
+        n = self.inner.compact_bookings()
+        self.expire(["bookings"])
+        return n
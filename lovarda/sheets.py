@@ -0,0 +1,290 @@
+import pandas as pd
+from gspread.utils import (InsertDataOption, ValueInputOption, a1_range_to_grid_range,
+                           absolute_range_name, rowcol_to_a1)
+from gspread.spreadsheet import Spreadsheet
+from gspread.worksheet import Worksheet
+from pandas.io.parsers import TextParser
+
+from lovarda.rows import ROW_ID_COL, cell_value, new_row_id, row_values
+
+# ---- Sor-szintű írás a munkalapokra ----
+# A teljes lap törlése + újraírása helyett minden sort egy stabil azonosító
+# (ROW_ID_COL) alapján címzünk: új sor -> append_rows, módosítás -> célzott
+# tartomány-frissítés, törlés -> a sor kiürítése és megjelölése egyetlen hívással.
+# Sort sosem törlünk ki a lapról: így a sorszámok nem csúsznak el, és egy másik
+# példány közben kiszámolt címei (ID -> sor) is érvényesek maradnak. A jelölt
+# sorok a teljes újraíráskor (save_table, migrate) és a tömörítéskor
+# (compact_rows) tűnnek el.
+
+FIRST_DATA_ROW = 2  # 1. sor a fejléc
+NEW_SHEET_ROWS = 100
+DELETED        = "törölt:"  # a törölt sor ID cellája: jelölés + a régi ID
+VERIFY_MAX     = 100  # ennél több célsornál az egész ID oszlopot olvassuk
+
+
+def read_header_and_ids(ws):
+    header = ws.row_values(1)
+    if ROW_ID_COL not in header:
+        return header, []
+    ids = ws.col_values(header.index(ROW_ID_COL) + 1)[FIRST_DATA_ROW - 1:]
+    return header, ids
+
+def _row_positions(ids: list) -> dict:
+    # ID -> sorszámok; egy ID több sorban is lehet (pl. kézzel másolt sor)
+    pos = {}
+    for i, rid in enumerate(ids):
+        if rid:
+            pos.setdefault(rid, []).append(i + FIRST_DATA_ROW)
+    return pos
+
+def is_deleted(ids: pd.Series) -> pd.Series:
+    return ids.astype(str).str.startswith(DELETED)
+
+def _id_text(cell) -> str:
+    return "" if cell is None else str(cell)
+
+# ---- ID -> sor térkép ----
+# A betöltéskor épül (a df indexe a lap sorszáma), így írásnál nem kell az egész
+# ID oszlopot letölteni: egyetlen values:batchGet visszaolvassa a célsorok ID
+# celláit ellenőrzésre, és az utolsó ismert sor utáni (más példány által
+# hozzáfűzött) sorokat. Eltérésnél (kézi szerkesztés, tömörítés egy másik
+# példányban) az egész oszlopot újraolvassuk, mint régen minden írásnál.
+class RowMap:
+    def __init__(self, pos: dict, last_row: int):
+        self.pos      = pos       # ID -> [lapsorok]
+        self.last_row = last_row  # az utolsó ismert sor
+
+    @classmethod
+    def from_ids(cls, ids: list):
+        return cls(_row_positions(ids), len(ids) + FIRST_DATA_ROW - 1)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame):
+        # a törölt sorok jelölése még benne lehet; a df indexe 0-tól = a 2. sortól
+        if not len(df) or ROW_ID_COL not in df.columns:
+            return cls({}, FIRST_DATA_ROW - 1)
+        pos = {}
+        for label, rid in df[ROW_ID_COL].items():
+            rid = _id_text(rid)
+            if rid and not rid.startswith(DELETED):
+                pos.setdefault(rid, []).append(int(label) + FIRST_DATA_ROW)
+        return cls(pos, int(df.index.max()) + FIRST_DATA_ROW)
+
+    def _reread(self, ws, col: int):
+        fresh = RowMap.from_ids(list(map(_id_text, ws.col_values(col)[FIRST_DATA_ROW - 1:])))
+        self.pos, self.last_row = fresh.pos, fresh.last_row
+
+    def locate(self, ws, header: list, row_ids) -> dict:
+        # {ID: [sorok]} a kért, a lapon (még) meglévő ID-kre
+        row_ids = list(row_ids)
+        if ROW_ID_COL not in header:
+            return {}
+        col    = header.index(ROW_ID_COL) + 1
+        letter = rowcol_to_a1(1, col)[:-1]
+        want   = [(r, rid) for rid in row_ids for r in self.pos.get(rid, ())]
+        if len(want) > VERIFY_MAX:
+            self._reread(ws, col)
+        else:
+            # a farok az utolsó ismert sortól indul: az még biztosan a rácson belül van
+            ranges = [f"{letter}{self.last_row}:{letter}"] + [f"{letter}{r}" for r, _ in want]
+            tail, *cells = fetch_values(ws.spreadsheet, [absolute_range_name(ws.title, a) for a in ranges])
+            if any(_id_text(c[0][0] if c and c[0] else "")!=rid for c, (_, rid) in zip(cells, want)):
+                self._reread(ws, col)
+            else:
+                for i, line in enumerate(tail[1:]):
+                    rid, row = _id_text(line[0] if line else ""), self.last_row + 1 + i
+                    if rid and not rid.startswith(DELETED) and row not in self.pos.get(rid, ()):
+                        self.pos.setdefault(rid, []).append(row)
+                self.last_row += max(len(tail) - 1, 0)
+        return {rid: list(self.pos[rid]) for rid in row_ids if rid in self.pos}
+
+    def appended(self, resp, row_ids: list):
+        # az append válaszában a ténylegesen írt tartomány: az új sorok címe olvasás nélkül
+        rng = ((resp or {}).get("updates") or {}).get("updatedRange", "")
+        if "!" not in rng:
+            return
+        first = a1_range_to_grid_range(rng.rpartition("!")[2]).get("startRowIndex", 0) + 1
+        for i, rid in enumerate(row_ids):
+            self.pos[rid] = [first + i]
+        if first==self.last_row + 1:  # közte nincs ismeretlen sor
+            self.last_row = first + len(row_ids) - 1
+
+    def forget(self, row_ids):
+        for rid in row_ids:
+            self.pos.pop(rid, None)
+
+# ---- Munkalapok megnyitása és kötegelt olvasása ----
+# specs: {kulcs: ((lapnév, alternatív nevek...), kezdő sorok új laphoz)}
+def open_worksheets(client, key: str, specs: dict) -> dict:
+    # egyetlen metaadat-lekérés: az open_by_key és a worksheets() külön-külön kérné le;
+    # a Spreadsheet összerakása a gspread 6 belső mezőire épül (requirements: gspread>=6,<7)
+    meta = client.http_client.fetch_sheet_metadata(key)
+    sh   = Spreadsheet.__new__(Spreadsheet)
+    sh.client, sh._properties = client.http_client, {"id": key, **meta["properties"]}
+    existing = {s["properties"]["title"]: Worksheet(sh, s["properties"], sh.id, sh.client)
+                for s in meta["sheets"]}
+    found, missing = {}, {}
+    for key, (titles, rows) in specs.items():
+        title = next((t for t in titles if t in existing), None)
+        if title is None:
+            missing[key] = (titles[0], rows)
+        else:
+            found[key] = existing[title]
+    if missing:
+        # minden hiányzó lap egy batchUpdate-tel, a kezdő sorok egy values_batch_update-tel
+        resp = sh.batch_update({"requests": [{
+            "addSheet": {"properties": {
+                "title": title, "sheetType": "GRID",
+                "gridProperties": {"rowCount": NEW_SHEET_ROWS,
+                                   "columnCount": max(len(r) for r in rows)},
+            }}
+        } for title, rows in missing.values()]})
+        for key, reply in zip(missing, resp["replies"]):
+            found[key] = Worksheet(sh, reply["addSheet"]["properties"], sh.id, sh.client)
+        sh.values_batch_update({
+            "valueInputOption": ValueInputOption.user_entered,
+            "data": [{"range": absolute_range_name(title, "A1"), "values": rows}
+                     for title, rows in missing.values()],
+        })
+    return {key: found[key] for key in specs}
+
+def sheet_header(values: list) -> list:
+    # a lap tényleges fejléce, üres és kitöltő (__1, Unnamed) oszlopokkal együtt
+    return [str(c) for c in values[0]] if values else []
+
+def values_to_df(values: list) -> pd.DataFrame:
+    # ugyanaz a típusfelismerés és üres sor/oszlop kezelés, mint a get_as_dataframe-ben;
+    # a df indexe itt is a lap sorszámát követi (0 = 2. sor). Az üres fejlécű, üres
+    # oszlopok kimaradnak, így a df oszlopai nem a lap oszlopai: íráskor a
+    # sheet_header adja a pozíciókat.
+    if not values:
+        return pd.DataFrame()
+    width = max(len(r) for r in values)
+    rect  = [list(r) + [""]*(width - len(r)) for r in values]
+    df    = TextParser(rect).read().dropna(how="all")
+    empty = [c for c in df.columns if str(c).startswith("Unnamed:") and df[c].isna().all()]
+    return df.drop(columns=empty)
+
+def fetch_values(sh, ranges: list) -> list:
+    # tetszőleges tartományok egyetlen values:batchGet hívással
+    resp = sh.values_batch_get(
+        list(ranges),
+        params={"valueRenderOption": "UNFORMATTED_VALUE",
+                "dateTimeRenderOption": "FORMATTED_STRING"},
+    )
+    return [vr.get("values", []) for vr in resp["valueRanges"]]
+
+# ---- Azonosítók pótlása régi sorokhoz ----
+# header: a lap betöltött fejléce (sheet_header); amit a lapra írunk, azt ebben
+# a listában is átvezetjük, így újabb olvasás nélkül is a lap fejlécét követi.
+def ensure_row_ids(ws, df: pd.DataFrame, columns: list, header: list) -> pd.DataFrame:
+    # üres lap: csak a fejlécet írjuk ki
+    if df.columns.empty:
+        ws.update(values=[list(columns)], range_name="A1",
+                  value_input_option=ValueInputOption.user_entered)
+        header[:] = list(columns)
+        return pd.DataFrame(columns=list(columns))
+    if ROW_ID_COL not in df.columns:
+        df[ROW_ID_COL] = ""
+    missing = df[ROW_ID_COL].astype(str).str.strip()==""
+    gaps    = len(df) and int(df.index.max()) + 1 > len(df)  # üres sorok a lap közepén
+    if not missing.any() and not gaps:
+        return df
+    df.loc[missing, ROW_ID_COL] = [new_row_id() for _ in range(int(missing.sum()))]
+
+    # egyetlen oszlop-frissítés; a df indexe a lap sorszámát követi (fejléc + 0-tól)
+    if ROW_ID_COL in header:
+        col = header.index(ROW_ID_COL) + 1
+    else:
+        col = len(header) + 1
+        if ws.col_count < col:
+            ws.add_cols(col - ws.col_count)
+        header.append(ROW_ID_COL)
+    # az üres sorok is jelölést kapnak: üres sornál az append a táblázat végét
+    # a sor elé tenné, és a mögötte lévő sorokat eltolná
+    last_row = int(df.index.max()) + FIRST_DATA_ROW
+    column = [[ROW_ID_COL]] + [[DELETED] for _ in range(last_row - 1)]
+    for idx, rid in df[ROW_ID_COL].items():
+        column[int(idx) + FIRST_DATA_ROW - 1] = [rid]
+    ws.update(values=column, range_name=rowcol_to_a1(1, col),
+              value_input_option=ValueInputOption.raw)
+    return df
+
+# ---- Új oszlopok felvétele meglévő laphoz ----
+def ensure_columns(ws, df: pd.DataFrame, columns: list, header: list) -> pd.DataFrame:
+    # a hiányzó oszlopok fejléce a lap végére kerül, a sorokban üresen maradnak
+    missing = [c for c in columns if c not in df.columns]
+    if not missing or df.columns.empty:
+        return df
+    new = [c for c in missing if c not in header]
+    if new:
+        if ws.col_count < len(header) + len(new):
+            ws.add_cols(len(header) + len(new) - ws.col_count)
+        ws.update(values=[new], range_name=rowcol_to_a1(1, len(header) + 1),
+                  value_input_option=ValueInputOption.raw)
+        header.extend(new)
+    for c in missing:
+        df[c] = ""
+    return df
+
+# ---- Törölt sorok tömörítése ----
+def compact_rows(ws, values: list):
+    # values: a lap teljes tartalma. Az élő sorok egyetlen írással a lap elejére
+    # kerülnek, alattuk a régi hossz kiürül (nincs üres lap köztes állapot).
+    # -> az élő sorok ID-i a lap sorrendjében, vagy None, ha nincs mit tömöríteni
+    header = sheet_header(values)
+    if ROW_ID_COL not in header:
+        return None
+    col  = header.index(ROW_ID_COL)
+    rid  = lambda r: _id_text(r[col]) if col < len(r) else ""
+    live = [r for r in values[1:] if any(v not in ("", None) for v in r) and not rid(r).startswith(DELETED)]
+    if len(live)==len(values) - 1:
+        return None
+    width = max(map(len, values))
+    grid  = [list(r) + [""]*(width - len(r)) for r in [values[0]] + live]
+    grid += [[""]*width for _ in range(len(values) - len(grid))]
+    ws.update(values=grid, range_name="A1", value_input_option=ValueInputOption.user_entered)
+    return [rid(r) for r in live]
+
+# ---- Írási műveletek ----
+def append_rows(ws, rows: list, columns: list):
+    # columns: a lap fejléce (sheet_header), nem a betöltött df oszlopai
+    if not rows:
+        return 0
+    # INSERT_ROWS: az új sorok beszúrva kerülnek a táblázat végére, semmit nem írnak felül;
+    # a válasz az írt tartomány (RowMap.appended)
+    return ws.append_rows([row_values(r, columns) for r in rows],
+                          value_input_option=ValueInputOption.user_entered,
+                          insert_data_option=InsertDataOption.insert_rows,
+                          table_range="A1")
+
+def update_rows(ws, header: list, pos: dict, changes: dict):
+    # changes: {row_id: {oszlop: új érték}}; pos: RowMap.locate eredménye
+    if not changes:
+        return 0
+    data = []
+    for rid, cols in changes.items():
+        for row in pos.get(rid, ()):  # nincs: közben valaki törölte
+            for col, v in cols.items():
+                data.append({
+                    "range":  rowcol_to_a1(row, header.index(col) + 1),
+                    "values": [[cell_value(v)]],
+                })
+    if data:
+        ws.batch_update(data, value_input_option=ValueInputOption.user_entered)
+    return len(data)
+
+def delete_rows(ws, header: list, pos: dict, row_ids):
+    # a sor helyben kiürül, az ID cellába DELETED + ID kerül (lásd fent)
+    wanted = set(row_ids)
+    if not wanted:
+        return 0
+    col  = header.index(ROW_ID_COL) if ROW_ID_COL in header else -1
+    rows = [(r, rid) for rid, rs in pos.items() if rid in wanted for r in rs]
+    data = [{
+        "range":  f"{rowcol_to_a1(r, 1)}:{rowcol_to_a1(r, len(header))}",
+        "values": [[DELETED + rid if i==col else "" for i in range(len(header))]],
+    } for r, rid in rows]
+    if data:
+        ws.batch_update(data, value_input_option=ValueInputOption.raw)
+    return len(rows)
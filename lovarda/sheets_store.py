@@ -0,0 +1,246 @@
+import json
+import threading
+import time as _time
+
+import gspread
+import pandas as pd
+from gspread.utils import absolute_range_name
+from gspread_dataframe import set_with_dataframe
+
+from lovarda.metrics import METRICS
+from lovarda.quota import QuotaHTTPClient
+from lovarda.rows import ROW_ID_COL
+from lovarda.schema import wire_bookings
+from lovarda.sheets import (RowMap, append_rows, compact_rows, delete_rows, ensure_columns,
+                            ensure_row_ids, fetch_values, is_deleted, open_worksheets,
+                            sheet_header, update_rows, values_to_df)
+from lovarda.storage import (BOOKING_COLUMNS, DEFAULT_SETTINGS, SMALL_TABLES, TABLES, Storage,
+                             parse_blocked, parse_bookings, parse_lunch, parse_settings)
+from lovarda.sync import (BookingSync, CHANGES_COUNT_CELL, CHANGES_HEADER, OP_APPEND,
+                          OP_DELETE, OP_RELOAD, OP_UPDATE, change_entries, change_entry)
+
+# ---- Google Sheets tároló ----
+# Egyedül ez a modul (és a sheets / quota segédmodulok) tölti be a gspread-et;
+# az open_storage csak "sheets" vagy "replica" tárolónál importálja.
+
+SHEETS = {  # kulcs: (lapnév és régi nevei, kezdő sorok új laphoz)
+    "bookings": (("Foglalások",),                  [BOOKING_COLUMNS]),
+    "users":    (("Felhasználók","Felhasznalok"),  [["username","password"]]),
+    "blocked":  (("TiltottNapok",),                [["Dátum"]]),
+    "settings": (("Beallitasok",),                 DEFAULT_SETTINGS),
+    "lunch":    (("EbédSzunet",),                  [["Dátum","Kezdes","HosszPerc"]]),
+    "changes":  (("Valtozasok",),                  [CHANGES_HEADER + ["", "=COUNTA(A:A)"]]),
+}
+
+
+def changes_count(values) -> int:
+    try:
+        return int(values[0][0])
+    except (IndexError, ValueError, TypeError):
+        return 1
+
+
+class SheetsStorage(Storage):
+    # A kis lapok (és hidegindításkor a foglalások is) egyetlen values:batchGet
+    # hívással jönnek; a foglalásokat utána a BookingSync a naplóból frissíti.
+    # Hidegindítás: egy metaadat-lekérés (lapok) + ez az egy values:batchGet.
+    name = "sheets"
+
+    def __init__(self, sheet_id: str, json_path: str, small_ttl=60, client=None):
+        self.sheet_id  = sheet_id
+        self.json_path = json_path
+        self.small_ttl = small_ttl
+        self.sync      = BookingSync()
+        self._client   = client
+        self._wss      = None
+        self._small    = None
+        self._small_at = 0.0
+        self._header   = None  # a foglalási lap fejléce; az append ehhez igazítja a cellákat
+        self._rowmap   = None  # ID -> lapsor a legutóbbi teljes betöltésből (lovarda.sheets.RowMap)
+        self._unsure   = set()  # sor ID-k, amelyek félbemaradt append után már a lapon lehetnek
+        self._lock     = threading.Lock()
+
+    def client(self):
+        if self._client is None:
+            self._client = gspread.service_account(filename=self.json_path,
+                                                   http_client=QuotaHTTPClient)
+        return self._client
+
+    # egyszer nyitjuk meg a táblázatot és kérjük le a lapok listáját
+    def worksheets(self) -> dict:
+        if self._wss is None:
+            self._wss = open_worksheets(self.client(), self.sheet_id, SHEETS)
+        return self._wss
+
+    def _fetch(self, keys: list):
+        ranges = lambda wss: [absolute_range_name(wss[k].title) for k in keys] + \
+                             [absolute_range_name(wss["changes"].title, CHANGES_COUNT_CELL)]
+        wss = self.worksheets()
+        try:
+            values = fetch_values(wss["bookings"].spreadsheet, ranges(wss))
+        except gspread.exceptions.APIError:
+            # közben törölt / átnevezett lap: újranyitás, egy újrapróba
+            self._wss = None
+            wss = self.worksheets()
+            values = fetch_values(wss["bookings"].spreadsheet, ranges(wss))
+        return dict(zip(keys, values[:-1])), changes_count(values[-1])
+
+    def _bookings_from_sheet(self, values: list):
+        wss    = self.worksheets()
+        header = sheet_header(values)
+        df     = values_to_df(values).fillna("")
+        backfill = ROW_ID_COL not in df.columns or (df[ROW_ID_COL].astype(str).str.strip()=="").any()
+        df = ensure_row_ids(wss["bookings"], df, BOOKING_COLUMNS, header)
+        df = ensure_columns(wss["bookings"], df, BOOKING_COLUMNS, header)
+        self._header = header
+        self._rowmap = RowMap.from_df(df)
+        df = df[~is_deleted(df[ROW_ID_COL])]  # a törölt sorok jelölése (lovarda.sheets)
+        if backfill and len(df):
+            # más folyamatok pillanatképében még a régi (ID nélküli) sorok vannak
+            wss["changes"].append_row(change_entry(OP_RELOAD, None))
+        return parse_bookings(df)
+
+    def _reload_bookings(self):
+        raw, seen = self._fetch(["bookings"])
+        return (*self._bookings_from_sheet(raw["bookings"]), seen)
+
+    def _fetch_changes(self, first_row: int):
+        ws = self.worksheets()["changes"]
+        return fetch_values(ws.spreadsheet, [absolute_range_name(ws.title, f"A{first_row}:C")])[0]
+
+    def _small_tables(self) -> dict:
+        with self._lock:
+            stale = self._small is None or _time.monotonic() - self._small_at > self.small_ttl
+            METRICS.cache("sheets.small", not stale)
+            if stale:
+                keys = list(SMALL_TABLES) + ([] if self.sync.seeded else ["bookings"])
+                raw, seen = self._fetch(keys)
+                if "bookings" in raw:
+                    self.sync.seed(*self._bookings_from_sheet(raw["bookings"]), seen)
+                self._small = {
+                    "users":    values_to_df(raw["users"]).fillna(""),
+                    "blocked":  parse_blocked(values_to_df(raw["blocked"])),
+                    "settings": parse_settings(values_to_df(raw["settings"])),
+                    "lunch":    parse_lunch(values_to_df(raw["lunch"])),
+                }
+                self._small_at = _time.monotonic()
+            return self._small
+
+    # ---- olvasás ----
+    def load_bookings(self):
+        self._small_tables()  # hidegindításkor ez hozza a foglalásokat is, ugyanabban a hívásban
+        self.sync.refresh(self._fetch_changes, self._reload_bookings)
+        return self.sync.snapshot()
+
+    def load_users(self):
+        return self._small_tables()["users"].copy()
+
+    def load_blocked(self):
+        return self._small_tables()["blocked"].copy()
+
+    def load_settings(self):
+        return self._small_tables()["settings"].copy()
+
+    def load_lunch_overrides(self):
+        return self._small_tables()["lunch"].copy()
+
+    def version(self):
+        return (self.sync.seen_row, self.sync.loaded_at)
+
+    def changes_since(self, token):
+        return self.sync.token(), self.sync.entries_since(token)
+
+    def adopt_bookings(self, df, idx, token):
+        if token[0]!=self.sync.seed_id or token[1] > self.sync.seen_row:
+            self.sync.adopt(df, idx, token)
+
+    def expire(self, keys=TABLES):
+        if "bookings" in keys:
+            self.sync.checked_at = 0.0  # a következő load_bookings lekéri a napló újabb sorait
+        if any(k in SMALL_TABLES for k in keys):
+            self._small = None
+
+    # ---- írás ----
+    def _log(self, op: str, payload):
+        self.worksheets()["changes"].append_rows(change_entries(op, payload))
+        self.sync.refresh(self._fetch_changes, self._reload_bookings, force=True)
+
+    def _columns(self) -> list:
+        # a lap fejléce, nem a df oszlopai: a df-ből kimaradnak az üres (kitöltő) oszlopok
+        if self._header is None:
+            self._header = self.worksheets()["bookings"].row_values(1) or list(BOOKING_COLUMNS)
+        return self._header
+
+    def _rows(self) -> RowMap:
+        if self._rowmap is None:  # még nem volt teljes betöltés: az első locate olvas
+            self._rowmap = RowMap({}, 1)
+        return self._rowmap
+
+    def _locate(self, row_ids) -> dict:
+        return self._rows().locate(self.worksheets()["bookings"], self._columns(), row_ids)
+
+    def append_bookings(self, rows: list):
+        # újrapróbálható: ha egy korábbi próbálkozás a sorok kiírása után (pl. a
+        # naplónál) akadt el, a lapon már meglévő ID-ket nem fűzzük hozzá újra
+        ws  = self.worksheets()["bookings"]
+        ids = {r[ROW_ID_COL] for r in rows}
+        new = rows
+        if ids & self._unsure:
+            have = self._locate(ids)
+            new  = [r for r in rows if r[ROW_ID_COL] not in have]
+        self._unsure |= ids
+        resp = append_rows(ws, new, self._columns())
+        self._rows().appended(resp, [r[ROW_ID_COL] for r in new])
+        self._log(OP_APPEND, rows)
+        self._unsure -= ids
+
+    def update_bookings(self, changes: dict):
+        update_rows(self.worksheets()["bookings"], self._columns(), self._locate(changes), changes)
+        self._log(OP_UPDATE, changes)
+
+    def delete_bookings(self, row_ids):
+        row_ids = list(row_ids)
+        delete_rows(self.worksheets()["bookings"], self._columns(), self._locate(row_ids), row_ids)
+        self._rows().forget(row_ids)
+        self._log(OP_DELETE, row_ids)
+
+    def compact_bookings(self) -> int:
+        # a törölt sorok jelölésének eltávolítása (admin művelet). A tömörítés alatt
+        # érkezett naplóbejegyzéseket újra kiírjuk, mert az írás felülírhatta őket; a
+        # többi példány RowMap-je az ellenőrző olvasáskor észreveszi az eltolódást.
+        ws = self.worksheets()["bookings"]
+        raw, seen = self._fetch(["bookings"])
+        live = compact_rows(ws, raw["bookings"])
+        if live is None:
+            return 0
+        self._header = sheet_header(raw["bookings"])
+        self._rowmap = RowMap.from_ids(live)
+        for entry in self._fetch_changes(seen + 1):
+            try:
+                op, payload = entry[1], json.loads(entry[2])
+            except (IndexError, ValueError):
+                continue
+            if op==OP_APPEND:
+                new  = [r for r in payload if r.get(ROW_ID_COL) not in self._rowmap.pos]
+                resp = append_rows(ws, new, self._header)
+                self._rowmap.appended(resp, [r[ROW_ID_COL] for r in new])
+            elif op==OP_UPDATE:
+                update_rows(ws, self._header, self._locate(payload), payload)
+            elif op==OP_DELETE:
+                delete_rows(ws, self._header, self._locate(payload), payload)
+                self._rowmap.forget(payload)
+        self._log(OP_RELOAD, None)
+        return len(raw["bookings"]) - 1 - len(live)
+
+    def save_table(self, key: str, df: pd.DataFrame):
+        ws = self.worksheets()[key]
+        if key=="bookings":
+            df = wire_bookings(df)
+        ws.clear()
+        set_with_dataframe(ws, df, include_index=False)
+        if key=="bookings":
+            self._header = [str(c) for c in df.columns]
+            self._rowmap = None
+            self._log(OP_RELOAD, None)
+        else:
+            self._small = None
@@ -0,0 +1,66 @@
+from datetime import time
+
+import numpy as np
+
+# ---- Slot motor ----
+# Minden időpont egész perc a nap kezdetétől. A jelölt kezdések csak a
+# beállításoktól függenek (nyitás, zárás, ebéd, átnyergelés), a foglalásoktól
+# nem, ezért ezeket egyszer generáljuk, az ütközést pedig numpy-val,
+# rendezett intervallumtömbökön, egyetlen lépésben számoljuk minden hosszra.
+
+DURATIONS = (30, 60, 90)
+
+
+def to_min(t: time) -> int:
+    return t.hour*60 + t.minute
+
+def from_min(m) -> time:
+    m = int(m)
+    return time(m//60, m%60)
+
+def candidate_starts(duration, day_start, day_end, lunch_start, lunch_dur, break_min) -> np.ndarray:
+    # ugyanaz a léptetés, mint a régi datetime-os ciklusban:
+    # ebédbe eső kezdésnél ebédhossznyit ugrik, különben duration+break_min-t
+    lunch_end  = lunch_start + lunch_dur
+    last_start = day_end - duration
+    out, cur   = [], day_start
+    while cur <= last_start:
+        if lunch_start <= cur < lunch_end:
+            cur += lunch_dur
+            continue
+        out.append(cur)
+        cur += duration + break_min
+    return np.asarray(out, dtype=np.int64)
+
+def booked_intervals(starts, durations):
+    # kezdés szerint rendezett kezdések + a végek prefix-maximuma
+    bs = np.asarray(starts, dtype=np.int64)
+    be = bs + np.asarray(durations, dtype=np.int64)
+    order = np.argsort(bs, kind="stable")
+    bs, be = bs[order], be[order]
+    return bs, np.maximum.accumulate(be) if be.size else be
+
+def overlaps(cand_start, cand_end, bs, be_max) -> np.ndarray:
+    # [s,e) ütközik, ha van foglalás, ami e előtt kezdődik és s után ér véget
+    k = np.searchsorted(bs, cand_end, side="left")
+    hit = np.zeros(len(cand_start), dtype=bool)
+    has = k > 0
+    hit[has] = be_max[k[has] - 1] > cand_start[has]
+    return hit
+
+def free_slots(booked_starts, booked_durs, *, day_start, day_end,
+               lunch_start, lunch_dur, break_min, durations=DURATIONS) -> dict:
+    # {hossz: [(kezdés_perc, vég_perc), ...]} minden kért hosszra egy menetben
+    bs, be_max = booked_intervals(booked_starts, booked_durs)
+    cands = [candidate_starts(d, day_start, day_end, lunch_start, lunch_dur, break_min)
+             for d in durations]
+    starts = np.concatenate(cands) if cands else np.empty(0, dtype=np.int64)
+    ends   = np.concatenate([c + d for c, d in zip(cands, durations)]) if cands else starts
+    free   = ~overlaps(starts, ends, bs, be_max)
+
+    out, pos = {}, 0
+    for d, c in zip(durations, cands):
+        sl = slice(pos, pos + len(c))
+        out[d] = list(zip(starts[sl][free[sl]].tolist(), ends[sl][free[sl]].tolist()))
+        pos += len(c)
+    return out
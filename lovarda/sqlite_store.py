@@ -0,0 +1,205 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, time
+
+import pandas as pd
+
+from lovarda.index import BookingIndex
+from lovarda.metrics import METRICS
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.schema import typed_bookings, wire_bookings
+from lovarda.storage import DEFAULT_SETTINGS, Storage, parse_lunch
+
+# ---- Helyi SQLite tároló ----
+# WAL módban fut (olvasók nem várnak az íróra), minden írás egy rövid
+# tranzakció. Táblánként egy meta.rev.<tábla> számláló nő az írásnál; a
+# betöltött táblákat ehhez kötve tartjuk memóriában, akár több folyamat is
+# írhat. Így egy kis tábla mentése nem dobja el a foglalások gyorsítótárát.
+
+BOOKING_FIELDS = [  # (DataFrame oszlop, SQL oszlop)
+    ("Dátum",            "datum"),
+    ("Gyermek(ek) neve", "nev"),
+    ("Lovak",            "lovak"),
+    ("Kezdés",           "kezdes"),
+    ("Időtartam (perc)", "perc"),
+    ("Fő",               "fo"),
+    ("Ismétlődik",       "ismetlodik"),
+    ("RepeatGroupID",    "sorozat"),
+    ("Megjegyzés",       "megjegyzes"),
+    (OWNER_COL,          "felhasznalo"),
+    (ROW_ID_COL,         "id"),
+]
+TO_SQL = dict(BOOKING_FIELDS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    id TEXT PRIMARY KEY, datum TEXT NOT NULL, nev TEXT, lovak TEXT, kezdes TEXT,
+    perc INTEGER, fo INTEGER, ismetlodik INTEGER, sorozat TEXT, megjegyzes TEXT,
+    felhasznalo TEXT
+);
+CREATE INDEX IF NOT EXISTS bookings_datum   ON bookings(datum);
+CREATE INDEX IF NOT EXISTS bookings_sorozat ON bookings(sorozat);
+CREATE TABLE IF NOT EXISTS users    (username TEXT PRIMARY KEY, password TEXT);
+CREATE TABLE IF NOT EXISTS blocked  (datum TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS lunch    (datum TEXT PRIMARY KEY, kezdes TEXT, perc INTEGER);
+CREATE TABLE IF NOT EXISTS meta     (key TEXT PRIMARY KEY, value INTEGER);
+"""
+
+SMALL_SQL = {  # kulcs: (tábla, [(DataFrame oszlop, SQL oszlop), ...])
+    "users":    ("users",    [("username","username"), ("password","password")]),
+    "blocked":  ("blocked",  [("Dátum","datum")]),
+    "settings": ("settings", [("Key","key"), ("Value","value")]),
+    "lunch":    ("lunch",    [("Dátum","datum"), ("Kezdes","kezdes"), ("HosszPerc","perc")]),
+}
+
+REV_KEYS = ("bookings",) + tuple(SMALL_SQL)
+
+MIGRATIONS = [  # (tábla, oszlop, típus): régebbi adatbázisokhoz
+    ("bookings", "felhasznalo", "TEXT"),
+]
+
+
+def db_value(v):
+    if hasattr(v, "item") and not isinstance(v, str):
+        v = v.item()  # numpy skalár -> python
+    if v is None or (isinstance(v, str) and v=="") or (not isinstance(v, str) and pd.isnull(v)):
+        return None
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, date):
+        return v.isoformat()[:10]
+    if isinstance(v, time):
+        return v.strftime("%H:%M")
+    if isinstance(v, (int, float)):
+        return v
+    return str(v)
+
+
+class SqliteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path   = path
+        self._cache = {}  # kulcs -> (rev, érték)
+        self._lock  = threading.Lock()
+        con = self._connect()
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            for table, col, typ in MIGRATIONS:
+                if col not in {row[1] for row in con.execute(f"PRAGMA table_info({table})")}:
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
+            con.execute("CREATE INDEX IF NOT EXISTS bookings_felhasznalo ON bookings(felhasznalo)")
+            con.executemany("INSERT OR IGNORE INTO meta VALUES (?, 0)", [(f"rev.{k}",) for k in REV_KEYS])
+            con.executemany("INSERT OR IGNORE INTO settings VALUES (?,?)", DEFAULT_SETTINGS)
+        finally:
+            con.close()
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @contextmanager
+    def _tx(self, key: str):
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            yield con
+            con.execute("UPDATE meta SET value = value + 1 WHERE key=?", (f"rev.{key}",))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def version(self, key="bookings"):
+        con = self._connect()
+        try:
+            return con.execute("SELECT value FROM meta WHERE key=?", (f"rev.{key}",)).fetchone()[0]
+        finally:
+            con.close()
+
+    def _cached(self, key: str, build):
+        rev = self.version(key)
+        with self._lock:
+            hit = self._cache.get(key)
+            METRICS.cache(f"sqlite.{key}", hit is not None and hit[0]==rev)
+            if hit is None or hit[0]!=rev:
+                con = self._connect()
+                try:
+                    hit = (rev, build(con))
+                finally:
+                    con.close()
+                self._cache[key] = hit
+            return hit[1]
+
+    # ---- olvasás ----
+    def _read_bookings(self, con):
+        sql = "SELECT " + ", ".join(c for _, c in BOOKING_FIELDS) + " FROM bookings ORDER BY rowid"
+        df  = pd.read_sql_query(sql, con)
+        df.columns = [name for name, _ in BOOKING_FIELDS]
+        df["Ismétlődik"] = df["Ismétlődik"].fillna(0).astype(bool)
+        df = typed_bookings(df)
+        return df, BookingIndex.from_df(df)
+
+    def _read_small(self, key: str, con):
+        table, fields = SMALL_SQL[key]
+        df = pd.read_sql_query(f"SELECT {', '.join(c for _, c in fields)} FROM {table} ORDER BY rowid", con)
+        df.columns = [name for name, _ in fields]
+        if key=="blocked":
+            df["Dátum"] = pd.to_datetime(df["Dátum"]).dt.date
+        elif key=="lunch":
+            df = parse_lunch(df)
+        return df.fillna("")
+
+    def load_bookings(self):
+        df, idx = self._cached("bookings", self._read_bookings)
+        return df.copy(), idx.copy()
+
+    def load_users(self):
+        return self._cached("users", lambda con: self._read_small("users", con)).copy()
+
+    def load_blocked(self):
+        return self._cached("blocked", lambda con: self._read_small("blocked", con)).copy()
+
+    def load_settings(self):
+        return self._cached("settings", lambda con: self._read_small("settings", con)).copy()
+
+    def load_lunch_overrides(self):
+        return self._cached("lunch", lambda con: self._read_small("lunch", con)).copy()
+
+    # ---- írás: minden művelet egy tranzakció ----
+    def append_bookings(self, rows: list):
+        cols = ", ".join(c for _, c in BOOKING_FIELDS)
+        marks = ", ".join("?" for _ in BOOKING_FIELDS)
+        with self._tx("bookings") as con:
+            con.executemany(f"INSERT INTO bookings ({cols}) VALUES ({marks})",
+                            [[db_value(r.get(name, "")) for name, _ in BOOKING_FIELDS] for r in rows])
+
+    def update_bookings(self, changes: dict):
+        with self._tx("bookings") as con:
+            for rid, cols in changes.items():
+                for name, v in cols.items():
+                    con.execute(f"UPDATE bookings SET {TO_SQL[name]} = ? WHERE id = ?",
+                                (db_value(v), rid))
+
+    def delete_bookings(self, row_ids):
+        with self._tx("bookings") as con:
+            con.executemany("DELETE FROM bookings WHERE id = ?", [(rid,) for rid in row_ids])
+
+    def save_table(self, key: str, df: pd.DataFrame):
+        if key=="bookings":
+            df = wire_bookings(df)
+            table, fields = "bookings", [(n, c) for n, c in BOOKING_FIELDS if n in df.columns]
+        else:
+            table, fields = SMALL_SQL[key]
+        cols  = ", ".join(c for _, c in fields)
+        marks = ", ".join("?" for _ in fields)
+        rows  = [[db_value(v) for v in r] for r in df[[n for n, _ in fields]].itertuples(index=False)]
+        with self._tx(key) as con:
+            con.execute(f"DELETE FROM {table}")
+            con.executemany(f"INSERT OR REPLACE INTO {table} ({cols}) VALUES ({marks})", rows)
@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# ---- Statisztika: előre összesített számlálók ----
+# A foglalás-index minden add/remove hívása frissíti a napi, heti és havi
+# összesítőket (darab, perc, ebből ismétlődő), valamint a hét napja x óra
+# hőtérképet. A fül ezekből és a foglalható-napok naptárából számol, így
+# sosem megy végig a teljes foglalási táblán.
+
+FIELDS = ("count", "minutes", "rec_count", "rec_minutes")
+ZERO   = (0, 0, 0, 0)
+WEEKDAYS = ["Hétfő", "Kedd", "Szerda", "Csütörtök", "Péntek", "Szombat", "Vasárnap"]
+
+
+def _plus(a: tuple, b: tuple, sign=1) -> tuple:
+    return tuple(x + sign*y for x, y in zip(a, b))
+
+def _hour_minutes(starts, ends):
+    # [s,e) intervallumok -> (óra, perc) párok, óránként felosztva
+    starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+    first, last = starts//60, np.maximum(ends - 1, starts)//60
+    span = (last - first + 1).clip(min=1)
+    row  = np.repeat(np.arange(len(starts)), span)
+    hour = first[row] + (np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span))
+    mins = np.minimum(ends[row], (hour + 1)*60) - np.maximum(starts[row], hour*60)
+    return row, hour.clip(0, 23), mins.clip(min=0)
+
+
+class Rollups:
+    def __init__(self):
+        self.days      = {}   # dátum -> (darab, perc, ismétlődő darab, ismétlődő perc)
+        self.weeks     = {}   # (iso év, hét) -> ugyanez
+        self.months    = {}   # (év, hónap) -> ugyanez
+        self.heat      = np.zeros((7, 24), dtype=np.int64)  # hét napja x óra -> foglalt perc
+        self.recurring = set()  # ismétlődő sorok ID-i (törléskor kell)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame):
+        # frame: d (datetime64), s, e (perc), id, rec (bool) — a BookingIndex.from_df-ből
+        r = cls()
+        if frame.empty:
+            return r
+        dur = (frame["e"] - frame["s"]).to_numpy()
+        rec = frame["rec"].to_numpy(dtype=bool)
+        agg = pd.DataFrame({"d": frame["d"].to_numpy(), "count": 1, "minutes": dur,
+                            "rec_count": rec.astype(np.int64), "rec_minutes": np.where(rec, dur, 0)})
+        per_day = agg.groupby("d", sort=True)[list(FIELDS)].sum()
+        for ts, vals in zip(per_day.index, per_day.itertuples(index=False, name=None)):
+            d = ts.date()
+            vals = tuple(int(v) for v in vals)
+            r.days[d] = vals
+            wk, mo = d.isocalendar()[:2], (d.year, d.month)
+            r.weeks[wk]  = _plus(r.weeks.get(wk, ZERO), vals)
+            r.months[mo] = _plus(r.months.get(mo, ZERO), vals)
+        row, hour, mins = _hour_minutes(frame["s"].to_numpy(), frame["e"].to_numpy())
+        wd = pd.DatetimeIndex(frame["d"].to_numpy()).weekday.to_numpy()
+        np.add.at(r.heat, (wd[row], hour), mins)
+        r.recurring = set(frame["id"].to_numpy()[rec].tolist())
+        return r
+
+    def copy(self):
+        r = Rollups()
+        r.days, r.weeks, r.months = dict(self.days), dict(self.weeks), dict(self.months)
+        r.heat, r.recurring = self.heat.copy(), set(self.recurring)
+        return r
+
+    def _bump(self, d: date, start: int, end: int, rec: bool, sign: int):
+        dur  = end - start
+        vals = (1, dur, int(rec), dur if rec else 0)
+        wk, mo = d.isocalendar()[:2], (d.year, d.month)
+        for table, key in ((self.days, d), (self.weeks, wk), (self.months, mo)):
+            new = _plus(table.get(key, ZERO), vals, sign)
+            if new[0]:
+                table[key] = new
+            else:
+                table.pop(key, None)
+        row, hour, mins = _hour_minutes([start], [end])
+        np.add.at(self.heat, (np.full(len(row), d.weekday()), hour), sign*mins)
+
+    def add(self, row_id: str, d: date, start: int, end: int, recurring=False):
+        if recurring:
+            self.recurring.add(row_id)
+        self._bump(d, start, end, bool(recurring), 1)
+
+    def remove(self, row_id: str, d: date, start: int, end: int):
+        rec = row_id in self.recurring
+        self.recurring.discard(row_id)
+        self._bump(d, start, end, rec, -1)
+
+
+# ---- Táblák a fülhöz ----
+def day_table(rollups: Rollups, calendar, *, open_minutes: int, break_min: int) -> pd.DataFrame:
+    # calendar: BookableCalendar a vizsgált időszakra; foglalható perc = nyitva
+    # tartás - ebéd - átnyergelés foglalásonként (foglalással bíró napon mindig)
+    dates = [calendar.first + timedelta(days=i) for i in range(len(calendar))]
+    vals  = np.array([rollups.days.get(d, ZERO) for d in dates], dtype=np.int64).reshape(-1, 4)
+    df    = pd.DataFrame(vals, columns=list(FIELDS), index=pd.DatetimeIndex(dates, name="Dátum"))
+    open_ = (calendar.ok | (df["count"].to_numpy() > 0))
+    avail = np.where(open_, open_minutes - calendar.lunch_dur.astype(np.int64)
+                             - break_min*df["count"].to_numpy(), 0).clip(min=0)
+    df["available"]   = avail
+    df["utilization"] = np.where(avail > 0, df["minutes"]/np.maximum(avail, 1), np.nan)
+    return df
+
+def period_table(rollups: Rollups, days: pd.DataFrame, period: str) -> pd.DataFrame:
+    # "W": ISO hét, "M": hónap; darab / perc az összesítőkből, a szabad perc a napokból
+    if days.empty:
+        return pd.DataFrame(columns=list(FIELDS) + ["available", "utilization"])
+    if period=="W":
+        iso  = days.index.isocalendar()
+        keys = list(zip(iso["year"], iso["week"]))
+        table, label = rollups.weeks, lambda k: f"{k[0]}-H{k[1]:02d}"
+    else:
+        keys = list(zip(days.index.year, days.index.month))
+        table, label = rollups.months, lambda k: f"{k[0]}-{k[1]:02d}"
+    avail = pd.Series(days["available"].to_numpy(), index=pd.MultiIndex.from_tuples(keys)).groupby(level=[0, 1]).sum()
+    out = pd.DataFrame([table.get(k, ZERO) for k in avail.index], columns=list(FIELDS),
+                       index=[label(k) for k in avail.index])
+    out["available"]   = avail.to_numpy()
+    out["utilization"] = np.where(out["available"] > 0, out["minutes"]/out["available"].clip(lower=1), np.nan)
+    return out
+
+def weekday_table(days: pd.DataFrame) -> pd.DataFrame:
+    g = days.groupby(days.index.weekday)[["count", "minutes", "available"]].sum()
+    g["utilization"] = np.where(g["available"] > 0, g["minutes"]/g["available"].clip(lower=1), np.nan)
+    g.index = [WEEKDAYS[i] for i in g.index]
+    return g
+
+def heat_table(rollups: Rollups, first_hour=0, last_hour=23) -> pd.DataFrame:
+    # hosszú formátum a hőtérképhez: nap, óra, perc
+    wd, hr = np.meshgrid(np.arange(7), np.arange(first_hour, last_hour + 1), indexing="ij")
+    return pd.DataFrame({"nap": [WEEKDAYS[i] for i in wd.ravel()], "óra": hr.ravel(),
+                         "perc": rollups.heat[:, first_hour:last_hour + 1].ravel()})
+
+def totals(rollups: Rollups) -> dict:
+    t = ZERO
+    for v in rollups.months.values():
+        t = _plus(t, v)
+    out = dict(zip(FIELDS, t))
+    out["rec_share"] = out["rec_count"]/out["count"] if out["count"] else 0.0
+    return out
@@ -0,0 +1,231 @@
+import hashlib
+import threading
+import time as _time
+
+import pandas as pd
+
+from lovarda.index import BookingIndex
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.schema import typed_bookings
+from lovarda.sync import OP_APPEND, OP_DELETE, OP_UPDATE
+
+# ---- Tárolási réteg ----
+# Minden tároló ugyanazokat a DataFrame-eket adja (foglalások + index,
+# felhasználók, tiltott napok, beállítások, napi ebédszünetek), így az
+# alkalmazás nem tudja, hogy Google Sheets vagy SQLite van alatta. A konkrét
+# tárolók (és így a gspread) csak az open_storage hívásakor töltődnek be.
+
+BOOKING_COLUMNS = ["Dátum","Gyermek(ek) neve","Lovak","Kezdés","Időtartam (perc)","Fő",
+                   "Ismétlődik","RepeatGroupID","Megjegyzés",OWNER_COL,ROW_ID_COL]
+SMALL_TABLES    = ("users", "blocked", "settings", "lunch")
+TABLES          = ("bookings",) + SMALL_TABLES
+DEFAULT_SETTINGS = [["lunch_start","12:00"], ["lunch_dur","45"], ["break_min","10"]]
+
+
+class Storage:
+    name = ""
+
+    def load_bookings(self):
+        raise NotImplementedError
+
+    def load_users(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def load_blocked(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def load_settings(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def load_lunch_overrides(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def append_bookings(self, rows: list):
+        raise NotImplementedError
+
+    def update_bookings(self, changes: dict):
+        raise NotImplementedError
+
+    def delete_bookings(self, row_ids):
+        raise NotImplementedError
+
+    def save_table(self, key: str, df: pd.DataFrame):
+        # teljes csere; a kis táblákhoz és az egyszeri import/exporthoz
+        raise NotImplementedError
+
+    def version(self):
+        # a foglalások verziója: bármilyen összehasonlítható érték, ami írás után megváltozik
+        raise NotImplementedError
+
+    def expire(self, keys=TABLES):
+        # a folyamaton belüli gyorsítótár eldobása: a következő olvasás a háttértárból jön
+        pass
+
+    def compact_bookings(self) -> int:
+        # a törölt sorok jelöléseinek eltávolítása, ha a tároló ilyet használ -> eltávolított sorok
+        return 0
+
+    # ---- a megosztott gyorsítótárnak (lovarda.shared_cache) ----
+    def changes_since(self, token):
+        # (új token, foglalás-műveletek a token óta); a műveletek None, ha nem követhető
+        # vissza, ilyenkor teljes pillanatkép kell. Azonos token = változatlan tartalom.
+        return ("version", self.version()), None
+
+    def adopt_bookings(self, df, idx, token):
+        # egy másik folyamat tokennel ellátott pillanatképének átvétele, ha a tároló tudja
+        pass
+
+    def load(self, key: str):
+        if key=="bookings":
+            return self.load_bookings()[0]
+        return {"users": self.load_users, "blocked": self.load_blocked,
+                "settings": self.load_settings, "lunch": self.load_lunch_overrides}[key]()
+
+
+# ---- Lapok értelmezése ----
+def parse_blocked(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.fillna("")
+    if "Dátum" not in df.columns:
+        return pd.DataFrame(columns=["Dátum"])
+    df["Dátum"] = pd.to_datetime(df["Dátum"]).dt.date
+    return df
+
+def parse_settings(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.fillna("")
+    df.columns = ["Key","Value"]
+    return df
+
+def parse_lunch(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.fillna("")
+    if not df.empty:
+        df["Dátum"]     = pd.to_datetime(df["Dátum"]).dt.date
+        df["Kezdes"]    = pd.to_datetime(df["Kezdes"].astype(str)).dt.time
+        df["HosszPerc"] = df["HosszPerc"].astype(int)
+    return df
+
+def parse_bookings(df: pd.DataFrame):
+    df = typed_bookings(df)
+    return df, BookingIndex.from_df(df)
+
+def table_digest(df: pd.DataFrame) -> str:
+    # tartalom-ujjlenyomat (oszlopok + cellák szövegként), a sorrend számít
+    h = hashlib.blake2b(repr(list(df.columns)).encode(), digest_size=16)
+    h.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+# ---- SQLite másolat ----
+class ReplicaStorage(Storage):
+    # olvasás a helyi másolatból, írás a forrásba; refresh_every mp-enként
+    # ellenőrizzük a forrást, de egy kis táblát csak tartalomváltozáskor másolunk
+    # újra. A foglalásokhoz a forrás changes_since műveleteit alkalmazzuk (a saját
+    # írásokat is innen), teljes másolat csak akkor kell, ha a forrás nem tudja
+    # visszakövetni a változást. A version() a SQLite foglalás-számlálója, így a
+    # kis táblák másolása nem érvényteleníti.
+    name = "replica"
+
+    def __init__(self, primary: Storage, replica: Storage, refresh_every=60):
+        self.primary, self.replica = primary, replica
+        self.refresh_every = refresh_every
+        self._synced         = None  # a forrás tokenje az utolsó átvett állapotnál
+        self._checked_at     = 0.0
+        self._digests        = {}  # kis tábla -> az utoljára átmásolt tartalom ujjlenyomata
+        self._lock           = threading.Lock()
+
+    def _refresh(self):
+        with self._lock:
+            now = _time.monotonic()
+            if self._synced is not None and now - self._checked_at < self.refresh_every:
+                return
+            self._checked_at = now
+            self.primary.load_bookings()  # olcsó: delta szinkron
+            for key in SMALL_TABLES:
+                df = self.primary.load(key)
+                digest = table_digest(df)
+                if digest!=self._digests.get(key):
+                    self.replica.save_table(key, df)
+                    self._digests[key] = digest
+            self._catch_up(self.primary.changes_since(self._synced))
+
+    def _catch_up(self, delta):
+        # delta: a forrás changes_since eredménye; hívó tartja a zárat
+        token, entries = delta
+        if token==self._synced:
+            return
+        if entries is None:
+            copy_storage(self.primary, self.replica, ("bookings",))
+        else:
+            for op, payload in entries:
+                {OP_APPEND: self.replica.append_bookings, OP_UPDATE: self.replica.update_bookings,
+                 OP_DELETE: self.replica.delete_bookings}[op](payload)
+        self._synced = token
+
+    def load_bookings(self):
+        self._refresh()
+        return self.replica.load_bookings()
+
+    def load_users(self):
+        self._refresh()
+        return self.replica.load_users()
+
+    def load_blocked(self):
+        self._refresh()
+        return self.replica.load_blocked()
+
+    def load_settings(self):
+        self._refresh()
+        return self.replica.load_settings()
+
+    def load_lunch_overrides(self):
+        self._refresh()
+        return self.replica.load_lunch_overrides()
+
+    def version(self):
+        return self.replica.version()
+
+    def _write(self, write):
+        # a saját írás a forrás műveleteiből jut a másolatba (a közben érkezett idegen
+        # változásokkal együtt); ha a forrás ezt nem tudja, közvetlenül is beírjuk, és
+        # a következő frissítés teljes másolatot készít
+        write(self.primary)
+        with self._lock:
+            delta = self.primary.changes_since(self._synced)
+            if self._synced is None or delta[1] is None:
+                write(self.replica)
+            else:
+                self._catch_up(delta)
+
+    def append_bookings(self, rows: list):
+        self._write(lambda s: s.append_bookings(rows))
+
+    def update_bookings(self, changes: dict):
+        self._write(lambda s: s.update_bookings(changes))
+
+    def delete_bookings(self, row_ids):
+        row_ids = list(row_ids)
+        self._write(lambda s: s.delete_bookings(row_ids))
+
+    def save_table(self, key: str, df: pd.DataFrame):
+        self.primary.save_table(key, df)
+        self.replica.save_table(key, df)
+
+    def compact_bookings(self) -> int:
+        return self.primary.compact_bookings()  # a SQLite-ban nincsenek jelölt sorok
+
+
+# ---- Import / export ----
+def copy_storage(src: Storage, dst: Storage, tables=TABLES):
+    for key in tables:
+        dst.save_table(key, src.load(key))
+
+def open_storage(kind: str, *, sheet_id=None, json_path=None, sqlite_path=None) -> Storage:
+    if kind=="sqlite":
+        from lovarda.sqlite_store import SqliteStorage
+        return SqliteStorage(sqlite_path)
+    from lovarda.sheets_store import SheetsStorage
+    if kind=="sheets":
+        return SheetsStorage(sheet_id, json_path)
+    if kind=="replica":
+        from lovarda.sqlite_store import SqliteStorage
+        return ReplicaStorage(SheetsStorage(sheet_id, json_path), SqliteStorage(sqlite_path))
+    raise ValueError(f"Ismeretlen tároló: {kind}")
@@ -0,0 +1,202 @@
+import json
+import threading
+import time as _time
+import uuid
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from lovarda.metrics import METRICS
+from lovarda.rows import OWNER_COL, ROW_ID_COL, cell_value
+from lovarda.schema import concat_typed, set_cells, typed_rows
+
+# ---- Foglalások inkrementális szinkronja ----
+# Minden saját írás egy sort fűz a "Valtozasok" naplólapra (idő, művelet,
+# JSON adat). A folyamat egyetlen pillanatképet tart a foglalásokról, és
+# csak a napló új sorait kéri le: üres válasz = nincs változás, különben a
+# bejegyzéseket helyben alkalmazza. Teljes újratöltés csak induláskor,
+# "reload" bejegyzésnél vagy biztonsági okból, ritkán történik.
+
+CHANGES_HEADER     = ["Idő", "Művelet", "Adat"]
+CHANGES_COUNT_CELL = "E1"   # =COUNTA(A:A): a napló utolsó sorának száma
+SYNC_INTERVAL      = 5      # mp, ennyin belül nem kérdezünk rá újra
+FULL_RELOAD_EVERY  = 15*60  # mp, kézi szerkesztések miatti biztonsági újratöltés
+JOURNAL_MAX        = 500    # az utolsó alkalmazott bejegyzések (megosztott gyorsítótárnak)
+CELL_MAX           = 50_000 # a Sheets cellakorlátja (karakter); az Adat cella ez alatt marad
+
+OP_APPEND = "append"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+OP_RELOAD = "reload"
+
+TIMING_COLS = ("Dátum", "Kezdés", "Időtartam (perc)")
+INDEX_COLS  = TIMING_COLS + (OWNER_COL, "Gyermek(ek) neve", "Ismétlődik", "RepeatGroupID")
+
+
+def _dumps(payload) -> str:
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+def change_entry(op: str, payload) -> list:
+    if op==OP_APPEND:
+        payload = [{k: cell_value(v) for k, v in r.items()} for r in payload]
+    return [datetime.now().isoformat(timespec="seconds"), op, _dumps(payload)]
+
+def change_entries(op: str, payload) -> list:
+    # egy nagy köteg több naplósorra bontva: minden Adat cella a CELL_MAX alatt marad,
+    # a sorok egymás után alkalmazva ugyanazt adják, mint egyben
+    if payload is None:
+        return [change_entry(op, payload)]
+    items  = list(payload.items()) if isinstance(payload, dict) else list(payload)
+    wrap   = dict if isinstance(payload, dict) else list
+    chunks, part, size = [], [], 2
+    for item in items:
+        n = len(_dumps(item)) + 2  # elválasztó
+        if part and size + n > CELL_MAX:
+            chunks.append(part)
+            part, size = [], 2
+        part.append(item)
+        size += n
+    chunks.append(part)
+    return [change_entry(op, wrap(c)) for c in chunks]
+
+def _index_row(idx, r, rid: str, label):
+    # típusos sor (lovarda.schema) felvétele a napi és a felhasználói indexbe
+    if pd.isna(r["Dátum"]) or pd.isna(r["Kezdés"]) or pd.isna(r["Időtartam (perc)"]):
+        return
+    idx.add(r["Dátum"].date(), int(r["Kezdés"]), int(r["Időtartam (perc)"]), rid, label,
+            r.get(OWNER_COL, ""), r.get("Gyermek(ek) neve", ""), bool(r.get("Ismétlődik", False)),
+            r.get("RepeatGroupID", ""))
+
+# ---- a memóriabeli tábla + index módosítása (saját írás és napló is ezt használja) ----
+def apply_append(df: pd.DataFrame, idx, rows: list) -> pd.DataFrame:
+    rows  = [r for r in rows if r[ROW_ID_COL] not in idx]  # ismételt naplóbejegyzés
+    if not rows:
+        return df
+    first = int(df.index.max()) + 1 if len(df) else 0
+    new   = typed_rows(rows, df.columns)
+    new.index = range(first, first + len(new))
+    for label, r in new.iterrows():
+        _index_row(idx, r, r[ROW_ID_COL], label)
+    return concat_typed(df, new)
+
+def apply_update(df: pd.DataFrame, idx, changes: dict) -> pd.DataFrame:
+    df = df.copy()
+    for rid, cols in changes.items():
+        hit = df.index[df[ROW_ID_COL]==rid]
+        if hit.empty:
+            continue
+        for col, v in cols.items():
+            set_cells(df, hit, col, v)
+        if any(c in cols for c in INDEX_COLS):
+            idx.remove(rid)
+            _index_row(idx, df.loc[hit[0]], rid, hit[0])
+    return df
+
+def apply_update_at(df: pd.DataFrame, idx, label, cols: dict):
+    # egy ismert címkéjű sor helyben, a tábla másolása és keresés nélkül (admin lista)
+    rid = df.at[label, ROW_ID_COL]
+    for col, v in cols.items():
+        set_cells(df, [label], col, v)
+    if any(c in cols for c in INDEX_COLS):
+        idx.remove(rid)
+        _index_row(idx, df.loc[label], rid, label)
+
+def apply_delete(df: pd.DataFrame, idx, row_ids) -> pd.DataFrame:
+    row_ids = list(row_ids)
+    for rid in row_ids:
+        idx.remove(rid)
+    return df[~df[ROW_ID_COL].isin(row_ids)]
+
+def apply_entries(df: pd.DataFrame, idx, entries) -> pd.DataFrame:
+    # entries: [(művelet, adat)]; ismeretlen / "reload" bejegyzésre ValueError
+    for op, payload in entries:
+        if op==OP_APPEND:
+            df = apply_append(df, idx, payload)
+        elif op==OP_UPDATE:
+            df = apply_update(df, idx, payload)
+        elif op==OP_DELETE:
+            df = apply_delete(df, idx, payload)
+        else:
+            raise ValueError(op)
+    return df
+
+
+class BookingSync:
+    def __init__(self, interval=SYNC_INTERVAL, full_every=FULL_RELOAD_EVERY):
+        self.interval   = interval
+        self.full_every = full_every
+        self._lock      = threading.Lock()
+        self.df         = None
+        self.idx        = None
+        self.seen_row   = 0   # a napló utolsó feldolgozott sora
+        self.checked_at = 0.0
+        self.loaded_at  = 0.0
+        self.seed_id    = None  # a teljes betöltés azonosítója (token)
+        self.seeded_at  = 0.0   # a teljes betöltés ideje, falióra szerint
+        self.journal    = deque(maxlen=JOURNAL_MAX)  # (napló sor, művelet, adat) a betöltés óta
+
+    @property
+    def seeded(self) -> bool:
+        return self.df is not None
+
+    def seed(self, df, idx, seen_row: int):
+        self._reset(df, idx, (uuid.uuid4().hex, int(seen_row), _time.time()))
+        METRICS.count("rows.read", len(df))
+
+    # ---- token: (betöltés, napló sor, betöltés ideje); két azonos tokenű pillanatkép egyezik ----
+    def token(self):
+        return (self.seed_id, self.seen_row, self.seeded_at)
+
+    def adopt(self, df, idx, token):
+        # egy másik folyamat pillanatképének átvétele (megosztott gyorsítótár); innen a napló
+        # token utáni soraival folytatjuk, és a biztonsági újratöltés ideje is vele jön
+        with self._lock:
+            self._reset(df, idx, token)
+
+    def _reset(self, df, idx, token):
+        self.df, self.idx = df, idx
+        self.seed_id, self.seen_row, self.seeded_at = token[0], int(token[1]), token[2]
+        self.journal.clear()
+        self.checked_at = _time.monotonic()
+        self.loaded_at  = self.checked_at - max(0.0, _time.time() - self.seeded_at)
+
+    def entries_since(self, token):
+        # a token óta alkalmazott bejegyzések, vagy None, ha a pillanatkép nem ezekkel állt elő
+        with self._lock:
+            if token is None or token[0]!=self.seed_id or token[1] > self.seen_row:
+                return None
+            out = [(op, payload) for row, op, payload in self.journal if row > token[1]]
+            return out if len(out)==self.seen_row - token[1] else None
+
+    def refresh(self, fetch_changes, full_reload, force=False):
+        # fetch_changes(első_sor) -> napló sorok; full_reload() -> (df, idx, seen_row)
+        with self._lock:
+            now = _time.monotonic()
+            if not self.seeded or now - self.loaded_at > self.full_every:
+                METRICS.cache("bookings.sync", False)
+                self.seed(*full_reload())
+                return
+            if not force and now - self.checked_at < self.interval:
+                METRICS.cache("bookings.sync", True)
+                return
+            self.checked_at = now
+            entries = fetch_changes(self.seen_row + 1)
+            METRICS.cache("bookings.sync", not entries)
+            if not entries:
+                return
+            try:
+                parsed = [(e[1], json.loads(e[2])) for e in entries]
+                idx = self.idx.copy()
+                df  = apply_entries(self.df, idx, parsed)
+            except (ValueError, KeyError, IndexError, TypeError):
+                # ismeretlen / "reload" bejegyzés vagy hiányos sor: teljes újratöltés
+                self.seed(*full_reload())
+                return
+            self.df, self.idx = df, idx
+            self.journal.extend((self.seen_row + 1 + i, op, payload) for i, (op, payload) in enumerate(parsed))
+            self.seen_row += len(entries)
+
+    def snapshot(self):
+        with self._lock:
+            return self.df.copy(), self.idx.copy()
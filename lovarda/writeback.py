@@ -0,0 +1,354 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time as _time
+
+from lovarda.rows import ROW_ID_COL
+from lovarda.storage import Storage
+from lovarda.sync import apply_append, apply_delete, apply_update
+
+# ---- Háttérben író (write-behind) tároló ----
+# Az írások azonnal bekerülnek egy memóriabeli kötegbe, és onnantól minden
+# olvasás látja őket. Egy háttérszál legfeljebb max_delay mp-en belül
+# kiírja a köteget: az összevont műveletek táblánként egy-egy hívásba
+# kerülnek (pl. öt törlés = egy delete_bookings). Átmeneti hibánál (429, 5xx,
+# hálózat, foglalt adatbázis) a köteg visszakerül a sor elejére, és növekvő
+# várakozással újrapróbáljuk. Végleges hibánál a köteget műveletenként írjuk
+# ki, a hibás műveletek a sorból a failed listára kerülnek (admin felület), a
+# többi megy tovább.
+
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+log = logging.getLogger("lovarda.writeback")
+
+
+def is_transient(e: Exception) -> bool:
+    # gspread.APIError és requests hibák response mezővel; a gspread-et nem töltjük be
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    if isinstance(e, sqlite3.OperationalError):
+        return "locked" in str(e) or "busy" in str(e)
+    return isinstance(e, (OSError, TimeoutError))  # kapcsolati hiba, időtúllépés
+
+
+class WriteBatch:
+    def __init__(self):
+        self.appends = {}     # sor ID -> teljes sor
+        self.updates = {}     # sor ID -> {oszlop: érték}
+        self.deletes = set()  # sor ID-k
+        self.tables  = {}     # kis tábla kulcs -> teljes DataFrame
+
+    def __len__(self):
+        return len(self.appends) + len(self.updates) + len(self.deletes) + len(self.tables)
+
+    def add_append(self, rows: list):
+        for r in rows:
+            self.appends[r[ROW_ID_COL]] = dict(r)
+
+    def add_update(self, changes: dict):
+        for rid, cols in changes.items():
+            if rid in self.deletes:
+                continue
+            if rid in self.appends:
+                self.appends[rid].update(cols)  # még ki sem írt sor: a sorba olvasztjuk
+            else:
+                self.updates.setdefault(rid, {}).update(cols)
+
+    def add_delete(self, row_ids):
+        for rid in row_ids:
+            if self.appends.pop(rid, None) is None:  # ki sem írt sor: kioltják egymást
+                self.updates.pop(rid, None)
+                self.deletes.add(rid)
+
+    def set_table(self, key: str, df):
+        self.tables[key] = df
+
+    def split(self) -> list:
+        # műveletenként egy-egy köteg, a kiírás sorrendjében
+        out = []
+        for rid in self.deletes:
+            b = WriteBatch(); b.deletes = {rid}; out.append(b)
+        for rid, cols in self.updates.items():
+            b = WriteBatch(); b.updates = {rid: dict(cols)}; out.append(b)
+        for rid, row in self.appends.items():
+            b = WriteBatch(); b.appends = {rid: dict(row)}; out.append(b)
+        for key, df in self.tables.items():
+            b = WriteBatch(); b.tables = {key: df}; out.append(b)
+        return out
+
+    def describe(self) -> str:
+        parts = [f"{len(self.deletes)} törlés", f"{len(self.updates)} módosítás",
+                 f"{len(self.appends)} új sor"] + [f"{k} tábla" for k in self.tables]
+        return ", ".join(p for p in parts if not p.startswith("0 "))
+
+    def copy(self):
+        b = WriteBatch()
+        b.appends = {rid: dict(r) for rid, r in self.appends.items()}
+        b.updates = {rid: dict(c) for rid, c in self.updates.items()}
+        b.deletes = set(self.deletes)
+        b.tables  = dict(self.tables)
+        return b
+
+    def merge(self, later):
+        # a későbbi köteg műveletei ennek a tetejére
+        if later.appends:
+            self.add_append(list(later.appends.values()))
+        if later.updates:
+            self.add_update(later.updates)
+        if later.deletes:
+            self.add_delete(later.deletes)
+        self.tables.update(later.tables)
+
+    def overlay(self, df, idx):
+        # a még ki nem írt foglalásváltozások rávetítése egy betöltött táblára
+        if self.deletes:
+            df = apply_delete(df, idx, self.deletes)
+        if self.updates:
+            df = apply_update(df, idx, self.updates)
+        if self.appends:
+            # ha közben már kiíródott és a betöltésben is benne van, nem duplázzuk
+            have = set(df[ROW_ID_COL]) if ROW_ID_COL in df.columns else set()
+            rows = [r for rid, r in self.appends.items() if rid not in have]
+            if rows:
+                df = apply_append(df, idx, rows)
+        return df
+
+
+class WriteBehindStorage(Storage):
+    def __init__(self, inner: Storage, max_delay=1.0, retry_max=60.0):
+        self.inner     = inner
+        self.name      = f"{inner.name}+writebehind"
+        self.max_delay = max_delay
+        self.retry_max = retry_max
+        self._cond     = threading.Condition()
+        self._pending  = WriteBatch()
+        self._inflight = None
+        self._first_at = None
+        self._thread   = None
+        self.failed    = []  # [(köteg, hiba, idő)]: véglegesen hibás, a sorból kivett műveletek
+        self.stats     = {"ops": 0, "writes": 0, "flushes": 0, "errors": 0,
+                          "last_flush": None, "last_error": None}
+        atexit.register(self._at_exit)
+
+    # ---- állapot a felületnek ----
+    def status(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._pending) + len(self._inflight or ()),
+                    "failed": [(b.describe(), err, at) for b, err, at in self.failed],
+                    **self.stats}
+
+    def retry_failed(self):
+        # a félretett műveletek újra a sorba (pl. a lap javítása után)
+        with self._cond:
+            failed, self.failed = self.failed, []
+        for b, _, _ in failed:
+            self._enqueue(lambda p, b=b: p.merge(b))
+
+    def drop_failed(self):
+        with self._cond:
+            self.failed = []
+
+    # ---- sorba állítás ----
+    def _enqueue(self, fn):
+        with self._cond:
+            fn(self._pending)
+            self.stats["ops"] += 1
+            if self._first_at is None:
+                self._first_at = _time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lovarda-writebehind",
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def append_bookings(self, rows: list):
+        self._enqueue(lambda b: b.add_append(rows))
+
+    def update_bookings(self, changes: dict):
+        self._enqueue(lambda b: b.add_update(changes))
+
+    def delete_bookings(self, row_ids):
+        row_ids = list(row_ids)
+        self._enqueue(lambda b: b.add_delete(row_ids))
+
+    def save_table(self, key: str, df):
+        if key=="bookings":
+            # teljes csere: előbb minden függő sorművelet, utána szinkron írás
+            self.flush()
+            self.inner.save_table(key, df)
+            return
+        self._enqueue(lambda b: b.set_table(key, df.copy()))
+
+    def compact_bookings(self) -> int:
+        # előbb minden függő írás, közben a háttérszál áll (üres köteg a helyén)
+        self.flush()
+        with self._cond:
+            while self._inflight is not None:
+                self._cond.wait()
+            self._inflight = WriteBatch()
+        try:
+            return self.inner.compact_bookings()
+        finally:
+            with self._cond:
+                self._inflight = None
+                self._cond.notify_all()
+
+    # ---- olvasás: belső tároló + függő változások ----
+    def _batches(self):
+        # pillanatkép a zár alatt, mert a sorba állítás helyben bővíti a köteget
+        with self._cond:
+            return [b.copy() for b in (self._inflight, self._pending) if b is not None and len(b)]
+
+    def load_bookings(self):
+        df, idx = self.inner.load_bookings()
+        for b in self._batches():
+            df = b.overlay(df, idx)
+        return df, idx
+
+    def _load_small(self, key: str, load):
+        for b in reversed(self._batches()):
+            if key in b.tables:
+                return b.tables[key].copy()
+        return load()
+
+    def load_users(self):
+        return self._load_small("users", self.inner.load_users)
+
+    def load_blocked(self):
+        return self._load_small("blocked", self.inner.load_blocked)
+
+    def load_settings(self):
+        return self._load_small("settings", self.inner.load_settings)
+
+    def load_lunch_overrides(self):
+        return self._load_small("lunch", self.inner.load_lunch_overrides)
+
+    def version(self):
+        return (self.inner.version(), self.stats["ops"])
+
+    # ---- kiírás ----
+    def _write(self, batch: WriteBatch):
+        # részenként ürítjük, így újrapróbáláskor a már kiírt rész nem ismétlődik;
+        # helyben módosítás helyett új konténert kötünk be, mert olvasók is bejárhatják
+        if batch.deletes:
+            self.inner.delete_bookings(list(batch.deletes))
+            batch.deletes = set(); self.stats["writes"] += 1
+        if batch.updates:
+            self.inner.update_bookings(batch.updates)
+            batch.updates = {}; self.stats["writes"] += 1
+        if batch.appends:
+            self.inner.append_bookings(list(batch.appends.values()))
+            batch.appends = {}; self.stats["writes"] += 1
+        for key, df in list(batch.tables.items()):
+            self.inner.save_table(key, df)
+            batch.tables = {k: v for k, v in batch.tables.items() if k!=key}
+            self.stats["writes"] += 1
+
+    def _swap(self) -> WriteBatch:
+        # hívó tartja a zárat
+        batch, self._pending, self._first_at = self._pending, WriteBatch(), None
+        self._inflight = batch
+        return batch
+
+    def _take(self) -> WriteBatch:
+        # a következő köteg: az első függő művelet után legfeljebb max_delay mp-et gyűjtünk
+        with self._cond:
+            while True:
+                while self._inflight is not None or not len(self._pending):
+                    self._cond.wait()
+                deadline = self._first_at + self.max_delay
+                while len(self._pending) and _time.monotonic() < deadline:
+                    self._cond.wait(deadline - _time.monotonic())
+                if self._inflight is None and len(self._pending):
+                    return self._swap()
+
+    def _fail(self, batch: WriteBatch, error):
+        with self._cond:
+            self.failed.append((batch, repr(error), _time.time()))
+            self.stats["errors"] += 1
+
+    def _write_each(self, batch: WriteBatch, error) -> tuple:
+        # végleges hiba után: műveletenként, a hibásakat félretéve; ami átmeneti
+        # hibán akad el, az (a maradékkal együtt) visszamegy a sorba
+        rest = WriteBatch()
+        for one in batch.split():
+            if len(rest):
+                rest.merge(one)
+                continue
+            try:
+                self._write(one)
+            except Exception as e:
+                if is_transient(e):
+                    rest.merge(one)
+                    error = e
+                else:
+                    self._fail(one, e)
+        return rest, (error if len(rest) else None)
+
+    def _attempt(self, batch: WriteBatch):
+        # -> (vissza a sorba kerülő maradék, átmeneti hiba vagy None)
+        try:
+            self._write(batch)
+        except Exception as e:
+            if is_transient(e):
+                return batch, e
+            return self._write_each(batch, e)
+        return batch, None
+
+    def _done(self, batch: WriteBatch, error=None):
+        with self._cond:
+            self._inflight = None
+            if error is None:
+                self.stats["flushes"] += 1
+                self.stats["last_flush"] = _time.time()
+                self.stats["last_error"] = None
+            else:
+                # a sikertelen köteg a később érkezett műveletek elé kerül vissza
+                batch.merge(self._pending)
+                self._pending = batch
+                self._first_at = self._first_at or _time.monotonic()
+                self.stats["errors"] += 1
+                self.stats["last_error"] = repr(error)
+            self._cond.notify_all()
+
+    def _run(self):
+        delay = self.max_delay
+        while True:
+            batch, error = self._attempt(self._take())
+            self._done(batch, error)
+            if error is None:
+                delay = self.max_delay
+                continue
+            _time.sleep(delay)
+            delay = min(delay*2, self.retry_max)
+
+    def flush(self):
+        # szinkron kiírás (kilépéskor és teljes táblacsere előtt); átmeneti hibánál
+        # a köteg a sorban marad, és a hiba a hívóhoz jut
+        with self._cond:
+            while self._inflight is not None:
+                self._cond.wait()
+            if not len(self._pending):
+                return
+            batch = self._swap()
+        batch, error = self._attempt(batch)
+        self._done(batch, error)
+        if error is not None:
+            raise error
+
+    def _at_exit(self):
+        # kilépéskor néhány próbálkozás; ami így sem íródott ki, az a naplóba kerül
+        for attempt in range(3):
+            try:
+                self.flush()
+                break
+            except Exception:
+                _time.sleep(self.max_delay*2**attempt)
+        with self._cond:
+            lost = [(b.describe(), err) for b, err, _ in self.failed]
+            if len(self._pending):
+                lost.append((self._pending.describe(), self.stats["last_error"]))
+        for what, err in lost:
+            log.error("ki nem írt változások kilépéskor: %s (%s)", what, err)
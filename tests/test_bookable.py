@@ -0,0 +1,66 @@
+import random
+from datetime import date, time, timedelta
+
+import pandas as pd
+import pytest
+
+from lovarda.bookable import BookableCalendar
+from lovarda.core import END_TIME, START_TIME, day_free_slots, day_lunch
+from lovarda.index import BookingIndex
+from lovarda.rules import day_rule_violation
+from lovarda.slots import DURATIONS, to_min
+
+FIRST = date(2030, 6, 24)  # a július / augusztus szabályok is beleesnek
+DAYS  = 60
+
+
+def random_setup(rng):
+    idx = BookingIndex()
+    for i in range(rng.randint(0, 400)):
+        d = FIRST + timedelta(days=rng.randint(0, DAYS - 1))
+        idx.add(d, rng.randint(9*60, 20*60), rng.choice([30, 60, 90]), f"id-{i}", i)
+    blocked = sorted({FIRST + timedelta(days=rng.randint(0, DAYS - 1)) for _ in range(rng.randint(0, 6))})
+    over = [{"Dátum": FIRST + timedelta(days=rng.randint(0, DAYS - 1)),
+             "Kezdes": time(rng.randint(11, 14), rng.choice([0, 30])), "HosszPerc": rng.choice([0, 30, 60])}
+            for _ in range(rng.randint(0, 5))]
+    over = pd.DataFrame(over, columns=["Dátum", "Kezdes", "HosszPerc"]).drop_duplicates("Dátum")
+    return idx, blocked, over
+
+def brute_force(idx, blocked, over, duration, n, start, not_before, break_min):
+    # napról napra a nap szabályaival és a napi slot motorral, ahogy egy napot a felület számol
+    out = []
+    for k in range((FIRST + timedelta(days=DAYS) - start).days):
+        d = start + timedelta(days=k)
+        if day_rule_violation(d) or d in blocked:
+            continue
+        ls, ld = day_lunch(over, d, time(12, 0), 45)
+        for s, e in day_free_slots(idx.day(d), ls, ld, break_min)[duration]:
+            if d==start and to_min(s) < not_before:
+                continue
+            out.append((d, s, e))
+            if len(out)==n:
+                return out
+    return out
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_next_free_matches_brute_force(seed):
+    rng = random.Random(seed)
+    idx, blocked, over = random_setup(rng)
+    cal = BookableCalendar.compile(FIRST, DAYS, blocked=blocked, lunch_over_df=over,
+                                   lunch_start=12*60, lunch_dur=45)
+    for _ in range(5):
+        duration   = rng.choice(DURATIONS)
+        n          = rng.randint(1, 12)
+        start      = FIRST + timedelta(days=rng.randint(0, DAYS - 1))
+        not_before = rng.randint(0, 24*60)
+        break_min  = rng.choice([0, 10])
+        got = cal.next_free(idx, duration, n=n, start=start, not_before=not_before,
+                            day_start=to_min(START_TIME), day_end=to_min(END_TIME), break_min=break_min)
+        assert got == brute_force(idx, blocked, over, duration, n, start, not_before, break_min)
+
+def test_bookable_matches_day_rules():
+    cal = BookableCalendar.compile(FIRST, DAYS, blocked=[FIRST + timedelta(days=3)])
+    for k in range(DAYS):
+        d = FIRST + timedelta(days=k)
+        assert cal.bookable(d) == (day_rule_violation(d) is None and k!=3)
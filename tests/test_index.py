@@ -0,0 +1,46 @@
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.storage import BOOKING_COLUMNS, parse_bookings
+from lovarda.sync import apply_append, apply_delete, apply_update, apply_update_at
+
+FIRST  = date(2030, 3, 4)
+GROUPS = ["", "g1", "g2", "g3"]
+
+
+def booking(rng, i: int) -> dict:
+    group = rng.choice(GROUPS)
+    return {"Dátum": (FIRST + timedelta(days=rng.randint(0, 60))).isoformat(),
+            "Gyermek(ek) neve": "Anna", "Lovak": "", "Kezdés": "10:00", "Időtartam (perc)": 60,
+            "Fő": 1, "Ismétlődik": bool(group), "RepeatGroupID": group, "Megjegyzés": "",
+            OWNER_COL: "anna", ROW_ID_COL: f"id-{i}"}
+
+def old_mask(df, group: str, since: date) -> list:
+    # a Stop ismétlés régi szűrése a teljes táblán
+    return df.loc[(df["RepeatGroupID"]==group) & (df["Dátum"] >= pd.Timestamp(since)), ROW_ID_COL].tolist()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_series_ids_match_old_mask(seed):
+    rng = random.Random(seed)
+    df, idx = parse_bookings(pd.DataFrame([booking(rng, i) for i in range(200)], columns=BOOKING_COLUMNS))
+    next_id = 200
+    for _ in range(80):
+        ids, op = list(df[ROW_ID_COL]), rng.random()
+        if op < 0.25:
+            df = apply_append(df, idx, [booking(rng, next_id)]); next_id += 1
+        elif op < 0.5:
+            df = apply_delete(df, idx, rng.sample(ids, 3))
+        elif op < 0.75:
+            df = apply_update(df, idx, {rng.choice(ids): {"RepeatGroupID": rng.choice(GROUPS)}})
+        else:
+            label = rng.choice(list(df.index))
+            apply_update_at(df, idx, label, {"Dátum": (FIRST + timedelta(days=rng.randint(0, 60))).isoformat()})
+        for group in GROUPS[1:]:
+            since = FIRST + timedelta(days=rng.randint(0, 60))
+            assert sorted(idx.series_ids(group, since)) == sorted(old_mask(df, group, since))
+            assert sorted(idx.series_ids(group)) == sorted(df.loc[df["RepeatGroupID"]==group, ROW_ID_COL])
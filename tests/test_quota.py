@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+from gspread.exceptions import APIError
+
+from lovarda import quota
+from lovarda.fakesheets import FakeSpreadsheet, fake_client
+from lovarda.metrics import QUOTA_STATS
+from lovarda.quota import QuotaHTTPClient, SingleFlight, TokenBucket
+
+KEY = "teszt"
+
+
+class FakeClock:
+    # a quota modul _time helyett: az alvás csak a számlálót lépteti
+    def __init__(self):
+        self.now    = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, s):
+        self.sleeps.append(s)
+        self.now += s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(quota, "_time", c)
+    monkeypatch.setattr(quota.random, "uniform", lambda a, b: b)  # a jitter plafonja
+    monkeypatch.setattr(quota, "READ_BUCKET", TokenBucket(6000, burst=1000))
+    monkeypatch.setattr(quota, "WRITE_BUCKET", TokenBucket(6000, burst=1000))
+    QUOTA_STATS.reset()
+    return c
+
+
+@pytest.fixture
+def book():
+    b = FakeSpreadsheet(KEY)
+    b.add_sheet("Lap", [["a", "b"], [1, 2]])
+    return b
+
+
+@pytest.fixture
+def http(book):
+    return fake_client(book, http_client=QuotaHTTPClient).http_client
+
+
+# ---- újrapróbálás és visszalépés ----
+def test_retries_429_and_5xx_with_backoff(clock, book, http):
+    book.fail_next(429, 503, 500)
+    resp = http.values_get(KEY, "Lap!A1:B2")
+    assert resp["values"] == [["a", "b"], [1, 2]]
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+    assert book.counters()["calls.values.get"] == 4
+    stats = QUOTA_STATS.snapshot()
+    assert (stats["retries"], stats["errors"], stats["calls"]) == (3, 0, 4)
+
+def test_backoff_is_capped(clock, book, http, monkeypatch):
+    monkeypatch.setattr(QuotaHTTPClient, "backoff_max", 3.0)
+    book.fail_next(503, 503, 503)
+    http.values_get(KEY, "Lap!A1")
+    assert clock.sleeps == [1.0, 2.0, 3.0]
+
+def test_gives_up_after_max_retries(clock, book, http):
+    book.fail_next(*[503]*(QuotaHTTPClient.max_retries + 1))
+    with pytest.raises(APIError) as e:
+        http.values_get(KEY, "Lap!A1")
+    assert e.value.response.status_code == 503
+    assert book.counters()["calls.values.get"] == QuotaHTTPClient.max_retries + 1
+    assert len(clock.sleeps) == QuotaHTTPClient.max_retries
+    assert QUOTA_STATS.snapshot()["errors"] == 1
+
+def test_client_error_is_not_retried(clock, book, http):
+    book.fail_next(400)
+    with pytest.raises(APIError):
+        http.values_get(KEY, "Lap!A1")
+    assert clock.sleeps == []
+    assert QUOTA_STATS.snapshot()["retries"] == 0
+
+def test_append_not_retried_on_5xx(clock, book, http):
+    # a Sheets már tárolta a sort, csak a válasz hiba: újraküldés duplikálna
+    book.fail_next(503, applied=True)
+    with pytest.raises(APIError):
+        http.values_append(KEY, "Lap!A1", params={"valueInputOption": "RAW"}, body={"values": [[3, 4]]})
+    assert book.sheet("Lap").grid[-1] == [3, 4]
+    assert len(book.sheet("Lap").grid) == 3
+    assert book.counters()["calls.values.append"] == 1
+
+def test_append_retried_on_429(clock, book, http):
+    book.fail_next(429)
+    http.values_append(KEY, "Lap!A1", params={"valueInputOption": "RAW"}, body={"values": [[3, 4]]})
+    assert len(book.sheet("Lap").grid) == 3
+    assert clock.sleeps == [1.0]
+
+def test_update_retried_on_5xx(clock, book, http):
+    book.fail_next(500, applied=True)
+    http.values_update(KEY, "Lap!A2", params={"valueInputOption": "RAW"}, body={"values": [[9]]})
+    assert book.sheet("Lap").grid[1][0] == 9
+    assert book.counters()["calls.values.update"] == 2
+
+
+# ---- azonos GET kérések összevonása ----
+def test_single_flight_merges_concurrent_gets(book, http, monkeypatch):
+    monkeypatch.setattr(quota, "READ_BUCKET", TokenBucket(6000, burst=1000))
+    QUOTA_STATS.reset()
+    book.latency = 0.3
+    results, threads = [], [threading.Thread(target=lambda: results.append(http.values_get(KEY, "Lap!A1:B2")))
+                            for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [r["values"] for r in results] == [[["a", "b"], [1, 2]]]*5
+    assert book.counters()["calls.values.get"] == 1
+    assert QUOTA_STATS.snapshot()["coalesced"] == 4
+
+def test_single_flight_propagates_errors():
+    flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+    calls, errors = [], []
+
+    def leader_fn():
+        calls.append(1)
+        started.set()
+        release.wait()
+        raise RuntimeError("hiba")
+
+    def run(fn):
+        try:
+            flight.do("k", fn)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=run, args=(leader_fn,))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=run, args=(lambda: calls.append(2),)) for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in [leader] + followers:
+        t.join()
+    assert calls == [1]
+    assert len(errors) == 4 and len({id(e) for e in errors}) == 1
+    assert flight.do("k", lambda: "újra") == "újra"  # a hiba után a kulcs felszabadul
+
+
+# ---- token bucket ----
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60, burst=2)  # 1 token / mp
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 1.0]
+    assert clock.sleeps == [1.0]
+
+def test_throttling_counters(clock, book, http, monkeypatch):
+    monkeypatch.setattr(quota, "READ_BUCKET", TokenBucket(60, burst=2))
+    for cell in ("A1", "B1", "A2"):
+        http.values_get(KEY, f"Lap!{cell}")
+    stats = QUOTA_STATS.snapshot()
+    assert (stats["calls"], stats["reads"], stats["writes"]) == (3, 3, 0)
+    assert stats["throttled"] == 1
+    assert stats["throttle_s"] == pytest.approx(1.0)
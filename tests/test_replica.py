@@ -0,0 +1,62 @@
+from datetime import date, time
+
+import pytest
+
+from lovarda.core import new_booking
+from lovarda.fakesheets import FakeSpreadsheet, fake_client
+from lovarda.rows import ROW_ID_COL
+from lovarda.sheets_store import SHEETS, SheetsStorage
+from lovarda.sqlite_store import SqliteStorage
+from lovarda.storage import BOOKING_COLUMNS, ReplicaStorage
+
+KEY = "teszt"
+
+
+@pytest.fixture
+def book():
+    b = FakeSpreadsheet(KEY)
+    rows = [["2030-01-07", f"Lovas {i}", "", "09:00", 30, 1, False, "", "", "lovas", f"id-{i}"]
+            for i in range(20)]
+    for key, (titles, initial) in SHEETS.items():
+        b.add_sheet(titles[0], [BOOKING_COLUMNS] + rows if key=="bookings" else initial)
+    return b
+
+@pytest.fixture
+def replica(book, tmp_path):
+    r = ReplicaStorage(SheetsStorage(KEY, None, client=fake_client(book)),
+                       SqliteStorage(str(tmp_path / "replica.db")), refresh_every=0)
+    r.load_bookings()
+    copies = []
+    save = r.replica.save_table
+    r.replica.save_table = lambda key, df: (copies.append(key), save(key, df))
+    r.copies = copies
+    return r
+
+def ids(df) -> list:
+    return sorted(df[ROW_ID_COL])
+
+
+def test_own_writes_are_applied_without_full_copy(replica, book):
+    new = new_booking(date(2030, 1, 8), "Béla", time(10, 0), 60, "bela")
+    replica.append_bookings([new])
+    replica.update_bookings({"id-1": {"Lovak": "Csillag"}})
+    replica.delete_bookings(["id-2"])
+    df, _ = replica.load_bookings()
+    assert "bookings" not in replica.copies
+    fresh, _ = SheetsStorage(KEY, None, client=fake_client(book)).load_bookings()
+    assert ids(df) == ids(fresh)
+    assert df.loc[df[ROW_ID_COL]=="id-1", "Lovak"].tolist() == ["Csillag"]
+
+def test_foreign_writes_arrive_as_deltas(replica, book):
+    other = SheetsStorage(KEY, None, client=fake_client(book))
+    other.load_bookings()
+    other.delete_bookings(["id-3"])
+    replica.primary.expire(["bookings"])
+    df, _ = replica.load_bookings()
+    assert "id-3" not in set(df[ROW_ID_COL]) and "bookings" not in replica.copies
+
+    # teljes újraírás után nincs visszakövethető napló: teljes másolat
+    other.save_table("bookings", other.load_bookings()[0])
+    replica.primary.expire(["bookings"])
+    replica.load_bookings()
+    assert "bookings" in replica.copies
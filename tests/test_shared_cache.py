@@ -0,0 +1,72 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from lovarda.core import new_booking
+from lovarda.fakesheets import FakeSpreadsheet, fake_client
+from lovarda.rows import ROW_ID_COL
+from lovarda.schema import wire_bookings
+from lovarda.shared_cache import SharedCacheStorage
+from lovarda.sheets_store import SHEETS, SheetsStorage
+from lovarda.slots import from_min
+from lovarda.storage import BOOKING_COLUMNS
+
+KEY   = "teszt"
+FIRST = date(2030, 3, 4)
+
+
+@pytest.fixture
+def book():
+    b = FakeSpreadsheet(KEY)
+    rows = [[(FIRST + timedelta(days=i % 10)).isoformat(), f"Lovas {i}", "", f"{9 + i % 10:02d}:00",
+             60, 1, False, "", "", "lovas", f"id-{i}"] for i in range(50)]
+    for key, (titles, initial) in SHEETS.items():
+        b.add_sheet(titles[0], [BOOKING_COLUMNS] + rows if key=="bookings" else initial)
+    return b
+
+@pytest.fixture
+def replicas(book, tmp_path):
+    path = str(tmp_path / "shared.db")
+    return [SharedCacheStorage(SheetsStorage(KEY, None, client=fake_client(book)), path)
+            for _ in range(2)]
+
+def canon(df) -> list:
+    out = wire_bookings(df).astype(str)
+    return sorted(map(tuple, out[sorted(out.columns)].itertuples(index=False)))
+
+def fresh(book):
+    return SheetsStorage(KEY, None, client=fake_client(book)).load_bookings()[0]
+
+
+def test_replicas_share_deltas(book, replicas):
+    a, b = replicas
+    a.load_bookings(); b.load_bookings()
+    rng = random.Random(0)
+    for step in range(12):
+        writer, reader = (a, b) if step % 2 else (b, a)
+        ids = list(writer.load_bookings()[0][ROW_ID_COL])
+        op  = step % 3
+        if op==0:
+            writer.append_bookings([new_booking(FIRST + timedelta(days=rng.randint(0, 9)), "Új",
+                                                from_min(rng.randint(9, 19)*60), 30, "uj")])
+        elif op==1:
+            writer.update_bookings({rng.choice(ids): {"Lovak": f"Ló {step}"}})
+        else:
+            writer.delete_bookings([rng.choice(ids)])
+        df, idx = reader.load_bookings()
+        assert canon(df) == canon(fresh(book))
+        assert sorted(rid for d in idx.dates() for rid in idx.day(d).ids) == sorted(df[ROW_ID_COL])
+
+    # a teljes pillanatképet csak egyszer csomagolták ki, utána csak delták jöttek
+    assert a.stats["decodes"] + b.stats["decodes"] <= 1
+    assert a.stats["deltas"] + b.stats["deltas"] == 12
+    assert a.stats["patches"] and b.stats["patches"]
+
+def test_unchanged_token_rewrites_nothing(book, replicas):
+    a, b = replicas
+    a.load_bookings()
+    a.expire(["bookings"])  # lejárt, de a napló nem változott
+    b.load_bookings()
+    assert a.stats["deltas"] + b.stats["deltas"] == 0
+    assert a.cache.meta(["bookings"])["bookings"][0] == 1
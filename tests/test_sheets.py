@@ -0,0 +1,150 @@
+from datetime import date, time
+
+import pytest
+
+from lovarda.core import new_booking
+from lovarda.fakesheets import FakeSpreadsheet, fake_client
+from lovarda.rows import ROW_ID_COL
+from lovarda.sheets_store import SHEETS, SheetsStorage
+from lovarda.storage import BOOKING_COLUMNS
+
+KEY = "teszt"
+
+
+def make_book(bookings: list) -> FakeSpreadsheet:
+    book = FakeSpreadsheet(KEY)
+    for key, (titles, initial) in SHEETS.items():
+        book.add_sheet(titles[0], bookings if key=="bookings" else initial)
+    return book
+
+def storage(book):
+    return SheetsStorage(KEY, None, client=fake_client(book))
+
+def grid_rows(book) -> list:
+    # a foglalási lap sorai fejléc szerinti dict-ként
+    header, *rows = book.sheet("Foglalások").grid
+    return [dict(zip(header, r)) for r in rows]
+
+
+# ---- kitöltő oszlopok a fejlécben ----
+@pytest.fixture
+def padded():
+    # üres és __ kezdetű fejlécek az ID előtt, ahogy kézi szerkesztés / régi export hagyja
+    header = BOOKING_COLUMNS[:3] + ["", "__1"] + BOOKING_COLUMNS[3:]
+    row    = ["2030-01-07", "Anna", "", "", "", "09:00", 30, 1, False, "", "", "anna", "id-1"]
+    return make_book([header, row])
+
+def test_append_follows_sheet_header(padded):
+    s = storage(padded)
+    df, _ = s.load_bookings()
+    assert "__1" not in df.columns
+    b = new_booking(date(2030, 1, 8), "Béla", time(10, 0), 60, "bela")
+    s.append_bookings([b])
+    rows = grid_rows(padded)
+    assert rows[-1][ROW_ID_COL] == b[ROW_ID_COL]
+    assert rows[-1]["__1"] == "" and rows[-1][""] == ""
+    assert rows[-1]["Felhasználó"] == "bela"
+
+    # egy friss példány ugyanazt látja, amit az író
+    df, idx = storage(padded).load_bookings()
+    assert list(df[ROW_ID_COL]) == ["id-1", b[ROW_ID_COL]]
+    assert df.loc[df[ROW_ID_COL]==b[ROW_ID_COL], "Felhasználó"].tolist() == ["bela"]
+
+def test_append_before_load_reads_header(padded):
+    s = storage(padded)
+    b = new_booking(date(2030, 1, 8), "Béla", time(10, 0), 60, "bela")
+    s.append_bookings([b])
+    assert grid_rows(padded)[-1][ROW_ID_COL] == b[ROW_ID_COL]
+
+def test_new_columns_extend_header():
+    # régi lap ID és Felhasználó oszlop nélkül: a betöltés a végére veszi fel őket
+    old  = [c for c in BOOKING_COLUMNS if c not in (ROW_ID_COL, "Felhasználó")]
+    book = make_book([old[:3] + [""] + old[3:], ["2030-01-07", "Anna", "", "x", "09:00", 30, 1, False, "", ""]])
+    s = storage(book)
+    s.load_bookings()
+    b = new_booking(date(2030, 1, 8), "Béla", time(10, 0), 60, "bela")
+    s.append_bookings([b])
+    rows = grid_rows(book)
+    assert rows[-1][ROW_ID_COL] == b[ROW_ID_COL]
+    assert rows[-1]["Felhasználó"] == "bela"
+    assert rows[-1][""] == ""
+
+
+# ---- ID -> sor térkép: írás az ID oszlop letöltése nélkül ----
+def booking(i: int) -> list:
+    return ["2030-01-07", f"Lovas {i}", "", "09:00", 30, 1, False, "", "", "lovas", f"id-{i}"]
+
+@pytest.fixture
+def big():
+    return make_book([BOOKING_COLUMNS] + [booking(i) for i in range(200)])
+
+def cell(book, rid: str, col: str):
+    return next(r[col] for r in grid_rows(book) if r[ROW_ID_COL]==rid)
+
+def test_update_reads_only_target_cells(big):
+    s = storage(big)
+    s.load_bookings()
+    big.reset_counters()
+    s.update_bookings({"id-150": {"Lovak": "Csillag"}})
+    assert cell(big, "id-150", "Lovak") == "Csillag"
+    assert "calls.values.get" not in big.counters()  # nincs col_values / row_values
+    assert big.counters()["bytes_received"] < 2000
+
+def test_rows_appended_elsewhere_are_found(big):
+    a, b = storage(big), storage(big)
+    a.load_bookings(); b.load_bookings()
+    new = new_booking(date(2030, 1, 8), "Béla", time(10, 0), 60, "bela")
+    b.append_bookings([new])
+    a.update_bookings({new[ROW_ID_COL]: {"Lovak": "Villám"}})
+    a.delete_bookings(["id-3"])
+    assert cell(big, new[ROW_ID_COL], "Lovak") == "Villám"
+    assert cell(big, "törölt:id-3", "Gyermek(ek) neve") == ""
+    assert len(grid_rows(big)) == 201
+
+def test_stale_positions_are_detected(big):
+    # kézi szerkesztés: egy sor beszúrása a lap elejére eltolja a többit
+    s = storage(big)
+    s.load_bookings()
+    big.sheet("Foglalások").grid.insert(1, booking(999))
+    s.update_bookings({"id-10": {"Lovak": "Csillag"}})
+    assert cell(big, "id-10", "Lovak") == "Csillag"
+    assert cell(big, "id-9", "Lovak") == ""
+
+def test_compaction_drops_tombstones(big):
+    a, b = storage(big), storage(big)
+    a.load_bookings(); b.load_bookings()
+    a.delete_bookings([f"id-{i}" for i in range(0, 200, 2)])
+    assert a.compact_bookings() == 100
+    assert [r[ROW_ID_COL] for r in grid_rows(big) if r.get(ROW_ID_COL)] == [f"id-{i}" for i in range(1, 200, 2)]
+    assert a.compact_bookings() == 0
+
+    # a másik példány régi címei elavultak: az ellenőrzés észreveszi, és jó sorba ír
+    b.update_bookings({"id-199": {"Lovak": "Csillag"}})
+    b.delete_bookings(["id-1"])
+    assert cell(big, "id-199", "Lovak") == "Csillag"
+    assert cell(big, "id-197", "Lovak") == ""
+    df, _ = b.load_bookings()
+    assert sorted(df[ROW_ID_COL]) == sorted(f"id-{i}" for i in range(3, 200, 2))
+    fresh, _ = storage(big).load_bookings()
+    assert sorted(fresh[ROW_ID_COL]) == sorted(df[ROW_ID_COL])
+
+def test_compaction_replays_concurrent_writes(big, monkeypatch):
+    from lovarda import sheets_store
+    a, b = storage(big), storage(big)
+    a.load_bookings(); b.load_bookings()
+    a.delete_bookings(["id-0", "id-1"])
+    new = new_booking(date(2030, 1, 8), "Béla", time(10, 0), 60, "bela")
+    compact = sheets_store.compact_rows
+
+    def racing(ws, values):
+        # a másik példány a beolvasás és a tömörítő írás között ír
+        b.update_bookings({"id-5": {"Lovak": "Csillag"}})
+        b.append_bookings([new])
+        return compact(ws, values)
+
+    monkeypatch.setattr(sheets_store, "compact_rows", racing)
+    assert a.compact_bookings() == 2
+    assert cell(big, "id-5", "Lovak") == "Csillag"
+    assert cell(big, new[ROW_ID_COL], "Felhasználó") == "bela"
+    df, _ = storage(big).load_bookings()
+    assert len(df) == 199 and df[ROW_ID_COL].is_unique
@@ -0,0 +1,62 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from lovarda.core import END_TIME, START_TIME, day_free_slots
+from lovarda.index import BookingIndex
+from lovarda.slots import DURATIONS, from_min
+
+DAY = date(2030, 3, 4)
+
+
+def old_free_slots(bookings, duration, ls, ld, break_min):
+    # a vektorizálás előtti app.get_free_slots ciklusa, változatlanul (datetime léptetés,
+    # minden jelöltnél minden foglalás)
+    slots = []
+    cur   = datetime.combine(DAY, START_TIME)
+    lunch_end  = (datetime.combine(DAY, ls) + timedelta(minutes=ld)).time()
+    last_start = (datetime.combine(DAY, END_TIME) - timedelta(minutes=duration)).time()
+    while cur.time() <= last_start:
+        if ls <= cur.time() < lunch_end:
+            cur += timedelta(minutes=ld)
+            continue
+        stime  = cur.time()
+        end_dt = cur + timedelta(minutes=duration)
+        conflict = False
+        for start, dur in bookings:
+            bs = datetime.combine(DAY, datetime.strptime(start, "%H:%M").time())
+            be = bs + timedelta(minutes=dur)
+            if cur < be and bs < end_dt:
+                conflict = True; break
+        if not conflict:
+            slots.append((stime, end_dt.time()))
+        cur += timedelta(minutes=duration + break_min)
+    return slots
+
+def random_day(rng):
+    bookings = [(f"{rng.randint(8, 20):02d}:{rng.choice([0, 5, 15, 30, 45, 50]):02d}",
+                 rng.choice([15, 30, 45, 60, 90, 120])) for _ in range(rng.randint(0, 12))]
+    lunch = (time(rng.randint(11, 14), rng.choice([0, 15, 30, 45])), rng.choice([0, 30, 45, 60, 90]))
+    return bookings, lunch, rng.choice([0, 5, 10, 15])
+
+def day_index(bookings):
+    idx = BookingIndex()
+    for i, (start, dur) in enumerate(bookings):
+        h, m = map(int, start.split(":"))
+        idx.add(DAY, h*60 + m, dur, f"id-{i}", i)
+    return idx
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_old_loop(seed):
+    rng = random.Random(seed)
+    bookings, (ls, ld), break_min = random_day(rng)
+    new = day_free_slots(day_index(bookings).day(DAY), ls, ld, break_min)
+    for dur in DURATIONS:
+        assert new[dur] == old_free_slots(bookings, dur, ls, ld, break_min), dur
+
+def test_touching_bookings_do_not_conflict():
+    # [s,e) intervallumok: a 10:00-kor végződő foglalás után 10:00-tól szabad
+    slots = day_free_slots(day_index([("09:00", 60)]).day(DAY), time(12, 0), 45, 0)
+    assert slots[30][0] == (from_min(600), from_min(630))
@@ -0,0 +1,58 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lovarda.index import BookingIndex
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.stats import heat_table, totals
+from lovarda.storage import BOOKING_COLUMNS, parse_bookings
+from lovarda.sync import apply_append, apply_delete, apply_update
+
+FIRST = date(2030, 1, 6)
+
+
+def booking(rng, i: int) -> dict:
+    return {"Dátum": (FIRST + timedelta(days=rng.randint(0, 90))).isoformat(),
+            "Gyermek(ek) neve": "Anna", "Lovak": "",
+            "Kezdés": f"{rng.randint(8, 20):02d}:{rng.choice([0, 15, 40]):02d}",
+            "Időtartam (perc)": rng.choice([30, 45, 60, 90, 150]), "Fő": 1,
+            "Ismétlődik": rng.random() < 0.4, "RepeatGroupID": "", "Megjegyzés": "",
+            OWNER_COL: "anna", ROW_ID_COL: f"id-{i}"}
+
+def assert_same(a, b):
+    assert a.days == b.days
+    assert a.weeks == b.weeks
+    assert a.months == b.months
+    assert a.recurring == b.recurring
+    assert np.array_equal(a.heat, b.heat)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_incremental_rollups_match_rebuild(seed):
+    rng = random.Random(seed)
+    df, idx = parse_bookings(pd.DataFrame([booking(rng, i) for i in range(50)], columns=BOOKING_COLUMNS))
+    assert_same(idx.stats, BookingIndex.from_df(df).stats)
+    next_id = 50
+    for _ in range(40):
+        ids = list(df[ROW_ID_COL])
+        op  = rng.random()
+        if op < 0.4 or not ids:
+            df = apply_append(df, idx, [booking(rng, next_id)]); next_id += 1
+        elif op < 0.7:
+            rid = rng.choice(ids)
+            df  = apply_update(df, idx, {rid: rng.choice([
+                {"Kezdés": "18:30"}, {"Időtartam (perc)": 120},
+                {"Ismétlődik": rng.random() < 0.5}, {"Dátum": (FIRST + timedelta(days=100)).isoformat()}])})
+        else:
+            df = apply_delete(df, idx, [rng.choice(ids)])
+        assert_same(idx.stats, BookingIndex.from_df(df).stats)
+
+def test_tables_from_rollups():
+    rng = random.Random(0)
+    df, idx = parse_bookings(pd.DataFrame([booking(rng, i) for i in range(30)], columns=BOOKING_COLUMNS))
+    t, minutes = totals(idx.stats), int(df["Időtartam (perc)"].sum())
+    assert (t["count"], t["minutes"], t["rec_count"]) == (len(df), minutes, int(df["Ismétlődik"].sum()))
+    assert int(heat_table(idx.stats)["perc"].sum()) == minutes
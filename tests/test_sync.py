@@ -0,0 +1,124 @@
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from lovarda.rows import OWNER_COL, ROW_ID_COL
+from lovarda.schema import wire_bookings
+from lovarda.storage import BOOKING_COLUMNS, parse_bookings
+from lovarda.sync import (BookingSync, OP_APPEND, OP_DELETE, OP_RELOAD, OP_UPDATE,
+                          apply_entries, change_entry)
+
+FIRST = date(2030, 3, 4)
+
+
+class Sheet:
+    # a foglalási lap és a naplólap: a BookingSync ezeken keresztül olvas
+    def __init__(self, rows):
+        self.rows, self.log, self.reloads = {r[ROW_ID_COL]: r for r in rows}, [], 0
+
+    def write(self, op, payload):
+        if op==OP_APPEND:
+            self.rows.update({r[ROW_ID_COL]: dict(r) for r in payload})
+        elif op==OP_UPDATE:
+            for rid, cols in payload.items():
+                if rid in self.rows:
+                    self.rows[rid].update(cols)
+        elif op==OP_DELETE:
+            for rid in payload:
+                self.rows.pop(rid, None)
+        self.log.append(change_entry(op, payload))
+
+    def fetch_changes(self, first_row: int):
+        return self.log[first_row - 2:]  # 1. sor a fejléc
+
+    def full_reload(self):
+        self.reloads += 1
+        return (*parse_bookings(pd.DataFrame(list(self.rows.values()), columns=BOOKING_COLUMNS)),
+                len(self.log) + 1)
+
+
+def booking(rng, i: int) -> dict:
+    return {"Dátum": (FIRST + timedelta(days=rng.randint(0, 20))).isoformat(),
+            "Gyermek(ek) neve": rng.choice(["Anna", "Béla", "Cili"]), "Lovak": "",
+            "Kezdés": f"{rng.randint(9, 19):02d}:{rng.choice([0, 30]):02d}",
+            "Időtartam (perc)": rng.choice([30, 60, 90]), "Fő": 1,
+            "Ismétlődik": rng.random() < 0.3, "RepeatGroupID": "", "Megjegyzés": "",
+            OWNER_COL: rng.choice(["anna", "bela"]), ROW_ID_COL: f"id-{i}"}
+
+def canon(df) -> list:
+    out = wire_bookings(df).astype(str)
+    return sorted(map(tuple, out[sorted(out.columns)].itertuples(index=False)))
+
+def days(idx) -> dict:
+    return {d: sorted(zip(idx.day(d).starts.tolist(), idx.day(d).ends.tolist(), idx.day(d).ids))
+            for d in idx.dates()}
+
+def random_ops(rng, sheet, n, start):
+    for k in range(n):
+        ids, op = list(sheet.rows), rng.choice([OP_APPEND, OP_UPDATE, OP_DELETE])
+        if op==OP_APPEND or not ids:
+            sheet.write(OP_APPEND, [booking(rng, start + k*10 + j) for j in range(rng.randint(1, 3))])
+        elif op==OP_UPDATE:
+            rid = rng.choice(ids)
+            sheet.write(OP_UPDATE, {rid: rng.choice([{"Kezdés": "17:00"}, {"Lovak": "Csillag"},
+                                                     {"Időtartam (perc)": 90, "Dátum": FIRST.isoformat()}])})
+        else:
+            sheet.write(OP_DELETE, rng.sample(ids, min(len(ids), rng.randint(1, 2))))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_refresh_matches_full_reload(seed):
+    rng   = random.Random(seed)
+    sheet = Sheet([booking(rng, i) for i in range(30)])
+    sync  = BookingSync(interval=0)
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+    for round_ in range(5):
+        random_ops(rng, sheet, rng.randint(0, 6), 1000*(round_ + 1))
+        sync.refresh(sheet.fetch_changes, sheet.full_reload)
+        df, idx = sync.snapshot()
+        ref, ref_idx, _ = sheet.full_reload()
+        assert canon(df) == canon(ref)
+        assert days(idx) == days(ref_idx)
+    assert sheet.reloads == 1 + 5  # a szinkron csak induláskor töltött be, a többi az összevetésé
+
+def test_reload_entry_triggers_full_reload():
+    rng   = random.Random(0)
+    sheet = Sheet([booking(rng, i) for i in range(5)])
+    sync  = BookingSync(interval=0)
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+    sheet.rows.pop("id-0")  # teljes újraírás (save_table), csak "reload" bejegyzéssel
+    sheet.write(OP_RELOAD, None)
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+    assert sheet.reloads == 2
+    assert "id-0" not in set(sync.snapshot()[0][ROW_ID_COL])
+    assert sync.seen_row == len(sheet.log) + 1
+
+def test_repeated_append_entry_is_ignored():
+    rng   = random.Random(1)
+    sheet = Sheet([booking(rng, i) for i in range(3)])
+    sync  = BookingSync(interval=0)
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+    row = booking(rng, 99)
+    sheet.write(OP_APPEND, [row])
+    sheet.write(OP_APPEND, [row])  # félbeszakadt, újrapróbált írás
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+    assert list(sync.snapshot()[0][ROW_ID_COL]).count("id-99") == 1
+
+def test_journal_replays_to_the_same_state():
+    rng   = random.Random(2)
+    sheet = Sheet([booking(rng, i) for i in range(10)])
+    sync  = BookingSync(interval=0)
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+    base, token = sync.snapshot(), sync.token()
+    random_ops(rng, sheet, 8, 500)
+    sync.refresh(sheet.fetch_changes, sheet.full_reload)
+
+    # egy másik folyamat a régi pillanatképből + a naplóból ugyanoda jut
+    other = BookingSync(interval=0)
+    other.adopt(*base, token)
+    df, idx = other.snapshot()
+    df = apply_entries(df, idx, sync.entries_since(token))
+    assert canon(df) == canon(sync.snapshot()[0])
+    assert days(idx) == days(sync.snapshot()[1])
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+
+import pytest
+
+from lovarda.storage import Storage
+from lovarda.sync import CELL_MAX, change_entries, change_entry
+from lovarda.writeback import WriteBehindStorage, is_transient
+
+
+class HTTPError(Exception):
+    # gspread.APIError alakja: a státusz a response-ban
+    def __init__(self, status):
+        super().__init__(status)
+        self.response = type("Resp", (), {"status_code": status})()
+
+
+class Inner(Storage):
+    # sorrendben rögzíti a kiírt műveleteket; a bad ID-k végleges, a fails hibák egyszeri hibát adnak
+    name = "teszt"
+
+    def __init__(self):
+        self.written, self.bad, self.fails = [], set(), []
+
+    def _check(self, ids):
+        if self.fails:
+            raise self.fails.pop(0)
+        if self.bad & set(ids):
+            raise ValueError("ismeretlen oszlop")
+
+    def append_bookings(self, rows):
+        self._check(r["ID"] for r in rows)
+        self.written.append(("append", sorted(r["ID"] for r in rows)))
+
+    def update_bookings(self, changes):
+        self._check(changes)
+        self.written.append(("update", sorted(changes)))
+
+    def delete_bookings(self, row_ids):
+        self._check(row_ids)
+        self.written.append(("delete", sorted(row_ids)))
+
+
+@pytest.fixture
+def wb(monkeypatch):
+    w = WriteBehindStorage(Inner(), max_delay=0.0)
+    monkeypatch.setattr(w, "_enqueue", lambda fn: fn(w._pending))  # háttérszál nélkül, flush-sal
+    yield w
+    w.drop_failed()
+
+
+def test_transient_classification():
+    assert is_transient(HTTPError(429)) and is_transient(HTTPError(503))
+    assert not is_transient(HTTPError(400))
+    assert is_transient(ConnectionError()) and is_transient(TimeoutError())
+    assert is_transient(sqlite3.OperationalError("database is locked"))
+    assert not is_transient(sqlite3.OperationalError("no such column: x"))
+    assert not is_transient(ValueError())
+
+def test_transient_error_keeps_batch(wb):
+    wb.inner.fails = [HTTPError(503)]
+    wb.append_bookings([{"ID": "a"}])
+    with pytest.raises(HTTPError):
+        wb.flush()
+    assert wb.status()["pending"] == 1 and not wb.failed
+    wb.flush()
+    assert wb.inner.written == [("append", ["a"])]
+
+def test_permanent_error_sets_op_aside(wb):
+    wb.inner.bad = {"b"}
+    wb.append_bookings([{"ID": "a"}, {"ID": "b"}, {"ID": "c"}])
+    wb.delete_bookings(["x"])
+    wb.flush()
+    assert wb.inner.written == [("delete", ["x"]), ("append", ["a"]), ("append", ["c"])]
+    status = wb.status()
+    assert status["pending"] == 0
+    assert [what for what, _, _ in status["failed"]] == ["1 új sor"]
+
+    # a hibás művelet nem tartja fel a későbbieket, és újra sorba állítható
+    wb.update_bookings({"a": {"Lovak": "Csillag"}})
+    wb.flush()
+    assert wb.inner.written[-1] == ("update", ["a"])
+    wb.inner.bad = set()
+    wb.retry_failed()
+    wb.flush()
+    assert wb.inner.written[-1] == ("append", ["b"]) and not wb.failed
+
+def test_transient_after_permanent_requeues_rest(wb):
+    wb.inner.bad = {"b"}
+    wb.append_bookings([{"ID": "a"}, {"ID": "b"}])
+    wb.inner.fails = [ValueError("végleges"), HTTPError(429)]  # a köteg egyben, majd "a" egyedül
+    with pytest.raises(HTTPError):
+        wb.flush()
+    assert wb.status()["pending"] == 2 and not wb.failed
+    wb.flush()
+    assert wb.inner.written == [("append", ["a"])]
+    assert len(wb.failed) == 1
+
+
+# ---- nagy naplóbejegyzés darabolása ----
+def test_change_entries_stay_under_cell_limit():
+    rows = [{"ID": str(i), "Megjegyzés": "x"*300} for i in range(1000)]
+    entries = change_entries("append", rows)
+    assert len(entries) > 1 and all(len(e[2]) < CELL_MAX for e in entries)
+    assert sum((json.loads(e[2]) for e in entries), []) == json.loads(change_entry("append", rows)[2])
+
+    changes = {str(i): {"Lovak": "y"*200} for i in range(1000)}
+    merged  = {}
+    for e in change_entries("update", changes):
+        assert len(e[2]) < CELL_MAX
+        merged.update(json.loads(e[2]))
+    assert merged == changes
+    assert [e[1:] for e in change_entries("delete", ["a"])] == [["delete", '["a"]']]